@@ -1,26 +1,59 @@
-from fastapi import FastAPI, HTTPException, Depends, Body, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Depends, Body, Header, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 import os
-import requests
-import json
-from typing import List, Dict, Optional, Any
-from enum import Enum
+from typing import List, Dict, Optional, Any, Tuple
 import uuid
+import json
 import base64
+import asyncio
+import time
 
 
 
 from dotenv import load_dotenv
-from elevenlabs.client import ElevenLabs
 from elevenlabs import play
 
+from gemini_client import GeminiClient, GeminiError, extract_text
+from streaming import JsonStringFieldExtractor, SentenceSplitter, extract_json_scalar
+from tts import TTSService, TTSError, DEFAULT_VOICE_ID, DEFAULT_MODEL_ID
+from tts_cache import TTSCache, cache_key
+from audio_profiles import AudioProfile, DEFAULT_AUDIO_PROFILE, resolve_profile, transcode, concat_audio
+from prefetch import QuestionPrefetcher
+from question_bank import QuestionBank, GENERIC_CANDIDATE_NAME
+from reports import ReportManager, ReportStatus
+from session_store import (
+    create_session_store, ConcurrentUpdateError, SessionNotFoundError,
+    SessionJanitor, SessionArchiver, SessionLocks, SESSION_ARCHIVE_DIR, SESSION_STORE
+)
+from interview_state import SessionState, StageState, StageStatus, ChatHistory, StateCodec, intern_questions
+from metrics import registry
+from logs import setup_logging, shutdown_logging, get_logger
+from prompt_cache import PromptCache, is_cache_miss
+from singleflight import SingleFlight, request_key
+from batch import BatchEvaluator, BatchRecord, SessionLoader, history_until, parse_lines, BATCH_MAX_RECORDS
+from feed import FeedNotifier, sse_event, parse_cursor, FEED_MAX_WAIT, FEED_KEEPALIVE
+from upstream import UpstreamScheduler, in_background, GEMINI_RATE_LIMIT, TTS_RATE_LIMIT
+from structured import StructuredOutput, StructuredOutputError, EVALUATION_OUTPUT, QUESTIONS_OUTPUT, clamp_score
+from context import StageSummarizer, recent_window, estimate_tokens, context_tokens, SUMMARY_MAX_WORDS
+from ws_protocol import AudioSender, negotiate_protocol, PROTOCOL_VERSION
+from connections import ConnectionManager, encode_message, TURN_QUEUE_FULL_MESSAGE, WS_PING_INTERVAL, WS_TURN_QUEUE
+from phrases import (
+    INTRO_GREETING, STAGE_INTRO_TRANSITIONS, STAGE_COMPLETE_TRANSITIONS, DEFAULT_STAGE_COMPLETE_TRANSITION,
+    STAGE_OPEN_QUESTION, DEFAULT_FOLLOW_UP, FALLBACK_FOLLOW_UP, FINAL_STAGE_THANKS, COMPLETION_MESSAGE,
+    STREAM_ERROR_MESSAGE, choose_reply_prefix, static_phrases
+)
 
 
 load_dotenv()
 
+# Loglar ayrı bir iş parçacığında yazılır (LOG_LEVEL, LOG_FORMAT=text|json)
+setup_logging()
+logger = get_logger(__name__)
+
 # Gemini API anahtarını al
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
@@ -28,6 +61,93 @@ if not GEMINI_API_KEY:
 
 app = FastAPI(title="Mülakat Simülasyonu API")
 
+# Tüm isteklerin paylaştığı, bağlantı havuzlu Gemini istemcisi
+gemini_client = GeminiClient(api_key=GEMINI_API_KEY)
+
+# Değerlendirme ve soru üretimi talimatları Gemini tarafında bir kez önbelleğe alınır
+prompt_cache = PromptCache(gemini_client)
+# Birebir aynı eşzamanlı Gemini istekleri (ör. toplu başlatılan mülakatlar) tek çağrıda birleştirilir
+gemini_flight = SingleFlight("gemini")
+# Sağlayıcı başına hız sınırı, öncelik, yeniden deneme ve devre kesici
+gemini_scheduler = UpstreamScheduler("gemini", GeminiError, GEMINI_RATE_LIMIT)
+tts_scheduler = UpstreamScheduler("tts", TTSError, TTS_RATE_LIMIT)
+
+# Tek ElevenLabs istemcisi; sentez sınırlı bir iş parçacığı havuzunda yürütülür
+tts_service = TTSService()
+
+# Sabit ifadeler için bellek + disk (static/tts_cache) katmanlı ses önbelleği
+tts_cache = TTSCache()
+TTS_PREWARM = os.getenv("TTS_PREWARM", "true").lower() in ("1", "true", "yes")
+
+# Referansı tutulmayan task'lar çöp toplayıcı tarafından iptal edilebilir
+background_tasks = set()
+
+# Tur başına gecikme kırılımı; /metrics altında histogram olarak yayınlanır
+TURN_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 1.5, 2, 3, 5, 8, 13, 20, 30)
+turn_seconds = registry.histogram("turn_seconds", "Bir mülakat turunun toplam süresi", TURN_BUCKETS)
+turn_evaluation_seconds = registry.histogram(
+    "turn_evaluation_seconds", "Turda yanıt değerlendirmesine (Gemini) harcanan süre", TURN_BUCKETS
+)
+turn_question_seconds = registry.histogram(
+    "turn_question_generation_seconds", "Aşama geçişinde soruların hazırlanmasına harcanan süre", TURN_BUCKETS
+)
+turn_audio_seconds = registry.histogram(
+    "turn_audio_delivery_seconds", "Yanıt sesinin sentezlenip WebSocket'e gönderilme süresi", TURN_BUCKETS
+)
+tts_seconds = registry.histogram(
+    "tts_synthesis_seconds", "text_to_speech çağrısı başına süre (önbellek isabetleri dahil)", TURN_BUCKETS
+)
+turns_in_progress = registry.gauge("turns_in_progress", "Şu anda işlenen mülakat turları")
+turn_duplicates = registry.counter(
+    "turn_duplicates_total", "Aynı message_id ile tekrar gelen ve kayıtlı yanıtla karşılanan mesajlar"
+)
+turns_rejected = registry.counter(
+    "ws_turns_rejected_total", "Bağlantının tur kuyruğu dolu olduğu için reddedilen WebSocket mesajları"
+)
+
+# Oturum başına hatırlanan son mesaj kimliği sayısı (istemci yeniden denemeleri için)
+IDEMPOTENCY_KEYS_PER_SESSION = int(os.getenv("IDEMPOTENCY_KEYS_PER_SESSION", "16"))
+
+# Aynı oturumun turları sırayla işlenir; farklı oturumlar birbirini beklemez
+session_locks = SessionLocks()
+
+# Mesaj akışını (uzun sorgu / SSE) bekleyenler tur kaydedilince uyandırılır
+feed_notifier = FeedNotifier()
+
+@app.on_event("startup")
+async def prewarm_tts_cache():
+    """Sabit mülakatçı ifadelerini arka planda önceden seslendirir"""
+    if not TTS_PREWARM:
+        return
+    
+    async def run():
+        warmed = await in_background(tts_cache.prewarm(
+            static_phrases(), DEFAULT_VOICE_ID, DEFAULT_MODEL_ID, DEFAULT_AUDIO_PROFILE.cache_format,
+            lambda text: synthesize_clip(text, DEFAULT_VOICE_ID, DEFAULT_AUDIO_PROFILE)
+        ))
+        logger.info("TTS önbelleği hazır: %d sabit ifade", warmed)
+    
+    task = asyncio.create_task(run())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+@app.on_event("startup")
+async def start_session_janitor():
+    """Boşta kalan ve kapasiteyi aşan oturumları periyodik olarak temizler"""
+    session_janitor.start()
+
+@app.on_event("shutdown")
+async def close_clients():
+    session_janitor.stop()
+    await connections.close()
+    await prompt_cache.close()
+    await gemini_scheduler.close()
+    await tts_scheduler.close()
+    await gemini_client.aclose()
+    tts_service.close()
+    await session_store.close()
+    shutdown_logging()
+
 # CORS middleware ayarları
 app.add_middleware(
     CORSMiddleware,
@@ -40,69 +160,67 @@ app.add_middleware(
 # Statik dosyaları servis etmek için bir dizin oluştur
 os.makedirs("static/interviews", exist_ok=True)
 
-# Mülakat durumlarını saklamak için bellek içi depolama
-interview_sessions = {}
+# WebSocket bağlantıları; her istemcinin kanalı, ses göndericisi ve seçenekleri burada tutulur
+connections = ConnectionManager()
 
-# WebSocket bağlantılarını saklamak için
-active_connections: Dict[str, WebSocket] = {}
+# Bir sonraki aşamanın soruları mevcut aşama sürerken arka planda üretilir
+question_prefetcher = QuestionPrefetcher(lambda *args: in_background(get_stage_questions(*args)))
 
-def text_to_speech(text: str) -> bytes:
-    """Metni sese dönüştürür (ElevenLabs kullanarak)"""
-    try:
-        print(f"Seslendirilecek metin: {text}")
-        ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
-        
-        # ElevenLabs API anahtarını kontrol et
-        if not ELEVENLABS_API_KEY:
-            raise ValueError("ELEVENLABS_API_KEY bulunamadı")
-            
-        # ElevenLabs client'ı oluştur
-        client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
-        
-        # Ses dönüşümü
-        audio = client.text_to_speech.convert(
-            text=text,
-            voice_id="EXAVITQu4vr4xnSDxMaL",  # Bella sesi
-            model_id="eleven_multilingual_v2",
-            output_format="mp3_44100_128"
+# (pozisyon, aşama) başına kalıcı soru havuzu
+question_bank = QuestionBank()
+
+async def synthesize_clip(text: str, voice_id: str, profile: AudioProfile) -> bytes:
+    """Metni profilin biçiminde sentezler; sağlayıcı bu biçimi vermiyorsa ffmpeg ile dönüştürür"""
+    if not profile.needs_transcode:
+        return await tts_scheduler.call(
+            lambda: tts_service.synthesize(text, voice_id=voice_id, output_format=profile.output_format)
         )
+    
+    # Varsayılan profilde önbellekte olan klipler (ör. sabit ifadeler) yeniden sentezlenmez
+    source, source_format = None, profile.output_format
+    if not DEFAULT_AUDIO_PROFILE.needs_transcode:
+        source = await tts_cache.get(
+            cache_key(text, voice_id, DEFAULT_MODEL_ID, DEFAULT_AUDIO_PROFILE.cache_format)
+        )
+        source_format = DEFAULT_AUDIO_PROFILE.output_format
+    if source is None:
+        source = await tts_scheduler.call(
+            lambda: tts_service.synthesize(text, voice_id=voice_id, output_format=profile.output_format)
+        )
+        source_format = profile.output_format
+    return await transcode(source, source_format, profile)
+
+async def text_to_speech(text: str, voice_id: str = DEFAULT_VOICE_ID, pin: bool = False,
+                         profile: AudioProfile = DEFAULT_AUDIO_PROFILE) -> Optional[bytes]:
+    """Metni sese dönüştürür (paylaşılan ElevenLabs istemcisi ile, event loop'u bloklamadan)"""
+    try:
+        # Önbellekte yoksa TTS havuzunda, istek başına süre sınırıyla sentezlenir
+        with tts_seconds.time():
+            audio_bytes = await tts_cache.get_or_synthesize(
+                text, voice_id, DEFAULT_MODEL_ID, profile.cache_format,
+                lambda: synthesize_clip(text, voice_id, profile),
+                pin=pin
+            )
         
-        # Generator'ı bytes'a dönüştür
-        audio_bytes = b''.join(chunk for chunk in audio)
-        
-        if not audio_bytes:
-            raise ValueError("Ses verisi oluşturulamadı")
-            
-        print(f"Ses verisi oluşturuldu, boyut: {len(audio_bytes)} bytes")
+        # Metnin kendisi loglanmaz; aday yanıtlarından türeyen içerik taşıyabilir
+        logger.debug("Ses verisi oluşturuldu: %d karakter -> %d bayt", len(text), len(audio_bytes))
         return audio_bytes
         
-    except Exception as e:
-        print(f"TTS hatası: {str(e)}")
-        # Hata detaylarını logla
-        import traceback
-        print(f"Hata detayı: {traceback.format_exc()}")
+    except Exception:
+        logger.exception("TTS hatası (%d karakter, profil %s)", len(text), profile.name)
         return None
 
-async def send_audio_to_unity(websocket: WebSocket, text: str):
+async def send_audio_to_unity(websocket: WebSocket, text: str, sender: Optional[AudioSender] = None):
     """Metni sese dönüştürüp Unity'ye gönderir"""
     try:
         # Metni sese dönüştür
-        audio_data = text_to_speech(text)
+        audio_data = await text_to_speech(text)
         
         if audio_data:
-            # Base64 formatına dönüştür
-            audio_base64 = base64.b64encode(audio_data).decode('utf-8')
+            # Bağlantının moduna göre base64 JSON veya ikili çerçeve olarak gönder
+            await (sender or AudioSender(websocket)).send_audio_data(audio_data, text)
             
-            # WebSocket üzerinden Unity'ye gönder
-            await websocket.send_json({
-                'type': 'audio_data',
-                'data': {
-                    'text': text,
-                    'audio': audio_base64
-                }
-            })
-            
-            print(f"Ses verisi gönderildi: {text[:50]}...")
+            logger.debug("Ses verisi gönderildi: %d bayt", len(audio_data))
         else:
             # Ses dönüştürme başarısız olduysa sadece metni gönder
             await websocket.send_json({
@@ -112,7 +230,7 @@ async def send_audio_to_unity(websocket: WebSocket, text: str):
                 }
             })
     except Exception as e:
-        print(f"Ses gönderimi hatası: {str(e)}")
+        logger.warning("Ses gönderimi hatası: %s", e)
         # Hata durumunda sadece metni göndermeyi dene
         try:
             await websocket.send_json({
@@ -122,102 +240,120 @@ async def send_audio_to_unity(websocket: WebSocket, text: str):
                 }
             })
         except Exception as e:
-            print(f"Metin gönderimi de başarısız: {str(e)}")
+            logger.warning("Metin gönderimi de başarısız: %s", e)
 
 @app.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
-    await websocket.accept()
-    active_connections[client_id] = websocket
-    print(f"Yeni WebSocket bağlantısı: {client_id}")
+    # Ses taşıma modu bağlantıda anlaşılır; belirtilmezse eski JSON modu kullanılır
+    protocol, subprotocol = negotiate_protocol(websocket)
+    await websocket.accept(subprotocol=subprotocol)
+    # Ses biçimi ?profile= ile seçilir (ör. opus_low, pcm_16000); varsayılan mp3_high
+    profile = resolve_profile(websocket.query_params.get("profile"))
+    options = {
+        "stream": websocket.query_params.get("stream", "").lower() in ("1", "true", "yes"),
+        "profile": profile
+    }
+    # Yeniden bağlanan istemci son aldığı mesajın seq değerini ?resume= ile gönderir
+    resume = websocket.query_params.get("resume")
+    resume = int(resume) if resume and resume.lstrip("-").isdigit() else None
+    
+    # Bağlantı onayı; kanal buna seq ve resume bilgisini ekleyip kaçırılan mesajları arkasından gönderir
+    hello = {
+        'type': 'connection_response',
+        'data': {
+            'status': 'connected',
+            'protocol': protocol,
+            'version': PROTOCOL_VERSION,
+            'audio_profile': profile.name,
+            'media_type': profile.media_type,
+            'heartbeat': WS_PING_INTERVAL
+        }
+    }
+    channel, connection = await connections.connect(
+        websocket, client_id, protocol, profile.codec, options, hello, resume=resume
+    )
+    logger.info("Yeni WebSocket bağlantısı: %s (%s, %s)", client_id, protocol, profile.name)
+    
+    # Turlar ayrı bir görevde sırayla işlenir; alma döngüsü tur sürerken de pong ve ping okur
+    turns: asyncio.Queue = asyncio.Queue(maxsize=WS_TURN_QUEUE)
+    
+    async def process_turns():
+        while (data := await turns.get()) is not None:
+            # Tur, REST ile aynı yoldan işlenir; ses bu kanala run_turn içinde bir kez gönderilir
+            response, completed = await process_interview_message(data, reply_to=client_id)
+            
+            # Akış modunda metin stream_complete ile zaten gönderildi
+            if not channel.options.get("stream"):
+                await channel.send_json({
+                    'type': 'message',
+                    'data': {'text': response, 'is_completed': completed}
+                })
+    
+    # Bağlantı koparsa süren tur tamamlanır; yanıtı kanal tamponundan yeniden bağlanmada alınır
+    worker = asyncio.create_task(process_turns())
+    background_tasks.add(worker)
+    worker.add_done_callback(background_tasks.discard)
     
     try:
-        # Bağlantı onayı gönder
-        await websocket.send_json({
-            'type': 'connection_response',
-            'data': {'status': 'connected'}
-        })
-        print(f"Bağlantı onayı gönderildi: {client_id}")
-        
         while True:
             data = await websocket.receive_json()
-            print(f"Alınan mesaj: {data}")
+            kind = data.get('type')
+            connection.touch(pong=kind == 'pong')
+            logger.debug("Mesaj alındı: %s (%s)", client_id, kind)
             
-            if data.get('type') == 'message':
-                # Mesajı işle ve yanıt oluştur
-                response = await process_interview_message(data.get('data'))
-                print(f"Oluşturulan yanıt: {response}")
-                
-                # Ses dönüşümü
+            if kind == 'ping':
+                connection.put(encode_message({'type': 'pong', 'data': data.get('data')}))
+            elif kind == 'message':
                 try:
-                    client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
-                    audio = client.text_to_speech.convert(
-                        text=response,
-                        voice_id="JBFqnCBsd6RMkjVDRZzb",
-                        model_id="eleven_multilingual_v2",
-                        output_format="mp3_44100_128"
-                    )
-                    
-                    # Ses verisini parça parça gönder
-                    for chunk in audio:
-                        if chunk:
-                            await websocket.send_bytes(chunk)
-                            
-                    # İşlem bittiğinde bildirim gönder
-                    await websocket.send_json({
-                        'type': 'stream_complete',
-                        'data': {'text': response}
-                    })
-                    
-                except Exception as e:
-                    print(f"Ses dönüşüm hatası: {str(e)}")
-                    # Hata durumunda sadece metni gönder
-                    await websocket.send_json({
-                        'type': 'message',
-                        'data': {'text': response}
-                    })
+                    turns.put_nowait(data.get('data'))
+                except asyncio.QueueFull:
+                    # İstemci yanıt beklemeden mesaj yığıyor; tur işlenmez, istemci tekrar gönderebilir
+                    turns_rejected.inc()
+                    await channel.send_json({'type': 'error', 'data': {'message': TURN_QUEUE_FULL_MESSAGE}})
                     
     except WebSocketDisconnect:
-        print(f"Bağlantı koptu: {client_id}")
-        del active_connections[client_id]
+        logger.info("Bağlantı koptu: %s", client_id)
     except Exception as e:
-        print(f"WebSocket hatası: {str(e)}")
-        if client_id in active_connections:
-            del active_connections[client_id]
+        if not connection.closed:
+            logger.warning("WebSocket hatası (%s): %s", client_id, e)
+    finally:
+        await connections.disconnect(channel, connection)
+        # Kuyruk doluysa bitiş işareti, süren tur yer açınca eklenir
+        await turns.put(None)
 
-async def process_interview_message(data: dict) -> str:
-    """Gelen mesajı işler ve yanıt oluşturur"""
+async def process_interview_message(data: dict, reply_to: Optional[str] = None) -> Tuple[str, bool]:
+    """Gelen mesajı işler; yanıt metnini ve mülakatın tamamlanıp tamamlanmadığını döndürür"""
     try:
         session_id = data.get('session_id')
         message = data.get('message')
         
         if not session_id or not message:
-            return "Geçersiz mesaj formatı"
+            return "Geçersiz mesaj formatı", False
         
-        if session_id not in interview_sessions:
-            return "Oturum bulunamadı"
+        if await session_store.get(session_id) is None:
+            return "Oturum bulunamadı", False
         
         # Mesajı işle ve yanıt al
-        request = MessageRequest(session_id=session_id, message=message)
-        response = await send_message(request)
+        response = await run_turn(session_id, message, reply_to=reply_to, message_id=data.get('message_id'))
         
-        return response.message
+        return response.message, response.is_completed
     except Exception as e:
-        print(f"Mesaj işleme hatası: {str(e)}")
-        return "Bir hata oluştu, lütfen tekrar deneyin."
-
-class StageStatus(str, Enum):
-    NOT_STARTED = "not_started"
-    IN_PROGRESS = "in_progress"
-    COMPLETED = "completed"
+        logger.exception("Mesaj işleme hatası: %s", e)
+        return "Bir hata oluştu, lütfen tekrar deneyin.", False
 
+# API şemaları: oturumlar içeride SessionState / StageState olarak tutulur,
+# bu modeller yalnızca yanıtların ve dışarıdan gelen oturumların biçimini tanımlar
 class InterviewStage(BaseModel):
     id: str
+    stage_key: str = ""  # DEFAULT_INTERVIEW_STAGES içindeki sabit aşama kimliği
     name: str
     description: str
     status: StageStatus = StageStatus.NOT_STARTED
     attempts: int = 0
     questions: List[Dict[str, Any]] = []
     satisfaction_score: int = 0  # 0-100 arası
+    summary: str = ""  # Aşamadaki konuşmanın artımlı olarak güncellenen özeti
+    summarized_turns: int = 0  # Özete işlenmiş son tur (attempts değeri)
 
 class InterviewSession(BaseModel):
     id: str
@@ -227,16 +363,20 @@ class InterviewSession(BaseModel):
     stages: List[InterviewStage]
     completed: bool = False
     overall_feedback: str = ""
+    report_status: ReportStatus = ReportStatus.NOT_STARTED
+    voice_id: str = DEFAULT_VOICE_ID  # Mülakatçının bu oturumdaki sesi
     chat_history: List[Dict[str, Any]] = []
 
 class InterviewRequest(BaseModel):
     position: str
     candidate_name: str
     custom_stages: Optional[List[Dict[str, str]]] = None
+    voice_id: Optional[str] = None
 
 class MessageRequest(BaseModel):
     session_id: str
     message: str
+    message_id: Optional[str] = None  # İstemcinin ürettiği tekil kimlik; yeniden denemede aynısı gönderilir
 
 class InterviewResponse(BaseModel):
     session_id: str
@@ -245,8 +385,69 @@ class InterviewResponse(BaseModel):
     is_completed: bool
     overall_feedback: Optional[str] = None
 
+class MessageFeedResponse(BaseModel):
+    session_id: str
+    messages: List[Dict[str, Any]]  # Her mesaj kalıcı sıra numarasını (seq) taşır
+    cursor: int  # Bir sonraki istekte since olarak gönderilecek değer
+    is_completed: bool
+
+class ReportResponse(BaseModel):
+    session_id: str
+    status: ReportStatus
+    overall_feedback: Optional[str] = None
+
 class TextToSpeechRequest(BaseModel):
     text: str
+    profile: Optional[str] = None
+
+# Mülakat oturumları SESSION_STORE ile seçilen depoda (memory / sqlite / redis) tutulur.
+# WebSocket bağlantıları ise her worker'ın kendi belleğindedir.
+state_codec = StateCodec()
+session_store = create_session_store(state_codec)
+
+def release_session(session_id: str):
+    """Tahliye edilen oturuma ait arka plan işlerini bırakır"""
+    question_prefetcher.cancel_session(session_id)
+    stage_summarizer.cancel_session(session_id)
+    report_manager.cancel(session_id)
+
+# SESSION_IDLE_TTL / SESSION_MAX sınırlarını uygular; tamamlanan oturumlar
+# SESSION_ARCHIVE_DIR tanımlıysa silinmeden önce JSON olarak arşivlenir
+session_janitor = SessionJanitor(
+    session_store,
+    archiver=SessionArchiver(SESSION_ARCHIVE_DIR, state_codec) if SESSION_ARCHIVE_DIR else None,
+    on_evict=release_session,
+    locks=session_locks,
+)
+
+async def complete_report(session_id: str, feedback: Optional[str]):
+    """Rapor işinin sonucunu oturuma yazar ve hazırsa istemciye WebSocket üzerinden gönderir"""
+    
+    def apply(session: SessionState):
+        if feedback is None:
+            session.report_status = ReportStatus.FAILED
+        else:
+            session.overall_feedback = feedback
+            session.report_status = ReportStatus.READY
+    
+    async with session_locks.hold(session_id):
+        await session_store.mutate(session_id, apply)
+    
+    channel = connections.get(session_id)
+    if feedback is not None and channel is not None:
+        await channel.send_json({
+            'type': 'report_ready',
+            'data': {
+                'session_id': session_id,
+                'overall_feedback': feedback
+            }
+        })
+
+# Mülakat sonu raporu oturum başına bir kez, arka planda üretilir
+report_manager = ReportManager(
+    lambda session: in_background(generate_interview_completion(session)),
+    complete_report
+)
 
 # Varsayılan mülakat aşamaları
 DEFAULT_INTERVIEW_STAGES = [
@@ -282,113 +483,252 @@ DEFAULT_INTERVIEW_STAGES = [
     }
 ]
 
-def generate_with_gemini(prompt: str, chat_history: Optional[List[Dict[str, Any]]] = None) -> str:
-    """Gemini API'ye HTTP isteği ile direkt erişim sağlayan fonksiyon"""
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
-    
-    headers = {
-        "Content-Type": "application/json"
-    }
+async def generate_with_gemini(prompt: str, chat_history: Optional[List[Dict[str, Any]]] = None,
+                               instructions: Optional[str] = None,
+                               generation_config: Optional[Dict[str, Any]] = None) -> str:
+    """Gemini API'ye paylaşılan async istemci üzerinden erişim sağlayan fonksiyon.
+    
+    instructions verilirse sabit talimat olarak gönderilir; önbelleğe alındıysa yalnızca
+    önbellek adı gider, isteğin gövdesinde sadece değişen kısım kalır. Birebir aynı istek
+    (ör. aynı pozisyon için eşzamanlı başlayan mülakatlar) sürerken gelenler onun yanıtını paylaşır.
+    """
     
     # Sohbet geçmişi varsa, onu da ekle
     if chat_history:
-        data = {
-            "contents": chat_history + [{"role": "user", "parts": [{"text": prompt}]}]
-        }
+        contents = chat_history + [{"role": "user", "parts": [{"text": prompt}]}]
     else:
-        data = {
-            "contents": [{"role": "user", "parts": [{"text": prompt}]}]
-        }
+        contents = [{"role": "user", "parts": [{"text": prompt}]}]
     
-    response = requests.post(url, headers=headers, json=data)
+    key = request_key(contents, instructions, generation_config)
+    return await gemini_flight.do(key, lambda: _generate(contents, instructions, generation_config))
+
+async def _generate(contents: List[Dict[str, Any]], instructions: Optional[str],
+                    generation_config: Optional[Dict[str, Any]]) -> str:
+    extra = prompt_cache.resolve(instructions) if instructions else {}
+    try:
+        response_json = await gemini_scheduler.call(
+            lambda: gemini_client.generate(contents, generationConfig=generation_config, **extra)
+        )
+    except GeminiError as e:
+        if not is_cache_miss(e, extra):
+            raise
+        # Önbellek Gemini tarafında silinmiş; talimat satır içi gönderilerek tekrar denenir
+        prompt_cache.invalidate(instructions)
+        inline = PromptCache.inline(instructions)
+        response_json = await gemini_scheduler.call(
+            lambda: gemini_client.generate(contents, generationConfig=generation_config, **inline)
+        )
     
-    if response.status_code != 200:
-        raise Exception(f"Gemini API hatası: {response.status_code} - {response.text}")
+    # API yanıtından metni çıkart
+    return extract_text(response_json)
+
+async def stream_with_gemini(prompt: str, chat_history: Optional[List[Dict[str, Any]]] = None,
+                             instructions: Optional[str] = None,
+                             generation_config: Optional[Dict[str, Any]] = None):
+    """generate_with_gemini'nin akış sürümü; yanıt metnini parça parça döndürür.
     
-    response_json = response.json()
+    Akış yeniden denenmez: hata durumunda çağıran taraf, kendi yeniden denemesi olan
+    akışsız değerlendirmeye döner.
+    """
+    if chat_history:
+        contents = chat_history + [{"role": "user", "parts": [{"text": prompt}]}]
+    else:
+        contents = [{"role": "user", "parts": [{"text": prompt}]}]
+    
+    extra = prompt_cache.resolve(instructions) if instructions else {}
+    started = False
+    while True:
+        await gemini_scheduler.acquire()
+        try:
+            async for chunk in gemini_client.stream_generate(contents, generationConfig=generation_config, **extra):
+                started = True
+                yield chunk
+        except GeminiError as e:
+            gemini_scheduler.record_failure(e)
+            if started or not is_cache_miss(e, extra):
+                raise
+            prompt_cache.invalidate(instructions)
+            extra = PromptCache.inline(instructions)
+            continue
+        gemini_scheduler.record_success()
+        return
+
+async def parse_structured(output: StructuredOutput, response: str) -> Any:
+    """Yanıtı şemaya göre doğrular; uymuyorsa Gemini'den bir kez onarım ister.
+    
+    Onarım da başarısız olursa StructuredOutputError fırlatılır, çağıran taraf varsayılana döner.
+    """
+    try:
+        return output.parse(response)
+    except StructuredOutputError as e:
+        output.parse_failures.inc()
+        error = e
     
-    # API yanıtından metni çıkart
     try:
-        return response_json["candidates"][0]["content"]["parts"][0]["text"]
-    except (KeyError, IndexError) as e:
-        raise Exception(f"Gemini API yanıt formatı beklenenden farklı: {str(e)}")
+        repaired = await generate_with_gemini(
+            output.repair_prompt(response, error), generation_config=output.generation_config
+        )
+        value = output.parse(repaired)
+    except (StructuredOutputError, GeminiError) as e:
+        output.fallbacks.inc()
+        raise StructuredOutputError(f"{output.kind} yanıtı onarılamadı: {str(e)}") from e
+    output.repaired.inc()
+    return value
 
-def generate_stage_questions(position: str, stage: InterviewStage, candidate_name: str) -> List[Dict[str, Any]]:
-    """Belirli bir aşama için soru listesi oluşturur"""
+async def generate_structured(output: StructuredOutput, prompt: str,
+                              chat_history: Optional[List[Dict[str, Any]]] = None,
+                              instructions: Optional[str] = None) -> Any:
+    """Gemini'yi JSON modunda (responseSchema) çağırır ve doğrulanmış sonucu döndürür"""
+    response = await generate_with_gemini(
+        prompt, chat_history, instructions=instructions, generation_config=output.generation_config
+    )
+    return await parse_structured(output, response)
+
+# Soru üretimi ve değerlendirme promptlarının sabit kısımları; Gemini'ye sistem talimatı
+# olarak gönderilir ve önbelleğe alınır, her istekte yalnızca değişen alanlar gider
+QUESTION_INSTRUCTIONS = """
+# MÜLAKAT SORULARI OLUŞTURMA
+
+Sana verilen pozisyon ve aşama için adaya sorulacak 3-5 soru oluştur.
+Sorular, sohbet havasında ve doğal olmalı, klasik mülakat soruları gibi katı olmamalı, tekrara düşmemeli.
+Her soru, adayı daha iyi tanımak ve belirtilen aşama için gerekli bilgileri almak amaçlı olmalı.
+
+Yanıtı aşağıdaki JSON formatında ver:
+
+```json
+[
+    {
+        "question": "Soru metni",
+        "intent": "Bu sorunun amacının kısa açıklaması",
+        "expected_themes": ["Yanıtta beklenen tema 1", "Tema 2", "Tema 3"]
+    },
+    {
+        "question": "Soru metni 2",
+        "intent": "Bu sorunun amacının kısa açıklaması",
+        "expected_themes": ["Yanıtta beklenen tema 1", "Tema 2", "Tema 3"]
+    }
+]
+```
+
+Sadece JSON çıktısını ver, başka metin yazma.
+"""
+
+EVALUATION_INSTRUCTIONS = """
+# MÜLAKAT YANITI DEĞERLENDİRME
+
+Adayın yanıtını değerlendir ve bulunulan aşama için ne kadar tatmin edici olduğunu belirle.
+Değerlendirme sonucunda aday ile doğal bir sohbet akışı içinde devam etmek için yanıt oluşturacaksın.
+Pozisyon, aşama, önceki konuşmanın özeti, beklentiler ve adayın yanıtı her istekte ayrıca verilir.
+
+## DEĞERLENDİRME KRİTERLERİ:
+1. İçeriğin kapsamlılığı ve derinliği (40 puan)
+2. Yanıtın aşama konusuyla ilgisi (30 puan)
+3. İfade netliği ve iletişim becerisi (20 puan)
+4. Özgünlük ve kişisel deneyim (10 puan)
+
+## PUANLAMA KILAVUZU:
+* 80-100: Mükemmel yanıt, tüm beklentileri karşılıyor, aşamayı tamamlamalı
+* 60-79: İyi yanıt, çoğu beklentiyi karşılıyor, aşamayı tamamlamalı
+* 40-59: Ortalama yanıt, bazı beklentileri karşılıyor, ek soru sorulmalı
+* 0-39: Yetersiz yanıt, çok az beklentiyi karşılıyor, ek soru sorulmalı
+
+## YANIT ÖRNEKLERİ:
+Düşük puan (0-39) için örnek yanıtlar:
+- "Sanırım konudan biraz uzaklaştık. [Spesifik bir soru]"
+- "Bu konuyu biraz daha açmak isterim. [Spesifik bir soru]"
+
+Orta puan (40-59) için örnek yanıtlar:
+- "Anlıyorum. [Daha detaylı bir soru]"
+- "İlginç. [Konuyu derinleştiren bir soru]"
+
+Yüksek puan (60+) için örnek yanıtlar (ancak hala ek bilgiye ihtiyaç varsa):
+- "Çok güzel bir perspektif. [İlave bir soru]"
+- "İlginç bir bakış açısı. [Konuyu detaylandıran bir soru]"
+
+## DEĞERLENDİRME YANITI:
+Aşağıdaki JSON formatında yanıtla:
+
+```json
+{
+    "satisfaction_score": 0-100 arası sayısal değer,
+    "stage_complete": true/false,
+    "next_question": "Adaya sorulacak bir sonraki soru. Yanıt tatmin ediciyse bu bölüm boş olabilir."
+}
+```
+
+Sadece JSON çıktısını ver, başka metin yazma.
+"""
+
+async def request_stage_questions(position: str, stage: StageState, candidate_name: str) -> Optional[List[Dict[str, Any]]]:
+    """Belirli bir aşama için Gemini'den soru listesi ister; yanıt ayrıştırılamazsa None döner"""
     
     prompt = f"""
-    # MÜLAKAT SORULARI OLUŞTURMA
-    
     ## POZİSYON: {position}
     ## AŞAMA: {stage.name} - {stage.description}
     ## ADAY: {candidate_name}
-    
-    Bu aşama için adaya sorulacak 3-5 soru oluştur. 
-    Sorular, sohbet havasında ve doğal olmalı, klasik mülakat soruları gibi katı olmamalı, tekrara düşmemeli.
-    Her soru, adayı daha iyi tanımak ve belirtilen aşama için gerekli bilgileri almak amaçlı olmalı.
-    
-    Yanıtı aşağıdaki JSON formatında ver:
-    
-    ```json
-    [
-        {{
-            "question": "Soru metni",
-            "intent": "Bu sorunun amacının kısa açıklaması",
-            "expected_themes": ["Yanıtta beklenen tema 1", "Tema 2", "Tema 3"]
-        }},
-        {{
-            "question": "Soru metni 2",
-            "intent": "Bu sorunun amacının kısa açıklaması",
-            "expected_themes": ["Yanıtta beklenen tema 1", "Tema 2", "Tema 3"]
-        }}
-    ]
-    ```
-    
-    Sadece JSON çıktısını ver, başka metin yazma.
     """
     
-    response = generate_with_gemini(prompt)
-    
-    # JSON çıktısını bul ve ayrıştır
-    json_str = response
-    if "```json" in response:
-        json_str = response.split("```json")[1].split("```")[0].strip()
-    elif "```" in response:
-        json_str = response.split("```")[1].split("```")[0].strip()
-    
     try:
-        return json.loads(json_str)
-    except json.JSONDecodeError:
-        # JSON ayrıştırma hatası durumunda, varsayılan sorular
-        return [
-            {
-                "question": f"{stage.name} hakkında bize biraz bilgi verebilir misiniz?",
-                "intent": "Genel bilgi toplama",
-                "expected_themes": ["Deneyim", "Yetkinlik", "Motivasyon"]
-            }
-        ]
+        questions = await generate_structured(QUESTIONS_OUTPUT, prompt, instructions=QUESTION_INSTRUCTIONS)
+    except StructuredOutputError as e:
+        logger.warning("Soru listesi ayrıştırılamadı: %s", e)
+        return None
+    return QUESTIONS_OUTPUT.dump(questions)
 
-def evaluate_response(session: InterviewSession, stage: InterviewStage, message: str) -> dict:
-    """Adayın yanıtını değerlendirir ve bir sonraki adımı belirler"""
+async def generate_stage_questions(position: str, stage: StageState, candidate_name: str) -> List[Dict[str, Any]]:
+    """Belirli bir aşama için soru listesi oluşturur"""
+    questions = await request_stage_questions(position, stage, candidate_name)
+    if questions is not None:
+        return questions
+    
+    # JSON ayrıştırma hatası durumunda, varsayılan sorular
+    return [
+        {
+            "question": f"{stage.name} hakkında bize biraz bilgi verebilir misiniz?",
+            "intent": "Genel bilgi toplama",
+            "expected_themes": ["Deneyim", "Yetkinlik", "Motivasyon"]
+        }
+    ]
+
+async def get_stage_questions(position: str, stage: StageState, candidate_name: str) -> List[Dict[str, Any]]:
+    """Aşama sorularını önce soru bankasından alır, bankada yoksa Gemini ile oluşturur"""
+    if stage.stage_key:
+        # Bankaya giden sorular kişiye özel olmasın diye genel aday adıyla üretilir
+        async def generate_for_bank():
+            return await in_background(request_stage_questions(position, stage, GENERIC_CANDIDATE_NAME))
+        
+        questions = await question_bank.sample(position, stage.stage_key)
+        question_bank.refill_in_background(position, stage.stage_key, generate_for_bank)
+        if questions:
+            return questions
+    
+    return await generate_stage_questions(position, stage, candidate_name)
+
+def build_evaluation_request(session: SessionState, stage: StageState, message: str):
+    """Değerlendirme promptunu ve bağlam için sohbet geçmişini hazırlar"""
     
-    # Sohbet geçmişini oluştur
-    chat_for_context = []
+    # Son mesajlar token bütçesine sığdığı kadar eklenir; daha eskisi aşama özetlerinde yer alır
+    chat_for_context, window_tokens = recent_window(session.chat_history)
     
-    # Önceki 10 mesajı (veya daha az) geçmişe ekle
-    for msg in session.chat_history[-10:]:
-        role = "user" if msg["is_user"] else "model"
-        chat_for_context.append({"role": role, "parts": [{"text": msg["content"]}]})
+    summaries = [
+        f"- {other.name}: {other.summary}" for other in session.stages
+        if other.summary and other is not stage
+    ]
+    previous_summary = chr(10).join(summaries) if summaries else "-"
+    stage_summary = stage.summary or "-"
+    context_tokens.observe(window_tokens + estimate_tokens(previous_summary) + estimate_tokens(stage_summary))
     
-    # Değerlendirme promptu oluştur
+    # Değerlendirme promptu oluştur; kriterler, puanlama ve JSON şeması EVALUATION_INSTRUCTIONS içinde
     prompt = f"""
-    # MÜLAKAT YANITI DEĞERLENDİRME
-    
     ## POZİSYON: {session.position}
     ## AŞAMA: {stage.name} - {stage.description}
     ## ADAY: {session.candidate_name}
     
-    Adayın aşağıdaki yanıtını değerlendir ve bu aşama için ne kadar tatmin edici olduğunu belirle.
-    Değerlendirme sonucunda aday ile doğal bir sohbet akışı içinde devam etmek için yanıt oluşturacaksın.
+    ## ÖNCEKİ AŞAMALARIN ÖZETİ:
+    {previous_summary}
+    
+    ## BU AŞAMADA ŞU ANA KADAR:
+    {stage_summary}
     
     ## ADAY YANITI:
     ```
@@ -397,74 +737,84 @@ def evaluate_response(session: InterviewSession, stage: InterviewStage, message:
     
     ## BEKLENTİLER:
     Aşağıdaki konulara değinilmesi bekleniyor:
-    {' / '.join([theme for q in stage.questions for theme in q.get('expected_themes', [])])}
-    
-    ## DEĞERLENDİRME KRİTERLERİ:
-    1. İçeriğin kapsamlılığı ve derinliği (40 puan)
-    2. Yanıtın aşama konusuyla ilgisi (30 puan)
-    3. İfade netliği ve iletişim becerisi (20 puan)
-    4. Özgünlük ve kişisel deneyim (10 puan)
-    
-    ## PUANLAMA KILAVUZU:
-    * 80-100: Mükemmel yanıt, tüm beklentileri karşılıyor, aşamayı tamamlamalı
-    * 60-79: İyi yanıt, çoğu beklentiyi karşılıyor, aşamayı tamamlamalı  
-    * 40-59: Ortalama yanıt, bazı beklentileri karşılıyor, ek soru sorulmalı
-    * 0-39: Yetersiz yanıt, çok az beklentiyi karşılıyor, ek soru sorulmalı
-    
-    ## YANIT ÖRNEKLERİ:
-    Düşük puan (0-39) için örnek yanıtlar:
-    - "Sanırım konudan biraz uzaklaştık. [Spesifik bir soru]"
-    - "Bu konuyu biraz daha açmak isterim. [Spesifik bir soru]"
-    
-    Orta puan (40-59) için örnek yanıtlar:
-    - "Anlıyorum. [Daha detaylı bir soru]"
-    - "İlginç. [Konuyu derinleştiren bir soru]"
-    
-    Yüksek puan (60+) için örnek yanıtlar (ancak hala ek bilgiye ihtiyaç varsa):
-    - "Çok güzel bir perspektif. [İlave bir soru]"
-    - "İlginç bir bakış açısı. [Konuyu detaylandıran bir soru]"
-    
-    ## DEĞERLENDİRME YANITI:
-    Aşağıdaki JSON formatında yanıtla:
-    
-    ```json
-    {{
-        "satisfaction_score": 0-100 arası sayısal değer,
-        "stage_complete": true/false,
-        "next_question": "Adaya sorulacak bir sonraki soru. Yanıt tatmin ediciyse bu bölüm boş olabilir."
-    }}
-    ```
-    
-    Sadece JSON çıktısını ver, başka metin yazma.
+    {' / '.join([theme for q in stage.questions for theme in q.expected_themes])}
     """
     
-    response = generate_with_gemini(prompt, chat_for_context)
-    
-    # JSON çıktısını bul ve ayrıştır
-    json_str = response
-    if "```json" in response:
-        json_str = response.split("```json")[1].split("```")[0].strip()
-    elif "```" in response:
-        json_str = response.split("```")[1].split("```")[0].strip()
-    
+    return prompt, chat_for_context
+
+async def parse_evaluation(response: str) -> dict:
+    """Gemini değerlendirme yanıtını doğrular, onarılamazsa varsayılan değerlendirmeyi döndürür"""
     try:
-        result = json.loads(json_str)
-        return result
-    except json.JSONDecodeError:
+        return EVALUATION_OUTPUT.dump(await parse_structured(EVALUATION_OUTPUT, response))
+    except StructuredOutputError as e:
+        logger.warning("Değerlendirme ayrıştırılamadı: %s", e)
         # JSON ayrıştırma hatası durumunda, varsayılan yanıt
         return {
             "satisfaction_score": 50,
             "stage_complete": False,
-            "next_question": "Bu konuda biraz daha detay verebilir misiniz?"
+            "next_question": FALLBACK_FOLLOW_UP
         }
 
-def generate_interview_completion(session: InterviewSession) -> str:
+async def evaluate_response(session: SessionState, stage: StageState, message: str) -> dict:
+    """Adayın yanıtını değerlendirir ve bir sonraki adımı belirler"""
+    prompt, chat_for_context = build_evaluation_request(session, stage, message)
+    response = await generate_with_gemini(
+        prompt, chat_for_context,
+        instructions=EVALUATION_INSTRUCTIONS, generation_config=EVALUATION_OUTPUT.generation_config
+    )
+    return await parse_evaluation(response)
+
+async def fetch_stored_session(session_id: str) -> Optional[SessionState]:
+    loaded = await session_store.get(session_id)
+    return loaded[0] if loaded is not None else None
+
+def parse_session(data: Dict[str, Any]) -> SessionState:
+    """Dışarıdan gelen oturum JSON'unu API şemasıyla doğrulayıp iç temsile çevirir"""
+    return SessionState.from_dict(InterviewSession.model_validate(data).model_dump(mode="json"))
+
+# Toplu değerlendirmede oturumlar depodan, yoksa arşivden salt okunur olarak yüklenir
+batch_sessions = SessionLoader(fetch_stored_session, parse_session)
+
+def find_stage(session: SessionState, stage_ref) -> Tuple[int, StageState]:
+    """Aşamayı kimliği, sabit anahtarı veya sırasıyla bulur"""
+    for index, stage in enumerate(session.stages):
+        if stage.id == stage_ref or (stage.stage_key and stage.stage_key == stage_ref):
+            return index, stage
+    if isinstance(stage_ref, int) and 0 <= stage_ref < len(session.stages):
+        return stage_ref, session.stages[stage_ref]
+    raise ValueError(f"Aşama bulunamadı: {stage_ref}")
+
+async def evaluate_batch_record(record: BatchRecord) -> Dict[str, Any]:
+    """Kayıtlı bir yanıtı oturum durumunu değiştirmeden ve seslendirmeden yeniden puanlar.
+    
+    Canlı değerlendirmeden farklı olarak şemaya uymayan yanıt varsayılan puana düşmez,
+    hata olarak döner; böylece toplu sonuçlar sessizce 50 puanla dolmaz.
+    """
+    session = await batch_sessions.load(record.session)
+    stage_index, stage = find_stage(session, record.stage)
+    if record.history is not None:
+        history = ChatHistory.from_list(record.history)
+    else:
+        history = history_until(session.chat_history, record.answer, stage_index)
+    snapshot = session.with_history(history)
+    
+    prompt, chat_for_context = build_evaluation_request(snapshot, stage, record.answer)
+    evaluation = await in_background(generate_structured(
+        EVALUATION_OUTPUT, prompt, chat_for_context, instructions=EVALUATION_INSTRUCTIONS
+    ))
+    return {"session_id": session.id, "stage": stage.id, **EVALUATION_OUTPUT.dump(evaluation)}
+
+batch_evaluator = BatchEvaluator(evaluate_batch_record)
+
+async def generate_interview_completion(session: SessionState) -> str:
     """Mülakat tamamlandığında genel bir değerlendirme oluşturur"""
     
     # Değerlendirme promptu oluştur
     stage_summaries = []
     for stage in session.stages:
         stage_summary = f"- {stage.name}: Puan {stage.satisfaction_score}/100"
+        if stage.summary:
+            stage_summary += f" - {stage.summary}"
         stage_summaries.append(stage_summary)
     
     prompt = f"""
@@ -488,43 +838,97 @@ def generate_interview_completion(session: InterviewSession) -> str:
     """
     
     # Sohbet geçmişi olmadan değerlendirme yap
-    response = generate_with_gemini(prompt)
+    response = await generate_with_gemini(prompt)
     return response
 
-def format_bot_response(session: InterviewSession, stage: InterviewStage, is_new_stage: bool, evaluation: Optional[dict] = None) -> str:
-    """Bot yanıtını uygun şekilde biçimlendirir"""
+async def update_stage_summary(session_id: str, stage_index: int):
+    """Aşama özetini yalnızca henüz özetlenmemiş turlarla günceller"""
+    loaded = await session_store.get(session_id)
+    if loaded is None:
+        return
+    session = loaded[0]
+    stage = session.stages[stage_index]
+    new_messages = [
+        msg for msg in session.chat_history
+        if msg.stage == stage_index and msg.turn > stage.summarized_turns
+    ]
+    if not new_messages:
+        return
+    last_turn = max(msg.turn for msg in new_messages)
+    conversation = chr(10).join(
+        f"{'Aday' if msg.is_user else 'Mülakatçı'}: {msg.content}" for msg in new_messages
+    )
+    
+    prompt = f"""
+    # MÜLAKAT AŞAMA ÖZETİ
+    
+    ## POZİSYON: {session.position}
+    ## AŞAMA: {stage.name} - {stage.description}
+    
+    ## MEVCUT ÖZET:
+    {stage.summary or "-"}
+    
+    ## YENİ KONUŞMA:
+    {conversation}
+    
+    Mevcut özeti yeni konuşmayla güncelle. Adayın verdiği somut bilgileri, deneyimleri,
+    güçlü ve zayıf yönleri koru; tekrar eden ifadeleri çıkar. En fazla {SUMMARY_MAX_WORDS} kelime,
+    düz metin olarak yaz. Sadece özeti ver, başka metin yazma.
+    """
+    summary = (await generate_with_gemini(prompt)).strip()
+    
+    def apply(interview: SessionState):
+        target = interview.stages[stage_index]
+        # Bu arada daha yeni turları içeren bir özet yazıldıysa üzerine yazılmaz
+        if target.summarized_turns < last_turn:
+            target.summary = summary
+            target.summarized_turns = last_turn
+    
+    # Özet Gemini çağrısından sonra, yalnızca yazma anında oturum kilidi altında kaydedilir
+    async with session_locks.hold(session_id):
+        await session_store.mutate(session_id, apply)
+
+# Aşama özetleri turun kritik yolunun dışında, arka planda güncellenir
+stage_summarizer = StageSummarizer(lambda *key: in_background(update_stage_summary(*key)))
+
+def prefetch_next_stage_questions(session: SessionState):
+    """Oturumun bir sonraki aşaması için soru üretimini arka planda başlatır"""
+    next_index = session.current_stage_index + 1
+    if next_index < len(session.stages):
+        question_prefetcher.schedule(
+            session.id, next_index,
+            session.position, session.stages[next_index], session.candidate_name
+        )
+
+# Yanıt parçası: (metin, sabit_mi). Sabit parçalar önbellekten gelir, yalnızca dinamik kısım sentezlenir.
+ReplySegment = Tuple[str, bool]
+
+def format_bot_segments(session: SessionState, stage: StageState, is_new_stage: bool, evaluation: Optional[dict] = None) -> List[ReplySegment]:
+    """Bot yanıtını sabit geçiş ifadesi ve dinamik soru parçaları halinde oluşturur"""
     
     # Mülakat tamamlanmışsa
     if session.completed:
-        return session.overall_feedback
+        return [(session.overall_feedback, False)]
     
     # Yeni aşamaya geçildiyse, doğal bir geçiş mesajı oluştur
     if is_new_stage:
         # Aşama başlıklarını kaldırdık, daha doğal bir sohbet akışı için
-        if stage.id == "intro":
+        if stage.stage_key == "intro":
             # İlk aşama için özel başlangıç
             if stage.questions and len(stage.questions) > 0:
-                return f"{stage.questions[0]['question']}"
+                return [(stage.questions[0].question, False)]
             else:
-                return """Merhaba ve görüşmeye hoş geldiniz! Ben sizin sanal mülakatçınız Hirexim. Bugün yazılım geliştirici pozisyonu için konuşacağız. Endişelenmenize gerek yok, bu sadece sizin deneyim ve becerilerinizi anlamak için bir sohbet. 
-
-Başlamadan önce, kendinizi kısaca tanıtabilir misiniz? Eğitim geçmişiniz, teknik becerileriniz ve bu pozisyonla ilgili motivasyonunuz hakkında biraz bilgi paylaşırsanız sevinirim."""
+                return [(INTRO_GREETING, True)]
         
         # Diğer aşamalara doğal geçiş
-        transition_phrases = {
-            "experience": "Şimdi biraz iş deneyimlerinizden bahsedelim. ",
-            "technical": "Biraz teknik becerilerinizden konuşalım. ",
-            "behavioral": "Çalışma tarzınız hakkında merak ettiğim birkaç şey var. ",
-            "company_fit": "Şimdi biraz beklentilerinizden ve kariyer hedeflerinizden bahsedelim. ",
-            "questions": "Son olarak, bana sormak istediğiniz sorular var mı? "
-        }
-        
-        transition = transition_phrases.get(stage.id, "")
+        transition = STAGE_INTRO_TRANSITIONS.get(stage.stage_key, "").strip()
+        segments = [(transition, True)] if transition else []
         
         if stage.questions and len(stage.questions) > 0:
-            return f"{transition}{stage.questions[0]['question']}"
+            segments.append((stage.questions[0].question, False))
         else:
-            return f"{transition}Bu konuda düşüncelerinizi paylaşır mısınız?"
+            segments.append((STAGE_OPEN_QUESTION, True))
+        return segments
     
     # Değerlendirme varsa ve aşama tamamlanmadıysa, bir sonraki soruyu sor
     if evaluation:
@@ -534,56 +938,172 @@ Başlamadan önce, kendinizi kısaca tanıtabilir misiniz? Eğitim geçmişiniz,
         # Değerlendirme puanı düşükse ve maksimum deneme sayısına ulaşılmadıysa
         if not evaluation.get("stage_complete", False) and stage.attempts < 3:  # 3'e çıkarıldı (ilk yanıt + 2 ek deneme)
             # Puanlama durumuna göre doğal diyalog oluştur
-            import random
-            
-            # Çok düşük puan (0-39) - bağlamdan uzak veya çok yetersiz
-            if satisfaction_score < 40:
-                low_responses = [
-                    f"Sanırım konudan biraz uzaklaştık. {next_question}",
-                    f"Bu konuyu biraz daha açmak isterim. {next_question}",
-                    f"Belki biraz daha spesifik olabilir miyiz? {next_question}",
-                    f"İlginç, ama sanırım aradığım bilgiye tam ulaşamadım. {next_question}"
-                ]
-                return random.choice(low_responses)
-            
-            # Orta puan (40-59) - ek detaya ihtiyaç var
-            elif satisfaction_score < 60:
-                med_responses = [
-                    f"Anlıyorum. {next_question}",
-                    f"İlginç. {next_question}",
-                    f"Teşekkür ederim. {next_question}",
-                    f"Bu iyi bir başlangıç. {next_question}"
-                ]
-                return random.choice(med_responses)
-            
-            # İyi puan (60+) ama hala detay gerekiyor
-            else:
-                high_responses = [
-                    f"Çok güzel bir perspektif. {next_question}",
-                    f"İlginç bir bakış açısı. {next_question}",
-                    f"Bu gerçekten değerli bir bilgi. {next_question}",
-                    f"Harika. {next_question}"
-                ]
-                return random.choice(high_responses)
+            return [(choose_reply_prefix(satisfaction_score), True), (next_question, False)]
         
         # Maksimum deneme sayısına ulaşıldıysa veya yanıt tatmin ediciyse
         if stage.id == session.stages[-1].id:  # Son aşamadaysa
-            return "Bu bilgiler için teşekkür ederim. Görüşmemizi burada sonlandırabiliriz. Değerlendirme sonucunu yakında sizinle paylaşacağız."
+            return [(FINAL_STAGE_THANKS, True)]
         else:
             # Bir sonraki aşamaya doğal geçiş
             next_stage = session.stages[session.current_stage_index + 1]
-            transition_phrases = {
-                "experience": "Anladım, teşekkür ederim. Peki, daha önceki iş deneyimlerinizle ilgili biraz konuşabilir miyiz?",
-                "technical": "Teşekkürler. Şimdi biraz teknik bilgi ve becerilerinizden bahsedelim.",
-                "behavioral": "İş deneyimleriniz etkileyici. Peki, zorlu durumlarla nasıl başa çıktığınız hakkında konuşabilir miyiz?",
-                "company_fit": "Anladım. Şimdi, kariyer hedefleriniz ve şirket kültürüyle ilgili beklentileriniz neler?",
-                "questions": "Harika, teşekkürler. Son olarak, bana sormak istediğiniz herhangi bir soru var mı?"
-            }
-            
-            return transition_phrases.get(next_stage.id, "Şimdi başka bir konuya geçelim.")
+            return [(STAGE_COMPLETE_TRANSITIONS.get(next_stage.stage_key, DEFAULT_STAGE_COMPLETE_TRANSITION), True)]
     
     # Varsayılan yanıt
-    return "Biraz daha detaylı bilgi verebilir misiniz?"
+    return [(DEFAULT_FOLLOW_UP, True)]
+
+def join_segments(segments: List[ReplySegment]) -> str:
+    """Yanıt parçalarını tek metin olarak birleştirir"""
+    return " ".join(text for text, _ in segments if text)
+
+def format_bot_response(session: SessionState, stage: StageState, is_new_stage: bool, evaluation: Optional[dict] = None) -> str:
+    """Bot yanıtını uygun şekilde biçimlendirir"""
+    return join_segments(format_bot_segments(session, stage, is_new_stage, evaluation))
+
+async def send_reply_audio(sender: AudioSender, segments: List[ReplySegment], stream: bool = False,
+                           profile: AudioProfile = DEFAULT_AUDIO_PROFILE, voice_id: str = DEFAULT_VOICE_ID,
+                           completed: bool = False):
+    """Yanıtı parça parça seslendirip Unity'ye gönderir.
+    
+    Parçalar paralel sentezlenir; sabit parçalar önbellekten anında gelir. Akış modundaki
+    istemciler her parçayı sırayla "audio_chunk" olarak alır, diğerleri için parçalar MP3
+    çerçeve sınırlarından birleştirilip tek "audio" mesajı olarak gönderilir.
+    """
+    segments = [(text, static) for text, static in segments if text]
+    tasks = [
+        asyncio.create_task(text_to_speech(text, voice_id=voice_id, pin=static, profile=profile))
+        for text, static in segments
+    ]
+    
+    if stream:
+        message_id = sender.new_message_id()
+        index = 0
+        for (text, _), task in zip(segments, tasks):
+            audio_data = await task
+            if audio_data:
+                await sender.send_chunk(message_id, index, audio_data, text)
+                index += 1
+        await sender.end_stream(message_id, index, join_segments(segments), completed=completed)
+        return
+    
+    audio_parts = [audio for audio in await asyncio.gather(*tasks) if audio]
+    if audio_parts:
+        await sender.send_audio(concat_audio(audio_parts, profile))
+
+async def stream_evaluation_to_client(session: SessionState, stage: StageState, message: str, sender: AudioSender,
+                                      profile: AudioProfile = DEFAULT_AUDIO_PROFILE) -> Tuple[dict, Optional[str]]:
+    """Değerlendirmeyi akış halinde alır ve sıradaki soruyu cümle cümle seslendirip gönderir.
+    
+    Aşama bu turda tamamlanmayacaksa yanıt "geçiş ifadesi + soru" biçiminde olur; bu durumda
+    her cümle Gemini yanıtı bitmeden TTS'e verilir ve hazır olduğu sırayla WebSocket'e yazılır.
+    İkinci dönüş değeri seslendirilen yanıttır; hiçbir şey seslendirilmediyse None döner ve
+    yanıt normal yoldan oluşturulur.
+    """
+    prompt, chat_for_context = build_evaluation_request(session, stage, message)
+    extractor = JsonStringFieldExtractor("next_question")
+    splitter = SentenceSplitter()
+    audio_queue: asyncio.Queue = asyncio.Queue()
+    raw_chunks: List[str] = []
+    question_parts: List[str] = []
+    prefix = None
+    score = None
+    speaking = None  # None: henüz karar verilmedi
+    failure: Optional[GeminiError] = None
+    
+    def enqueue(text: str, static: bool = False):
+        # Sentez hemen başlar, gönderim sırası kuyruk sırasıdır
+        audio_queue.put_nowait((text, asyncio.create_task(
+            text_to_speech(text, voice_id=session.voice_id, pin=static, profile=profile)
+        )))
+    
+    message_id = sender.new_message_id()
+    sent_chunks = 0
+    
+    async def deliver():
+        nonlocal sent_chunks
+        while True:
+            item = await audio_queue.get()
+            if item is None:
+                break
+            text, task = item
+            audio_data = await task
+            if audio_data:
+                await sender.send_chunk(message_id, sent_chunks, audio_data, text)
+                sent_chunks += 1
+    
+    delivery = asyncio.create_task(deliver())
+    try:
+        async for chunk in stream_with_gemini(
+            prompt, chat_for_context,
+            instructions=EVALUATION_INSTRUCTIONS, generation_config=EVALUATION_OUTPUT.generation_config
+        ):
+            raw_chunks.append(chunk)
+            question_part = extractor.feed(chunk)
+            
+            if speaking is None and extractor.started:
+                # Puan ve aşama durumu, şemaya göre next_question alanından önce gelir
+                score = clamp_score(extract_json_scalar(extractor.buffer, "satisfaction_score"))
+                raw_complete = extract_json_scalar(extractor.buffer, "stage_complete")
+                speaking = (
+                    score is not None
+                    and raw_complete == "false"
+                    and stage.attempts + 1 < 3
+                )
+                if speaking:
+                    prefix = choose_reply_prefix(score)
+                    enqueue(prefix, static=True)
+            
+            if speaking and question_part:
+                question_parts.append(question_part)
+                for sentence in splitter.feed(question_part):
+                    enqueue(sentence)
+        
+        if speaking:
+            for sentence in splitter.flush():
+                enqueue(sentence)
+    except GeminiError as e:
+        if speaking:
+            failure = e
+        else:
+            # Henüz bir şey seslendirilmediyse akışsız değerlendirmeye dönülür
+            logger.warning("Akış hatası, normal değerlendirmeye dönülüyor: %s", e)
+            raw_chunks = None
+    finally:
+        audio_queue.put_nowait(None)
+        try:
+            await delivery
+        except Exception as e:
+            logger.warning("Akış sesi gönderme hatası: %s", e)
+    
+    if failure is not None:
+        # Seslendirme yarıda kaldı; istemci bekleyen akışı kapatabilsin diye hata ve stream_complete gönderilir
+        try:
+            await sender.send_error(STREAM_ERROR_MESSAGE)
+            await sender.end_stream(message_id, sent_chunks, f"{prefix} {''.join(question_parts)}".strip())
+        except Exception as e:
+            logger.warning("Akış kapatılamadı: %s", e)
+        raise failure
+    
+    if raw_chunks is None:
+        return await evaluate_response(session, stage, message), None
+    
+    if not speaking:
+        return await parse_evaluation("".join(raw_chunks)), None
+    
+    # Seslendirilen içerik esas alınır; tüm alanlar akıştan okunduğu için ayrıca ayrıştırılmaz
+    next_question = "".join(question_parts).strip()
+    evaluation = {
+        "satisfaction_score": score,
+        "stage_complete": False,
+        "next_question": next_question
+    }
+    spoken_response = f"{prefix} {next_question}"
+    
+    try:
+        await sender.end_stream(message_id, sent_chunks, spoken_response)
+    except Exception as e:
+        logger.warning("Akış tamamlama bildirimi gönderilemedi: %s", e)
+    
+    return evaluation, spoken_response
 
 @app.get("/")
 async def root():
@@ -598,69 +1118,123 @@ async def start_interview(request: InterviewRequest):
         # Varsayılan aşamaları oluştur
         stages = []
         for i, stage_info in enumerate(DEFAULT_INTERVIEW_STAGES):
-            stage = InterviewStage(
+            stage = StageState(
                 id=str(uuid.uuid4()),  # Her aşama için benzersiz ID
+                stage_key=stage_info["id"],
                 name=stage_info["name"],
                 description=stage_info["description"],
-                status=StageStatus.NOT_STARTED,
-                questions=[]
+                status=StageStatus.NOT_STARTED
             )
             stages.append(stage)
         
         # Yeni oturum oluştur
-        session = InterviewSession(
+        session = SessionState(
             id=session_id,
             position=request.position,
             candidate_name=request.candidate_name,
-            stages=stages
+            stages=stages,
+            voice_id=request.voice_id or DEFAULT_VOICE_ID
         )
         
         # Oturumu sakla
-        interview_sessions[session_id] = session
+        await session_store.create(session_id, session)
+        session_janitor.active.inc()
+        
+        # İlk aşama sürerken ikinci aşamanın sorularını hazırla
+        prefetch_next_stage_questions(session)
         
         return InterviewResponse(
             session_id=session_id,
             message="Mülakat başlatıldı",
-            current_stage=session.stages[0],
+            current_stage=session.stages[0].to_dict(),
             is_completed=False
         )
     except Exception as e:
-        print(f"start_interview hatası: {str(e)}")
+        logger.exception("start_interview hatası: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/send-message", response_model=InterviewResponse)
-async def send_message(request: MessageRequest):
-    """Adayın mesajını işler ve yanıt döner"""
-    
-    session_id = request.session_id
+async def run_turn(session_id: str, message: str, reply_to: Optional[str] = None,
+                   message_id: Optional[str] = None) -> InterviewResponse:
+    """Bir mülakat turunu yürütür: tek değerlendirme, tek sentez, tek gönderim.
+    
+    REST ve WebSocket mesajları bu yoldan geçer. Ses, reply_to (verilmezse oturum
+    kimliği) ile açılmış WebSocket bağlantısı varsa yalnızca ona, oturumun sesiyle
+    ve bağlantının seçtiği profil ile gönderilir. Aynı oturumun turları oturum kilidi
+    altında sırayla işlenir; daha önce işlenmiş bir message_id için kayıtlı yanıt döner.
+    """
+    async with session_locks.hold(session_id):
+        turns_in_progress.inc()
+        try:
+            with turn_seconds.time():
+                return await _run_turn(session_id, message, reply_to, message_id)
+        finally:
+            turns_in_progress.dec()
+
+def replayed_response(session: SessionState, reply: Dict[str, Any]) -> InterviewResponse:
+    """Daha önce işlenmiş bir mesajın kayıtlı yanıtını döndürür"""
+    return InterviewResponse(
+        session_id=session.id,
+        message=reply["message"],
+        current_stage=session.stages[reply["stage_index"]].to_dict(),
+        is_completed=reply["completed"],
+        overall_feedback=(session.overall_feedback or None) if reply["completed"] else None
+    )
+
+def remember_reply(session: SessionState, message_id: str, message: str, stage_index: int):
+    session.replies[message_id] = {
+        "message": message,
+        "stage_index": stage_index,
+        "completed": session.completed
+    }
+    while len(session.replies) > IDEMPOTENCY_KEYS_PER_SESSION:
+        del session.replies[next(iter(session.replies))]
+
+async def _run_turn(session_id: str, message: str, reply_to: Optional[str],
+                    message_id: Optional[str]) -> InterviewResponse:
+    target = reply_to or session_id
+    # Tur sürerken bağlantı koparsa ses kanalın tamponuna yazılır, istemci yeniden bağlanınca alır
+    channel = connections.get(target)
+    sender = channel.sender if channel is not None else None
+    options = channel.options if channel is not None else {}
+    profile = options.get("profile", DEFAULT_AUDIO_PROFILE)
     
     # Mülakat oturumunu kontrol et
-    if session_id not in interview_sessions:
+    loaded = await session_store.get(session_id)
+    if loaded is None:
         raise HTTPException(status_code=404, detail="Mülakat oturumu bulunamadı")
     
-    session = interview_sessions[session_id]
+    session, version = loaded
     
-    # Mülakat tamamlandıysa sadece geri bildirim döndür
+    # İstemcinin yeniden denemesi: Gemini ve TTS tekrar çağrılmadan kayıtlı yanıt döner
+    if message_id and message_id in session.replies:
+        turn_duplicates.inc()
+        return replayed_response(session, session.replies[message_id])
+    
+    # Mülakat tamamlandıysa sadece geri bildirim döndür (rapor hazır değilse bitiş mesajı)
     if session.completed:
         return InterviewResponse(
             session_id=session_id,
-            message=session.overall_feedback,
-            current_stage=session.stages[session.current_stage_index],
+            message=session.overall_feedback or COMPLETION_MESSAGE,
+            current_stage=session.stages[session.current_stage_index].to_dict(),
             is_completed=True,
-            overall_feedback=session.overall_feedback
+            overall_feedback=session.overall_feedback or None
         )
     
     # Adayın mesajını sohbet geçmişine ekle
-    session.chat_history.append({
-        "content": request.message,
-        "is_user": True,
-        "timestamp": "now"
-    })
+    answered_index = session.current_stage_index
+    current_stage = session.stages[answered_index]
     
-    current_stage = session.stages[session.current_stage_index]
+    session.chat_history.append(message, True, answered_index, current_stage.attempts + 1)
     
-    # Yanıtı değerlendir
-    evaluation = evaluate_response(session, current_stage, request.message)
+    # Yanıtı değerlendir; akış modundaki istemcilere soru cümle cümle seslendirilir
+    spoken_response = None
+    with turn_evaluation_seconds.time():
+        if sender is not None and options.get("stream"):
+            evaluation, spoken_response = await stream_evaluation_to_client(
+                session, current_stage, message, sender, profile=profile
+            )
+        else:
+            evaluation = await evaluate_response(session, current_stage, message)
     
     # Satisfaction score'u güncelle (ortalama olarak)
     if current_stage.satisfaction_score == 0:
@@ -681,103 +1255,309 @@ async def send_message(request: MessageRequest):
             next_stage = session.stages[session.current_stage_index]
             next_stage.status = StageStatus.IN_PROGRESS
             
-            # Sonraki aşama için soruları oluştur
-            next_stage.questions = generate_stage_questions(
-                session.position, 
-                next_stage,
-                session.candidate_name
-            )
+            # Sonraki aşama için önceden üretilen soruları al, hazır değilse şimdi oluştur
+            with turn_question_seconds.time():
+                questions = await question_prefetcher.take(session_id, session.current_stage_index)
+                if questions is None:
+                    questions = await get_stage_questions(
+                        session.position, 
+                        next_stage,
+                        session.candidate_name
+                    )
+            next_stage.questions = intern_questions(questions)
+            
+            # Bu aşama sürerken bir sonrakinin sorularını hazırla
+            prefetch_next_stage_questions(session)
             
             current_stage = next_stage
             is_new_stage = True
         else:
-            # Mülakat tamamlandı
+            # Mülakat tamamlandı; rapor, oturum kaydedildikten sonra arka planda bir kez üretilir
             session.completed = True
-            session.overall_feedback = generate_interview_completion(session)
+            session.report_status = ReportStatus.PENDING
+            question_prefetcher.cancel_session(session_id)
     
     # Bot yanıtını oluştur
+    segments: List[ReplySegment] = []
     if session.completed:
         # Değerlendirme raporunu sesli okumak yerine kısa bir bitiş mesajı göster
-        completion_message = "Mülakat tamamlandı. Değerlendirme raporunuz hazırlanıyor. İlginiz ve zamanınız için teşekkür ederiz. Görüşmek üzere!"
-        bot_response = completion_message
-        # Değerlendirme raporu hala saklanıyor ama sesli okunmuyor
-        session.overall_feedback = generate_interview_completion(session)
+        segments = [(COMPLETION_MESSAGE, True)]
+        bot_response = COMPLETION_MESSAGE
+    elif spoken_response is not None:
+        bot_response = spoken_response
     else:
-        bot_response = format_bot_response(session, current_stage, is_new_stage, evaluation)
+        segments = format_bot_segments(session, current_stage, is_new_stage, evaluation)
+        bot_response = join_segments(segments)
     
     # Bot yanıtını sohbet geçmişine ekle
-    session.chat_history.append({
-        "content": bot_response,
-        "is_user": False,
-        "timestamp": "now"
-    })
-    
-    # Oturumu güncelle
-    interview_sessions[session_id] = session
-    
-    # WebSocket üzerinden ses yanıtı gönder
-    if session_id in active_connections:
-        websocket = active_connections[session_id]
+    session.chat_history.append(bot_response, False, answered_index, session.stages[answered_index].attempts)
+    
+    if message_id:
+        remember_reply(session, message_id, bot_response, session.current_stage_index)
+    
+    # Oturumu güncelle; okunduktan sonra başka bir worker güncellediyse bu tur reddedilir
+    try:
+        await session_store.update(session_id, session, version)
+    except ConcurrentUpdateError:
+        raise HTTPException(status_code=409, detail="Oturum eşzamanlı olarak güncellendi, lütfen tekrar deneyin")
+    except SessionNotFoundError:
+        # Tur sürerken oturum tahliye edildi
+        raise HTTPException(status_code=404, detail="Mülakat oturumu bulunamadı")
+    
+    feed_notifier.notify(session_id)
+    stage_summarizer.schedule(session_id, answered_index)
+    
+    if session.completed and session.report_status == ReportStatus.PENDING:
+        report_manager.start(session)
+    
+    # WebSocket üzerinden ses yanıtı gönder (akışla seslendirildiyse tekrar gönderilmez)
+    if sender is not None and spoken_response is None:
         try:
-            audio_data = text_to_speech(bot_response)
-            if audio_data:
-                await websocket.send_json({
-                    'type': 'audio',
-                    'data': base64.b64encode(audio_data).decode('utf-8')
-                })
-                print(f"Ses yanıtı WebSocket üzerinden gönderildi: {bot_response[:50]}...")
+            with turn_audio_seconds.time():
+                await send_reply_audio(
+                    sender, segments,
+                    stream=options.get("stream", False),
+                    profile=profile,
+                    voice_id=session.voice_id,
+                    completed=session.completed
+                )
         except Exception as e:
-            print(f"Ses yanıtı gönderme hatası: {str(e)}")
+            logger.warning("Ses yanıtı gönderme hatası (%s): %s", target, e)
     
     return InterviewResponse(
         session_id=session_id,
         message=bot_response,
-        current_stage=current_stage,
+        current_stage=current_stage.to_dict(),
         is_completed=session.completed,
-        overall_feedback=session.overall_feedback if session.completed else None
+        overall_feedback=(session.overall_feedback or None) if session.completed else None
     )
 
-@app.get("/interview/{session_id}", response_model=InterviewSession)
+@app.post("/send-message", response_model=InterviewResponse)
+async def send_message(request: MessageRequest, idempotency_key: Optional[str] = Header(None)):
+    """Adayın mesajını işler ve yanıt döner.
+    
+    message_id (veya Idempotency-Key başlığı) verilirse aynı kimlikle tekrar gelen istek
+    yeniden işlenmez, ilk yanıt döner.
+    """
+    try:
+        return await run_turn(request.session_id, request.message, message_id=request.message_id or idempotency_key)
+    except GeminiError as e:
+        # Tur kaydedilmedi; aday aynı mesajı (aynı message_id ile) tekrar gönderebilir
+        logger.warning("Tur işlenemedi (%s): %s", request.session_id, e)
+        headers = {"Retry-After": str(max(1, int(e.retry_after)))} if e.retry_after else None
+        raise HTTPException(
+            status_code=503, detail="Değerlendirme şu anda yapılamıyor, lütfen tekrar deneyin", headers=headers
+        )
+
+@app.get("/interview/{session_id}", response_model=None, responses={200: {"model": InterviewSession}})
 async def get_interview(session_id: str):
-    """Mülakat oturumu bilgilerini döndürür"""
+    """Mülakat oturumu bilgilerini döndürür.
+    
+    Yanıt şeması InterviewSession'dır (OpenAPI'de belgelenir); oturum Pydantic modeline
+    çevrilmeden, yalnızca dışarı açık alanlarıyla doğrudan JSON'a yazılır. Yanıt
+    kayıtları ve teslim imleci gibi iç alanlar dışarı verilmez.
+    """
     
-    if session_id not in interview_sessions:
+    loaded = await session_store.get(session_id)
+    if loaded is None:
         raise HTTPException(status_code=404, detail="Mülakat oturumu bulunamadı")
     
-    return interview_sessions[session_id]
+    return Response(content=state_codec.dumps_public(loaded[0]), media_type="application/json")
+
+@app.get("/interview/{session_id}/report", response_model=ReportResponse)
+async def get_report(session_id: str, retry: bool = False):
+    """Değerlendirme raporunun durumunu döndürür; retry=true ile başarısız iş yeniden başlatılır"""
+    
+    loaded = await session_store.get(session_id)
+    if loaded is None:
+        raise HTTPException(status_code=404, detail="Mülakat oturumu bulunamadı")
+    
+    session, version = loaded
+    if retry and session.completed and session.report_status == ReportStatus.FAILED:
+        session.report_status = ReportStatus.PENDING
+        try:
+            await session_store.update(session_id, session, version)
+            report_manager.start(session)
+        except ConcurrentUpdateError:
+            # Başka bir istek işi zaten yeniden başlattı
+            pass
+        except SessionNotFoundError:
+            raise HTTPException(status_code=404, detail="Mülakat oturumu bulunamadı")
+    
+    return ReportResponse(
+        session_id=session_id,
+        status=session.report_status,
+        overall_feedback=session.overall_feedback or None
+    )
+
+@app.get("/interview/{session_id}/messages", response_model=MessageFeedResponse)
+async def get_messages(session_id: str, since: int = 0, wait: float = 0):
+    """since imlecinden sonraki tüm mesajları tek yanıtta döndürür; geçmişi değiştirmez.
+    
+    wait > 0 ise yeni mesaj yoksa en fazla o kadar saniye (FEED_MAX_WAIT ile sınırlı)
+    beklenir (uzun sorgu). Yanıttaki cursor bir sonraki istekte since olarak gönderilir.
+    """
+    feed_notifier.polls.inc()
+    deadline = time.monotonic() + min(max(wait, 0), FEED_MAX_WAIT)
+    async with feed_notifier.listen(session_id) as feed:
+        while True:
+            # Sayaç okumadan önce alınır; arada kaydedilen tur beklemeyi hemen bitirir
+            seen = feed.version
+            loaded = await session_store.get(session_id)
+            if loaded is None:
+                raise HTTPException(status_code=404, detail="Mülakat oturumu bulunamadı")
+            session = loaded[0]
+            since = min(max(since, 0), len(session.chat_history))
+            messages = session.chat_history.since(since)
+            remaining = deadline - time.monotonic()
+            if messages or session.completed or remaining <= 0:
+                break
+            await feed.wait(seen, min(remaining, FEED_KEEPALIVE))
+    
+    return MessageFeedResponse(
+        session_id=session_id,
+        messages=messages,
+        cursor=len(session.chat_history),
+        is_completed=session.completed
+    )
+
+@app.get("/interview/{session_id}/events")
+async def stream_messages(session_id: str, since: int = 0, last_event_id: Optional[str] = Header(None)):
+    """Yeni mesajları Server-Sent Events olarak iletir.
+    
+    Her mesaj sıra numarasını olay kimliği olarak taşır; bağlantı koptuğunda istemci
+    Last-Event-ID ile kaldığı yerden devam eder. Mülakat tamamlanınca "end" olayı
+    gönderilip akış kapatılır.
+    """
+    if await session_store.get(session_id) is None:
+        raise HTTPException(status_code=404, detail="Mülakat oturumu bulunamadı")
+    
+    cursor = parse_cursor(since, last_event_id)
+    feed_notifier.streams.inc()
+    
+    async def events():
+        position = cursor
+        async with feed_notifier.listen(session_id) as feed:
+            while True:
+                seen = feed.version
+                loaded = await session_store.get(session_id)
+                if loaded is None:
+                    return
+                session = loaded[0]
+                for message in session.chat_history.since(min(position, len(session.chat_history))):
+                    yield sse_event(message, event_id=message["seq"])
+                position = len(session.chat_history)
+                if session.completed:
+                    yield sse_event({"cursor": position}, event="end")
+                    return
+                if not await feed.wait(seen, FEED_KEEPALIVE):
+                    # Ara sunucular boşta kalan bağlantıyı kapatmasın
+                    yield ": keepalive\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/status")
 async def status():
     return {"status": "online"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus formatında süreç metriklerini döndürür"""
+    return PlainTextResponse(registry.render())
+
+@app.get("/sessions/stats")
+async def session_stats():
+    """Oturum deposunun boyutunu ve tahliye ayarlarını döndürür"""
+    return {
+        "backend": SESSION_STORE,
+        "sessions": await session_store.count(),
+        "approx_bytes": await session_store.approx_bytes(),
+        "idle_ttl_seconds": session_janitor.idle_ttl,
+        "max_sessions": session_janitor.max_sessions,
+        "archive_enabled": session_janitor.archiver is not None,
+    }
+
+@app.post("/batch/evaluate")
+async def batch_evaluate(request: Request):
+    """JSONL (session, stage, answer) kayıtlarını puanlar ve sonuçları JSONL olarak akıtır.
+    
+    Oturumlar değiştirilmez, seslendirme yapılmaz. Sonuçlar bitiş sırasıyla gelir; her
+    satır girdideki "id" (yoksa "line-N") ile eşleşir. Büyük işler için batch.py CLI'ı kullanılır.
+    """
+    body = (await request.body()).decode("utf-8")
+    items = list(parse_lines(body.splitlines()))
+    if len(items) > BATCH_MAX_RECORDS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Tek istekte en fazla {BATCH_MAX_RECORDS} kayıt gönderilebilir; daha büyük işler için batch.py kullanın"
+        )
+    
+    async def results():
+        async for result in batch_evaluator.run(items):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
 @app.post("/text-to-speech")
-async def generate_speech(request: TextToSpeechRequest):
-    """Metni sese dönüştürür ve base64 formatında döndürür"""
+async def generate_speech(request: TextToSpeechRequest, http_request: Request):
+    """Metni sese dönüştürür ve base64 formatında döndürür.
+    
+    İstek, seçilen profilin biçimini (ör. "Accept: audio/mpeg") veya "audio/*" kabul
+    ediyorsa ses base64'e çevrilmeden ham olarak döner.
+    """
     try:
-        audio_data = text_to_speech(request.text)
+        profile = resolve_profile(request.profile)
+        audio_data = await text_to_speech(request.text, profile=profile)
         if not audio_data:
             raise HTTPException(status_code=500, detail="Ses oluşturulamadı")
         
+        accept = http_request.headers.get("accept", "")
+        if profile.media_type.split(";")[0] in accept or "audio/*" in accept:
+            return Response(content=audio_data, media_type=profile.media_type)
+        
         return {
             "success": True,
-            "audio": base64.b64encode(audio_data).decode('utf-8')
+            "audio": base64.b64encode(audio_data).decode('utf-8'),
+            "audio_profile": profile.name
         }
     except Exception as e:
-        print(f"hata: {str(e)}")
+        logger.exception("TTS isteği başarısız: %s", e)
         raise HTTPException(status_code=500, detail=f"TTS hatası: {str(e)}")
 
 
 
 @app.get("/get-message")
 async def get_message(session_id: str):
-    if session_id not in interview_sessions:
+    """Teslim edilmemiş ilk mesajı döndürür (mesaj başına sorgulayan eski istemciler için).
+    
+    Sohbet geçmişi değişmez, yalnızca oturumun teslim imleci ilerler. Yeni istemciler
+    /interview/{session_id}/messages veya /interview/{session_id}/events kullanmalıdır.
+    """
+    loaded = await session_store.get(session_id)
+    if loaded is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if loaded[0].delivered >= len(loaded[0].chat_history):
+        return None
+    
+    delivered = []
+    
+    def advance(interview: SessionState):
+        delivered.clear()
+        if interview.delivered < len(interview.chat_history):
+            delivered.append(interview.chat_history[interview.delivered].to_dict())
+            interview.delivered += 1
+    
+    try:
+        async with session_locks.hold(session_id):
+            await session_store.mutate(session_id, advance)
+    except SessionNotFoundError:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    interview = interview_sessions[session_id]
-    if interview.chat_history:
-        message = interview.chat_history.pop(0)
-        return message
-    return None
+    return delivered[0] if delivered else None
 
 if __name__ == "__main__":
     uvicorn.run("api:app", host="0.0.0.0", port=8001, reload=True) 
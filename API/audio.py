@@ -0,0 +1,76 @@
+from typing import List, Optional
+
+
+# MPEG Layer III bit hızı tabloları (kbps); indeks 0 "free", 15 geçersiz
+_BITRATES_V1 = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0]
+_BITRATES_V2 = [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0]
+_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG 1
+    2: [22050, 24000, 16000],  # MPEG 2
+    0: [11025, 12000, 8000],   # MPEG 2.5
+}
+
+
+def _strip_id3(data: bytes) -> bytes:
+    """Baştaki ID3v2 ve sondaki ID3v1 etiketlerini atar"""
+    start = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        start = 10 + size + (10 if data[5] & 0x10 else 0)
+    end = len(data)
+    if end - start >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    return data[start:end]
+
+
+def _frame_length(header: bytes) -> Optional[int]:
+    """Layer III çerçeve başlığından çerçeve uzunluğunu hesaplar; geçersizse None döner"""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    if version == 1 or layer != 1:
+        return None
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    if bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    padding = (header[2] >> 1) & 0x01
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    if version == 3:
+        return 144000 * _BITRATES_V1[bitrate_index] // sample_rate + padding
+    return 72000 * _BITRATES_V2[bitrate_index] // sample_rate + padding
+
+
+def _is_info_frame(frame: bytes) -> bool:
+    """Çerçevenin Xing/Info/VBRI süre başlığı olup olmadığını kontrol eder"""
+    version = (frame[1] >> 3) & 0x03
+    mono = (frame[3] >> 6) == 3
+    if version == 3:
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+    tag = frame[4 + side_info:8 + side_info]
+    return tag in (b"Xing", b"Info") or frame[36:40] == b"VBRI"
+
+
+def concat_mp3(segments: List[bytes]) -> bytes:
+    """MP3 parçalarını çerçeve sınırlarından birleştirir.
+
+    Etiketler ve parçaların kendi süre başlıkları (Xing/Info) atılır; aksi halde
+    oynatıcı yalnızca ilk parçanın süresini görüp birleşik sesi erken kesebilir.
+    """
+    output = []
+    for segment in segments:
+        data = _strip_id3(segment)
+        # İlk geçerli çerçeveyi bul
+        offset = 0
+        while offset + 4 <= len(data) and _frame_length(data[offset:offset + 4]) is None:
+            offset += 1
+        if offset + 4 > len(data):
+            continue
+        length = _frame_length(data[offset:offset + 4])
+        if _is_info_frame(data[offset:offset + length]):
+            offset += length
+        output.append(data[offset:])
+    return b"".join(output)
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import shutil
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from audio import concat_mp3
+from logs import get_logger
+from metrics import registry
+from ws_protocol import AudioCodec
+
+
+logger = get_logger(__name__)
+
+FFMPEG_PATH = os.getenv("FFMPEG_PATH", "ffmpeg")
+FFMPEG_TIMEOUT = float(os.getenv("FFMPEG_TIMEOUT", "15"))
+
+transcodes = registry.counter("audio_transcodes_total", "ffmpeg ile dönüştürülen ses klipleri")
+transcode_failures = registry.counter("audio_transcode_failures_total", "Başarısız ses dönüştürmeleri")
+
+
+class TranscodeError(Exception):
+    """ffmpeg bulunamadığında veya dönüştürme başarısız olduğunda fırlatılır"""
+
+
+@dataclass(frozen=True)
+class AudioProfile:
+    """İstemcinin bağlantıda seçtiği ses biçimi.
+
+    output_format ElevenLabs'ten istenen biçimdir. ffmpeg_args tanımlıysa sağlayıcı bu
+    biçimi doğrudan vermez; ses output_format ile alınıp sunucuda dönüştürülür.
+    """
+
+    name: str
+    output_format: str
+    codec: AudioCodec
+    media_type: str
+    ffmpeg_args: Optional[Tuple[str, ...]] = None
+
+    @property
+    def cache_format(self) -> str:
+        # Dönüştürülen kliplerin anahtarı profil adıyla ayrılır; varsayılan profilin
+        # anahtarı değişmediği için mevcut disk önbelleği geçerli kalır
+        return self.output_format if self.ffmpeg_args is None else self.name
+
+    @property
+    def needs_transcode(self) -> bool:
+        return self.ffmpeg_args is not None
+
+
+AUDIO_PROFILES: Dict[str, AudioProfile] = {
+    profile.name: profile
+    for profile in [
+        # Mevcut davranış; Unity sürümleri bu profili kullanır
+        AudioProfile("mp3_high", "mp3_44100_128", AudioCodec.MP3, "audio/mpeg"),
+        # Tek konuşmacı için yeterli, zayıf istemcilerde bant genişliği ve çözme maliyeti düşük
+        AudioProfile("mp3_low", "mp3_22050_32", AudioCodec.MP3, "audio/mpeg"),
+        AudioProfile(
+            "opus_low", "pcm_16000", AudioCodec.OPUS, "audio/ogg",
+            ffmpeg_args=("-c:a", "libopus", "-b:a", "24k", "-application", "voip", "-f", "ogg"),
+        ),
+        # Dudak senkronu için başlıksız 16 kHz, 16 bit, mono PCM
+        AudioProfile("pcm_16000", "pcm_16000", AudioCodec.PCM_S16LE, "audio/L16;rate=16000"),
+    ]
+}
+DEFAULT_AUDIO_PROFILE = AUDIO_PROFILES[os.getenv("DEFAULT_AUDIO_PROFILE", "mp3_high")]
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which(FFMPEG_PATH) is not None
+
+
+def resolve_profile(name: Optional[str]) -> AudioProfile:
+    """İstenen profili döndürür; bilinmiyorsa veya ffmpeg gerektirip ffmpeg yoksa varsayılana düşer"""
+    profile = AUDIO_PROFILES.get((name or "").lower())
+    if profile is None:
+        return DEFAULT_AUDIO_PROFILE
+    if profile.needs_transcode and not ffmpeg_available():
+        logger.warning("ffmpeg bulunamadı, '%s' yerine '%s' kullanılıyor", profile.name, DEFAULT_AUDIO_PROFILE.name)
+        return DEFAULT_AUDIO_PROFILE
+    return profile
+
+
+def _input_args(output_format: str) -> List[str]:
+    """ElevenLabs biçim adından ffmpeg giriş parametrelerini üretir ("pcm_16000" -> s16le, 16 kHz)"""
+    container, _, rate = output_format.partition("_")
+    if container == "pcm":
+        return ["-f", "s16le", "-ar", rate.split("_")[0], "-ac", "1"]
+    return ["-f", container]
+
+
+async def transcode(audio: bytes, source_format: str, profile: AudioProfile) -> bytes:
+    """Sesi source_format biçiminden profilin biçimine ffmpeg ile dönüştürür"""
+    if not profile.needs_transcode:
+        return audio
+    try:
+        process = await asyncio.create_subprocess_exec(
+            FFMPEG_PATH, "-hide_banner", "-loglevel", "error",
+            *_input_args(source_format), "-i", "pipe:0",
+            *profile.ffmpeg_args, "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    except FileNotFoundError as e:
+        transcode_failures.inc()
+        raise TranscodeError("ffmpeg bulunamadı") from e
+
+    try:
+        output, error = await asyncio.wait_for(process.communicate(audio), timeout=FFMPEG_TIMEOUT)
+    except asyncio.TimeoutError:
+        process.kill()
+        transcode_failures.inc()
+        raise TranscodeError(f"Ses dönüştürme süresi aşıldı ({FFMPEG_TIMEOUT} sn)")
+
+    if process.returncode != 0 or not output:
+        transcode_failures.inc()
+        raise TranscodeError(f"ffmpeg hatası: {error.decode('utf-8', 'replace').strip()}")
+    transcodes.inc()
+    return output
+
+
+def concat_audio(segments: List[bytes], profile: AudioProfile) -> bytes:
+    """Aynı profildeki ses parçalarını tek klip olarak birleştirir"""
+    if profile.codec == AudioCodec.MP3:
+        return concat_mp3(segments)
+    # PCM başlıksızdır; Ogg ise art arda eklenen akışları (chained stream) destekler
+    return b"".join(segments)
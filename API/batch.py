@@ -0,0 +1,279 @@
+import argparse
+import asyncio
+import glob
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import (
+    Any, AsyncIterator, Awaitable, Callable, Dict, Generic, Iterable, List, Optional, Set, Tuple, TypeVar, Union
+)
+
+from pydantic import BaseModel, ValidationError
+
+from interview_state import ChatHistory, NO_STAGE
+from metrics import registry
+from session_store import SESSION_ARCHIVE_DIR, SessionNotFoundError
+
+
+S = TypeVar("S")
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+# HTTP üzerinden tek istekte kabul edilen en fazla kayıt; büyük işler CLI ile çalıştırılır
+BATCH_MAX_RECORDS = int(os.getenv("BATCH_MAX_RECORDS", "1000"))
+BATCH_SESSION_CACHE = int(os.getenv("BATCH_SESSION_CACHE", "256"))
+
+
+class BatchRecord(BaseModel):
+    """Puanlanacak tek yanıt.
+
+    session bir oturum kimliği (depoda veya arşivde aranır) ya da arşivlenmiş oturumun
+    JSON'u olabilir; stage aşama kimliği veya sırasıdır. history verilmezse oturum
+    geçmişi yanıtın kaydedildiği mesaja kadar kesilerek kullanılır.
+    """
+    id: Optional[str] = None
+    session: Union[str, Dict[str, Any]]
+    stage: Union[int, str]
+    answer: str
+    history: Optional[List[Dict[str, Any]]] = None
+
+
+def history_until(history: ChatHistory, answer: str, stage_index: Optional[int] = None) -> ChatHistory:
+    """Yanıt anındaki sohbet geçmişini döndürür; yanıt geçmişte yoksa sona eklenir"""
+    for i in range(len(history) - 1, -1, -1):
+        msg = history[i]
+        if not msg.is_user or msg.content != answer:
+            continue
+        if stage_index is None or msg.stage in (stage_index, NO_STAGE):
+            return history[:i + 1]
+    history = history.copy()
+    history.append(answer, True, stage_index)
+    return history
+
+
+def find_archived(directory: str, session_id: str) -> Optional[str]:
+    """Arşivdeki (gün klasörleri altındaki) en yeni oturum dosyasının yolunu döndürür"""
+    if not directory:
+        return None
+    paths = sorted(glob.glob(os.path.join(directory, "*", f"{glob.escape(session_id)}.json")))
+    return paths[-1] if paths else None
+
+
+class SessionLoader(Generic[S]):
+    """Toplu değerlendirme için oturumları yalnızca okunmak üzere yükler.
+
+    Kimlikle verilen oturumlar önce canlı depoda, yoksa arşivde aranır. Canlı oturumlar
+    değişmeye devam ettiğinden her seferinde depodan okunur; yalnızca değişmeyen arşiv
+    oturumları, aynı oturuma ait ardışık kayıtlar için küçük bir LRU önbellekte tutulur.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[Optional[S]]],
+        parse: Callable[[Dict[str, Any]], S],
+        archive_dir: str = SESSION_ARCHIVE_DIR,
+        cache_size: int = BATCH_SESSION_CACHE,
+    ):
+        self._fetch = fetch
+        self._parse = parse
+        self.archive_dir = archive_dir
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, S]" = OrderedDict()
+
+    async def load(self, ref: Union[str, Dict[str, Any]]) -> S:
+        if isinstance(ref, dict):
+            return self._parse(ref)
+        session = self._cache.get(ref)
+        if session is not None:
+            self._cache.move_to_end(ref)
+            return session
+        session = await self._fetch(ref)
+        if session is not None:
+            return session
+        path = await asyncio.to_thread(find_archived, self.archive_dir, ref)
+        if path is None:
+            raise SessionNotFoundError(ref)
+        session = self._parse(await asyncio.to_thread(self._read_json, path))
+        self._cache[ref] = session
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return session
+
+    @staticmethod
+    def _read_json(path: str) -> Dict[str, Any]:
+        with open(path, "rb") as f:
+            return json.loads(f.read())
+
+
+class BatchEvaluator:
+    """Kayıtları sınırlı eşzamanlılıkla puanlar ve sonuçları bitiş sırasıyla döndürür.
+
+    Girdi tembel okunur; aynı anda en fazla ``concurrency`` kayıt bellekte ve işlemde
+    bulunur. Hatalı kayıtlar işi durdurmaz, sonuçta "error" alanıyla döner.
+    """
+
+    def __init__(
+        self,
+        evaluate: Callable[[BatchRecord], Awaitable[Dict[str, Any]]],
+        concurrency: int = BATCH_CONCURRENCY,
+    ):
+        self._evaluate = evaluate
+        self.concurrency = max(1, concurrency)
+        self._in_flight = 0
+        self.evaluated = registry.counter("batch_records_evaluated_total", "Toplu değerlendirmede puanlanan kayıtlar")
+        self.failed = registry.counter("batch_records_failed_total", "Toplu değerlendirmede başarısız olan kayıtlar")
+        registry.gauge("batch_records_in_flight", "Toplu değerlendirmede işlenen kayıtlar", lambda: self._in_flight)
+
+    async def _evaluate_one(self, key: str, raw: Any) -> Dict[str, Any]:
+        self._in_flight += 1
+        started = time.monotonic()
+        try:
+            if not isinstance(raw, dict):
+                raise ValueError("Kayıt bir JSON nesnesi değil")
+            record = BatchRecord.model_validate({**raw, "id": key})
+            result = {"id": record.id, **(await self._evaluate(record))}
+            self.evaluated.inc()
+        except ValidationError as e:
+            self.failed.inc()
+            result = {"id": key, "error": f"Geçersiz kayıt: {e.errors()[0]['msg']}"}
+        except SessionNotFoundError as e:
+            self.failed.inc()
+            result = {"id": key, "error": f"Oturum bulunamadı: {str(e)}"}
+        except Exception as e:
+            self.failed.inc()
+            result = {"id": key, "error": str(e) or type(e).__name__}
+        finally:
+            self._in_flight -= 1
+        result["elapsed"] = round(time.monotonic() - started, 3)
+        return result
+
+    async def run(self, items: Iterable[Tuple[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """(anahtar, kayıt) çiftlerini puanlar; kayıt dict veya JSON metni olabilir"""
+        pending: Set[asyncio.Task] = set()
+        try:
+            for key, raw in items:
+                if len(pending) >= self.concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+                pending.add(asyncio.create_task(self._evaluate_one(key, raw)))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            # İstemci bağlantıyı kestiğinde veya iş iptal edildiğinde kalan kayıtlar bırakılır
+            for task in pending:
+                task.cancel()
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """Çıktı dosyasında başarıyla puanlanmış kayıtların kimliklerini döndürür.
+
+    Hatalı sonuçlar atlanmaz, yeniden çalıştırmada tekrar denenir; yarım yazılmış son
+    satır yok sayılır.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if "error" not in result and result.get("id") is not None:
+                done.add(result["id"])
+    return done
+
+
+def parse_lines(lines: Iterable[str], skip: Optional[Set[str]] = None) -> Iterable[Tuple[str, Any]]:
+    """JSONL satırlarını (anahtar, kayıt) çiftlerine çevirir; kimliği olmayan kayıtlar satır numarasıyla anılır"""
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        key = f"line-{line_no}"
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # Bozuk satır da sonuçlarda hata olarak görünsün diye değerlendiriciye iletilir
+            yield key, line
+            continue
+        if isinstance(record, dict) and record.get("id") is not None:
+            key = str(record["id"])
+        if not skip or key not in skip:
+            yield key, record
+
+
+def read_records(path: str, skip: Set[str]) -> Iterable[Tuple[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        yield from parse_lines(f, skip)
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+async def _run_file(input_path: str, output_path: str, concurrency: int, archive_dir: Optional[str]):
+    # api modülü burada yüklenir; Gemini istemcisi, oturum deposu ve rubrik oradan gelir
+    import api
+
+    if archive_dir is not None:
+        api.batch_sessions.archive_dir = archive_dir
+    done = load_checkpoint(output_path)
+    if done:
+        print(f"Kaldığı yerden devam ediliyor: {len(done)} kayıt zaten puanlanmış")
+
+    if os.path.exists(output_path) and not _ends_with_newline(output_path):
+        # Kesintide yarım kalan son satır yeni sonuçlarla birleşmesin
+        with open(output_path, "a", encoding="utf-8") as out:
+            out.write("\n")
+
+    evaluator = api.batch_evaluator
+    evaluator.concurrency = max(1, concurrency)
+    started = time.monotonic()
+    written = failed = 0
+    last_sync = started
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+            async for result in evaluator.run(read_records(input_path, done)):
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                written += 1
+                failed += "error" in result
+                now = time.monotonic()
+                # Kontrol noktası: çıktı saniyede bir diske indirilir, kesintide en fazla o kadarı tekrarlanır
+                if now - last_sync >= 1:
+                    out.flush()
+                    os.fsync(out.fileno())
+                    last_sync = now
+                if written % 1000 == 0:
+                    print(f"{written} kayıt ({failed} hata), {written / (now - started):.1f} kayıt/sn")
+    finally:
+        await api.prompt_cache.close()
+        await api.gemini_scheduler.close()
+        await api.gemini_client.aclose()
+        await api.session_store.close()
+
+    elapsed = time.monotonic() - started
+    print(f"Tamamlandı: {written} kayıt ({failed} hata), {elapsed:.0f} sn")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kayıtlı mülakat yanıtlarını güncel rubrikle toplu olarak yeniden puanlar")
+    parser.add_argument("input", help="(session, stage, answer) kayıtlarını içeren JSONL dosyası")
+    parser.add_argument("output", help="Sonuçların yazılacağı JSONL dosyası; varsa kaldığı yerden devam edilir")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Eşzamanlı değerlendirme sayısı")
+    parser.add_argument("--archive-dir", default=None,
+                        help="Depoda bulunmayan oturumların aranacağı arşiv dizini (varsayılan SESSION_ARCHIVE_DIR)")
+    args = parser.parse_args()
+    asyncio.run(_run_file(args.input, args.output, args.concurrency, args.archive_dir))
+
+
+if __name__ == "__main__":
+    main()
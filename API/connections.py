@@ -0,0 +1,320 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+from fastapi import WebSocket
+
+from logs import get_logger
+from metrics import registry
+from ws_protocol import AudioCodec, AudioSender, encode_seconds, send_seconds, stamp_frame
+
+
+logger = get_logger(__name__)
+
+# Sunucunun "ping" gönderme aralığı ve pong bekleme süresi (sn). Zaman aşımı yalnızca en az
+# bir kez pong göndermiş istemcilere uygulanır; pong bilmeyen eski istemciler kapatılmaz.
+WS_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", "20"))
+WS_PONG_TIMEOUT = float(os.getenv("WS_PONG_TIMEOUT", "60"))
+# Bağlantı başına kontrol mesajı kuyruğu (ping/pong) ve drop modunda izin verilen gecikme (mesaj);
+# tek bir sokete yazma işlemi için süre sınırı (sn)
+WS_SEND_QUEUE = int(os.getenv("WS_SEND_QUEUE", "64"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+# İstemci geride kaldığında ses mesajları için davranış: "pause" yazıcı istemcinin hızında
+# devam eder, "drop" WS_SEND_QUEUE'dan fazla geride kalındığında ses mesajları atlanır
+WS_BACKPRESSURE = os.getenv("WS_BACKPRESSURE", "pause").lower()
+# Yeniden bağlanmada tekrar gönderilebilecek son mesajlar ve kopuk kanalın saklanma süresi (sn)
+WS_RESUME_BUFFER = int(os.getenv("WS_RESUME_BUFFER", "128"))
+WS_RESUME_BUFFER_BYTES = int(os.getenv("WS_RESUME_BUFFER_BYTES", str(4 * 1024 * 1024)))
+WS_RESUME_TTL = float(os.getenv("WS_RESUME_TTL", "120"))
+# Bağlantı başına işlenmeyi bekleyen en fazla tur; dolunca yeni mesaj "error" ile reddedilir
+WS_TURN_QUEUE = int(os.getenv("WS_TURN_QUEUE", "4"))
+TURN_QUEUE_FULL_MESSAGE = "Önceki mesajlarınız hâlâ işleniyor, lütfen yanıtı bekleyip tekrar gönderin."
+
+AUDIO_MESSAGE_TYPES = frozenset(("audio", "audio_chunk", "audio_data"))
+
+Payload = Union[str, bytes, bytearray]
+
+
+def encode_message(message: Dict[str, Any]) -> str:
+    with encode_seconds.time():
+        return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+class SlowClient(Exception):
+    """İstemcinin henüz almadığı mesajlar yeniden bağlanma tamponundan düştü"""
+
+
+class Connection:
+    """Tek bir WebSocket bağlantısı: yazıcı görev, kontrol kuyruğu ve kalp atışı.
+
+    Sıralı mesajlar kanalın tamponundan okunur; gönderenler yalnızca tampona yazar ve
+    hiçbir zaman sokete yazılmasını beklemez, böylece yavaş bir istemci tur işlemeyi
+    bloklamaz. Yazıcı önce kontrol mesajlarını, sonra tampondaki mesajları seq sırasıyla
+    gönderir. İstemci tamponun tuttuğundan daha geride kalırsa bağlantı 1013 koduyla
+    kapatılır; istemci ?resume= ile kaldığı yerden devam eder. WS_BACKPRESSURE=drop ise
+    WS_SEND_QUEUE'dan fazla geride kalınca ses mesajları atlanır (tampondan alınabilir).
+    """
+
+    def __init__(self, websocket: WebSocket, client_id: str, manager: "ConnectionManager", channel: "Channel"):
+        self.websocket = websocket
+        self.client_id = client_id
+        self.channel = channel
+        # Yazıcıya verilmiş son sıralı mesajın numarası
+        self.cursor = channel.seq
+        self.control: Deque[str] = deque()
+        self.closed = False
+        self.last_seen = time.monotonic()
+        # İstemci pong gönderene kadar kalp atışı zaman aşımı uygulanmaz
+        self.heartbeat = False
+        self._ready = asyncio.Event()
+        self._manager = manager
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._write()), asyncio.create_task(self._ping())]
+
+    @property
+    def pending(self) -> int:
+        return len(self.control) + self.channel.seq - self.cursor
+
+    def touch(self, pong: bool = False):
+        """İstemciden mesaj geldiğinde çağrılır; pong kalp atışı denetimini açar"""
+        self.last_seen = time.monotonic()
+        if pong:
+            self.heartbeat = True
+
+    def put(self, payload: str):
+        """Sıra numarası olmayan bir kontrol mesajını (ör. ping/pong) kuyruğa ekler; kuyruk doluysa atlanır"""
+        if self.closed:
+            return
+        if len(self.control) >= WS_SEND_QUEUE:
+            self._manager.dropped.inc()
+            return
+        self.control.append(payload)
+        self._ready.set()
+
+    def wake(self):
+        self._ready.set()
+
+    def _next(self) -> Optional[Payload]:
+        if self.control:
+            return self.control.popleft()
+        channel = self.channel
+        while self.cursor < channel.seq:
+            oldest = channel.buffer[0][0] if channel.buffer else channel.seq + 1
+            if self.cursor + 1 < oldest:
+                raise SlowClient()
+            seq, payload, audio = channel.buffer[self.cursor + 1 - oldest]
+            self.cursor = seq
+            if audio and WS_BACKPRESSURE == "drop" and channel.seq - seq >= WS_SEND_QUEUE:
+                self._manager.dropped.inc()
+                continue
+            return payload
+        return None
+
+    async def _write(self):
+        try:
+            while True:
+                payload = self._next()
+                if payload is None:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                with send_seconds.time():
+                    if isinstance(payload, (bytes, bytearray)):
+                        await asyncio.wait_for(self.websocket.send_bytes(payload), WS_SEND_TIMEOUT)
+                    else:
+                        await asyncio.wait_for(self.websocket.send_text(payload), WS_SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except SlowClient:
+            self._manager.slow_disconnects.inc()
+            logger.info("İstemci yeniden bağlanma tamponunun gerisinde kaldı, bağlantı kapatılıyor: %s", self.client_id)
+            await self.close(code=1013)
+        except Exception as e:
+            if not self.closed:
+                logger.info("WebSocket'e yazılamadı, bağlantı kapatılıyor (%s): %s", self.client_id, e)
+                await self.close(code=1011)
+
+    async def _ping(self):
+        while True:
+            await asyncio.sleep(WS_PING_INTERVAL)
+            if self.heartbeat and time.monotonic() - self.last_seen > WS_PONG_TIMEOUT:
+                self._manager.heartbeat_timeouts.inc()
+                logger.info("Kalp atışı alınamadı, bağlantı kapatılıyor: %s", self.client_id)
+                await self.close(code=1011)
+                return
+            self.put(encode_message({'type': 'ping', 'data': {'ts': time.time()}}))
+
+    async def close(self, code: int = 1000):
+        if self.closed:
+            return
+        self.closed = True
+        current = asyncio.current_task()
+        for task in self._tasks:
+            if task is not current:
+                task.cancel()
+        try:
+            await self.websocket.close(code)
+        except Exception:
+            # Bağlantı zaten kapanmış olabilir
+            pass
+
+
+class Channel:
+    """client_id başına, yeniden bağlanmalar arasında yaşayan gönderim kanalı.
+
+    Her mesaja artan bir sıra numarası (seq) verilir; JSON mesajlarında "seq" alanında,
+    ikili ses çerçevelerinde başlıkta taşınır. Son mesajlar halka tamponda tutulur ve
+    bağlantının yazıcısı mesajları bu tampondan okur; bağlantı yokken gönderilenler de
+    tampona yazılır. İstemci ?resume=<son seq> ile yeniden bağlandığında kaçırdığı
+    mesajlar, ses parçaları dahil, yeniden sentezlenmeden tekrar gönderilir. Ses
+    göndericisi kanala aittir; yanıt mesaj numaraları da bağlantılar arasında sürer.
+    """
+
+    def __init__(self, client_id: str):
+        self.client_id = client_id
+        self.seq = 0
+        self.connection: Optional[Connection] = None
+        self.sender: Optional[AudioSender] = None
+        self.options: Dict[str, Any] = {}
+        self.disconnected_at: Optional[float] = None
+        self.buffer: Deque[Tuple[int, Payload, bool]] = deque()
+        self.buffer_bytes = 0
+
+    @property
+    def live(self) -> bool:
+        return self.connection is not None and not self.connection.closed
+
+    def _record(self, payload: Payload, audio: bool):
+        self.seq += 1
+        self.buffer.append((self.seq, payload, audio))
+        self.buffer_bytes += len(payload)
+        while self.buffer and (len(self.buffer) > WS_RESUME_BUFFER or self.buffer_bytes > WS_RESUME_BUFFER_BYTES):
+            self.buffer_bytes -= len(self.buffer.popleft()[1])
+        if self.live:
+            self.connection.wake()
+
+    async def send_json(self, message: Dict[str, Any]):
+        message = {**message, 'seq': self.seq + 1}
+        self._record(encode_message(message), message.get('type') in AUDIO_MESSAGE_TYPES)
+
+    async def send_bytes(self, data: bytearray):
+        self._record(stamp_frame(data, self.seq + 1), True)
+
+    def open(self, connection: Connection, hello: Dict[str, Any], resume: Optional[int]) -> int:
+        """Bağlantıyı kanala bağlar; karşılama mesajı ilk, kaçırılan mesajlar arkasından gönderilir.
+
+        Karşılama mesajına "resume" bilgisi eklenir; tampon, istenen noktadan sonraki
+        tüm mesajları artık içermiyorsa "complete" False olur. Tekrar gönderilecek mesaj
+        sayısını döndürür.
+        """
+        self.connection = connection
+        self.disconnected_at = None
+        complete = True
+        connection.cursor = self.seq
+        if resume is not None:
+            oldest = self.buffer[0][0] if self.buffer else self.seq + 1
+            complete = resume >= oldest - 1
+            connection.cursor = min(max(resume, oldest - 1), self.seq)
+        connection.put(encode_message({**hello, 'data': {
+            **hello.get('data', {}),
+            'seq': self.seq,
+            'resume': {'replayed': self.seq - connection.cursor, 'complete': complete} if resume is not None else None
+        }}))
+        return self.seq - connection.cursor
+
+
+class ConnectionManager:
+    """WebSocket bağlantılarını ve yeniden bağlanma kanallarını yönetir.
+
+    Aynı client_id ile yeni bağlantı gelirse eskisi kapatılır. Kopan kanallar
+    WS_RESUME_TTL boyunca saklanır, sonra silinir.
+    """
+
+    def __init__(self):
+        self._channels: Dict[str, Channel] = {}
+        self.dropped = registry.counter(
+            "ws_messages_dropped_total", "Gönderim kuyruğu dolu olduğu için atlanan WebSocket mesajları"
+        )
+        self.slow_disconnects = registry.counter(
+            "ws_slow_disconnects_total", "Yeniden bağlanma tamponunun gerisinde kaldığı için kapatılan bağlantılar"
+        )
+        self.heartbeat_timeouts = registry.counter(
+            "ws_heartbeat_timeouts_total", "Pong gelmediği için kapatılan bağlantılar"
+        )
+        self.resumes = registry.counter("ws_resumes_total", "Kaldığı yerden devam eden yeniden bağlanmalar")
+        self.replayed = registry.counter("ws_replayed_messages_total", "Yeniden bağlanmada tampondan gönderilen mesajlar")
+        registry.gauge(
+            "websocket_connections_active", "Açık WebSocket bağlantıları",
+            lambda: sum(1 for channel in self._channels.values() if channel.live)
+        )
+        registry.gauge(
+            "ws_send_queue_depth", "Bağlantılarda henüz gönderilmemiş mesajlar",
+            lambda: sum(channel.connection.pending for channel in self._channels.values() if channel.live)
+        )
+        registry.gauge(
+            "ws_resume_buffer_bytes", "Yeniden bağlanma tamponlarındaki veri (bayt)",
+            lambda: sum(channel.buffer_bytes for channel in self._channels.values())
+        )
+
+    def get(self, client_id: str) -> Optional[Channel]:
+        """Açık bağlantısı olan kanalı döndürür"""
+        channel = self._channels.get(client_id)
+        return channel if channel is not None and channel.live else None
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        client_id: str,
+        protocol: str,
+        codec: AudioCodec,
+        options: Dict[str, Any],
+        hello: Dict[str, Any],
+        resume: Optional[int] = None,
+    ) -> Tuple[Channel, Connection]:
+        self._sweep()
+        channel = self._channels.get(client_id)
+        if channel is None:
+            channel = self._channels[client_id] = Channel(client_id)
+        previous = channel.connection
+        channel.options = options
+        if channel.sender is None:
+            channel.sender = AudioSender(channel, protocol, codec)
+        else:
+            channel.sender.protocol = protocol
+            channel.sender.codec = codec
+
+        connection = Connection(websocket, client_id, self, channel)
+        replayed = channel.open(connection, hello, resume)
+        connection.start()
+        if resume is not None:
+            self.resumes.inc()
+            self.replayed.inc(replayed)
+        if previous is not None:
+            # Aynı istemcinin eski bağlantısı (ör. fark edilmemiş kopukluk) kapatılır
+            await previous.close(code=1000)
+        return channel, connection
+
+    async def disconnect(self, channel: Channel, connection: Connection):
+        await connection.close()
+        if channel.connection is connection:
+            channel.connection = None
+            channel.disconnected_at = time.monotonic()
+        self._sweep()
+
+    def _sweep(self):
+        now = time.monotonic()
+        for client_id, channel in list(self._channels.items()):
+            if channel.connection is None and channel.disconnected_at is not None \
+                    and now - channel.disconnected_at > WS_RESUME_TTL:
+                del self._channels[client_id]
+
+    async def close(self):
+        for channel in list(self._channels.values()):
+            if channel.connection is not None:
+                await channel.connection.close(code=1001)
+        self._channels.clear()
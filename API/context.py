@@ -0,0 +1,107 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Set, Tuple
+
+from logs import get_logger
+from metrics import registry
+
+
+logger = get_logger(__name__)
+
+# Değerlendirme isteğine eklenen son mesajlar için token bütçesi
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+# Tek bir mesajın pencerede kaplayabileceği en fazla token; uzun yanıtlar kısaltılır
+CONTEXT_MESSAGE_MAX_TOKENS = int(os.getenv("CONTEXT_MESSAGE_MAX_TOKENS", "400"))
+# Aşama özetlerinin hedef uzunluğu (kelime)
+SUMMARY_MAX_WORDS = int(os.getenv("SUMMARY_MAX_WORDS", "120"))
+
+# Türkçe metinlerde Gemini tokenizer'ı ortalama ~3.5 karaktere bir token üretir
+CHARS_PER_TOKEN = 3.5
+
+context_tokens = registry.histogram(
+    "evaluation_context_tokens",
+    "Değerlendirme isteğine eklenen geçmiş ve özetlerin tahmini token sayısı",
+    (100, 250, 500, 1000, 1500, 2000, 4000, 8000),
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Metnin yaklaşık token sayısını döndürür (tokenizer çağırmadan)"""
+    return int(len(text) / CHARS_PER_TOKEN) + 1 if text else 0
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Metni yaklaşık token sınırına sığacak şekilde kelime sınırından kısaltır"""
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    if " " in cut:
+        cut = cut[:cut.rindex(" ")]
+    return cut + " …"
+
+
+def recent_window(
+    history: Sequence[Any],
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    message_max_tokens: int = CONTEXT_MESSAGE_MAX_TOKENS,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Sohbet geçmişinin sonundan bütçeye sığan mesajları Gemini "contents" biçiminde döndürür.
+
+    history ChatHistory gibi content / is_user / role alanlı mesajlar dizisidir. İkinci
+    dönüş değeri pencerenin tahmini token sayısıdır.
+    """
+    window = []
+    used = 0
+    for msg in reversed(history):
+        text = truncate_to_tokens(msg.content, message_max_tokens)
+        tokens = estimate_tokens(text)
+        if window and used + tokens > budget:
+            break
+        window.append({"role": msg.role, "parts": [{"text": text}]})
+        used += tokens
+    window.reverse()
+    return window, used
+
+
+class StageSummarizer:
+    """Aşama özetlerini her turdan sonra arka planda, artımlı olarak günceller.
+
+    Aynı (oturum, aşama) için güncelleme sürerken gelen istekler birleştirilir: iş
+    bittiğinde yalnızca bir kez daha çalıştırılır, böylece özet tur sayısından bağımsız
+    olarak en fazla bir eşzamanlı Gemini çağrısıyla güncel tutulur.
+    """
+
+    def __init__(self, update: Callable[[str, int], Awaitable[None]]):
+        self._update = update
+        self._tasks: Dict[Tuple[str, int], asyncio.Task] = {}
+        self._dirty: Set[Tuple[str, int]] = set()
+        self.updates = registry.counter("stage_summary_updates_total", "Yapılan aşama özeti güncellemeleri")
+        self.failures = registry.counter("stage_summary_failures_total", "Başarısız aşama özeti güncellemeleri")
+
+    def schedule(self, session_id: str, stage_index: int):
+        key = (session_id, stage_index)
+        if key in self._tasks:
+            self._dirty.add(key)
+            return
+        self._tasks[key] = asyncio.create_task(self._run(key))
+
+    async def _run(self, key: Tuple[str, int]):
+        try:
+            while True:
+                self._dirty.discard(key)
+                try:
+                    await self._update(*key)
+                    self.updates.inc()
+                except Exception as e:
+                    self.failures.inc()
+                    logger.warning("Aşama özeti güncellenemedi (%s/%s): %s", key[0], key[1], e)
+                if key not in self._dirty:
+                    break
+        finally:
+            self._tasks.pop(key, None)
+
+    def cancel_session(self, session_id: str):
+        for key in [k for k in self._tasks if k[0] == session_id]:
+            self._tasks.pop(key).cancel()
+            self._dirty.discard(key)
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from metrics import registry
+
+
+# Uzun sorgu (long-poll) isteğinin en fazla bekleyebileceği süre (sn)
+FEED_MAX_WAIT = float(os.getenv("FEED_MAX_WAIT", "30"))
+# Bekleyen dinleyiciler bu aralıkla depoyu yeniden okur (başka worker'ların yazdığı turlar için)
+# ve SSE bağlantısına canlı tutma yorumu gönderir (sn)
+FEED_KEEPALIVE = float(os.getenv("FEED_KEEPALIVE", "15"))
+
+
+class Feed:
+    """Tek bir oturumun değişiklik sayacı; dinleyiciler sayaç değişene kadar bekler"""
+
+    __slots__ = ("version", "listeners", "_changed")
+
+    def __init__(self):
+        self.version = 0
+        self.listeners = 0
+        self._changed = asyncio.Event()
+
+    def notify(self):
+        self.version += 1
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self, seen: int, timeout: float) -> bool:
+        """Sayaç ``seen`` değerinden farklı olana kadar bekler; zaman aşımında False döner.
+
+        Sayaç, depodan okumadan önce alınmalıdır; böylece okuma ile bekleme arasındaki
+        bildirimler kaçmaz.
+        """
+        if self.version != seen:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class FeedNotifier:
+    """Oturumlara yeni mesaj eklendiğinde bekleyen uzun sorgu ve SSE dinleyicilerini uyandırır.
+
+    Yalnızca dinleyicisi olan oturumlar için kayıt tutulur; dinleyici kalmayınca silinir.
+    Bildirim süreç içidir, diğer worker'ların yazdıkları FEED_KEEPALIVE aralığıyla fark edilir.
+    """
+
+    def __init__(self):
+        self._feeds: Dict[str, Feed] = {}
+        self.polls = registry.counter("feed_polls_total", "Mesaj akışından yapılan (uzun) sorgular")
+        self.streams = registry.counter("feed_streams_total", "Açılan SSE mesaj akışları")
+        registry.gauge(
+            "feed_listeners", "Yeni mesaj bekleyen uzun sorgu ve SSE dinleyicileri",
+            lambda: sum(feed.listeners for feed in self._feeds.values())
+        )
+
+    def notify(self, session_id: str):
+        feed = self._feeds.get(session_id)
+        if feed is not None:
+            feed.notify()
+
+    @asynccontextmanager
+    async def listen(self, session_id: str):
+        feed = self._feeds.get(session_id)
+        if feed is None:
+            feed = self._feeds[session_id] = Feed()
+        feed.listeners += 1
+        try:
+            yield feed
+        finally:
+            feed.listeners -= 1
+            if not feed.listeners and self._feeds.get(session_id) is feed:
+                del self._feeds[session_id]
+
+
+def sse_event(data: Any, event: Optional[str] = None, event_id: Optional[int] = None) -> str:
+    """Server-Sent Events biçiminde tek bir olay üretir"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+
+def parse_cursor(since: Optional[int], last_event_id: Optional[str]) -> int:
+    """İstemcinin imlecini döndürür; SSE yeniden bağlanmasında Last-Event-ID önceliklidir"""
+    if last_event_id:
+        try:
+            return int(last_event_id) + 1
+        except ValueError:
+            pass
+    return max(since or 0, 0)
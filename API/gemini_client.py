@@ -0,0 +1,232 @@
+import asyncio
+import json
+import os
+import time
+from typing import AsyncIterator, List, Dict, Optional, Any
+
+import httpx
+
+from metrics import registry
+from upstream import parse_retry_after
+
+
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+
+# Zaman aşımı ve havuz ayarları (saniye / adet)
+GEMINI_CONNECT_TIMEOUT = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "5"))
+GEMINI_READ_TIMEOUT = float(os.getenv("GEMINI_READ_TIMEOUT", "60"))
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "100"))
+GEMINI_MAX_KEEPALIVE = int(os.getenv("GEMINI_MAX_KEEPALIVE", "20"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "64"))
+
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10)
+
+
+class GeminiError(Exception):
+    """Gemini API'den başarısız veya beklenmeyen bir yanıt alındığında fırlatılır"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def _retry_after(headers: httpx.Headers, body: str) -> Optional[float]:
+    """429 yanıtından beklenecek süreyi okur: önce Retry-After başlığı, yoksa google.rpc.RetryInfo"""
+    retry_after = parse_retry_after(headers.get("retry-after"))
+    if retry_after is not None:
+        return retry_after
+    try:
+        details = json.loads(body).get("error", {}).get("details", [])
+    except (ValueError, AttributeError):
+        return None
+    for detail in details:
+        if isinstance(detail, dict) and "retryDelay" in detail:
+            return parse_retry_after(detail["retryDelay"])
+    return None
+
+
+def _http2_available() -> bool:
+    # HTTP/2 için "h2" paketi gerekir; yoksa HTTP/1.1 keep-alive ile devam edilir
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class GeminiClient:
+    """Gemini REST API için havuzlu, eşzamanlılığı sınırlandırılmış async istemci"""
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = GEMINI_MODEL,
+        base_url: str = GEMINI_BASE_URL,
+        connect_timeout: float = GEMINI_CONNECT_TIMEOUT,
+        read_timeout: float = GEMINI_READ_TIMEOUT,
+        max_connections: int = GEMINI_MAX_CONNECTIONS,
+        max_keepalive: int = GEMINI_MAX_KEEPALIVE,
+        max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+        )
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+        self.prompt_tokens = registry.histogram(
+            "gemini_prompt_tokens", "İstek başına Gemini girdi token sayısı (usageMetadata)", TOKEN_BUCKETS
+        )
+        self.output_tokens = registry.histogram(
+            "gemini_output_tokens", "İstek başına Gemini çıktı token sayısı (usageMetadata)", TOKEN_BUCKETS
+        )
+        self.cached_tokens = registry.counter(
+            "gemini_cached_prompt_tokens_total", "Önbellekten (cachedContent) karşılanan girdi tokenları"
+        )
+        self.first_token_seconds = registry.histogram(
+            "gemini_time_to_first_token_seconds", "Akışta ilk metin parçasına kadar geçen süre", LATENCY_BUCKETS
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # İstemci ilk kullanımda oluşturulur, böylece doğru event loop'a bağlanır
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    "Content-Type": "application/json",
+                    "x-goog-api-key": self.api_key,
+                },
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=_http2_available(),
+            )
+        return self._client
+
+    @property
+    def in_flight(self) -> int:
+        """Şu anda Gemini'de bekleyen istek sayısı"""
+        return self.max_concurrency - self._semaphore._value
+
+    def _record_usage(self, usage: Optional[Dict[str, Any]]):
+        if not usage:
+            return
+        if "promptTokenCount" in usage:
+            self.prompt_tokens.observe(usage["promptTokenCount"])
+        if "candidatesTokenCount" in usage:
+            self.output_tokens.observe(usage["candidatesTokenCount"])
+        if usage.get("cachedContentTokenCount"):
+            self.cached_tokens.inc(usage["cachedContentTokenCount"])
+
+    async def _request(self, method: str, path: str, **kwargs: Any) -> Dict[str, Any]:
+        async with self._semaphore:
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except httpx.TimeoutException as e:
+                raise GeminiError(f"Gemini API zaman aşımı: {str(e)}")
+            except httpx.HTTPError as e:
+                raise GeminiError(f"Gemini API bağlantı hatası: {str(e)}")
+
+        if response.status_code != 200:
+            raise GeminiError(
+                f"Gemini API hatası: {response.status_code} - {response.text}",
+                status_code=response.status_code,
+                retry_after=_retry_after(response.headers, response.text),
+            )
+        return response.json() if response.content else {}
+
+    async def create_cached_content(self, system_instruction: str, ttl: float, display_name: Optional[str] = None) -> Dict[str, Any]:
+        """Sabit sistem talimatını cachedContents olarak kaydeder; "name" ve "expireTime" döner"""
+        body: Dict[str, Any] = {
+            "model": f"models/{self.model}",
+            "systemInstruction": {"parts": [{"text": system_instruction}]},
+            "ttl": f"{int(ttl)}s",
+        }
+        if display_name:
+            body["displayName"] = display_name
+        return await self._request("POST", "/cachedContents", json=body)
+
+    async def update_cached_content_ttl(self, name: str, ttl: float) -> Dict[str, Any]:
+        """Kayıtlı önbelleğin süresini uzatır"""
+        return await self._request("PATCH", f"/{name}", params={"updateMask": "ttl"}, json={"ttl": f"{int(ttl)}s"})
+
+    async def delete_cached_content(self, name: str):
+        await self._request("DELETE", f"/{name}")
+
+    async def generate(self, contents: List[Dict[str, Any]], **extra: Any) -> Dict[str, Any]:
+        """generateContent çağrısı yapar ve ham JSON yanıtını döndürür"""
+        body: Dict[str, Any] = {"contents": contents}
+        body.update({k: v for k, v in extra.items() if v is not None})
+
+        response_json = await self._request("POST", f"/models/{self.model}:generateContent", json=body)
+        self._record_usage(response_json.get("usageMetadata"))
+        return response_json
+
+    async def stream_generate(self, contents: List[Dict[str, Any]], **extra: Any) -> AsyncIterator[str]:
+        """streamGenerateContent (SSE) çağrısı yapar ve metin parçalarını geldikçe döndürür"""
+        body: Dict[str, Any] = {"contents": contents}
+        body.update({k: v for k, v in extra.items() if v is not None})
+
+        usage = None
+        started = time.monotonic()
+        first_token = True
+        async with self._semaphore:
+            try:
+                async with self.client.stream(
+                    "POST",
+                    f"/models/{self.model}:streamGenerateContent",
+                    params={"alt": "sse"},
+                    json=body,
+                ) as response:
+                    if response.status_code != 200:
+                        error_body = (await response.aread()).decode("utf-8", "replace")
+                        raise GeminiError(
+                            f"Gemini API hatası: {response.status_code} - {error_body}",
+                            status_code=response.status_code,
+                            retry_after=_retry_after(response.headers, error_body),
+                        )
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        payload = line[5:].strip()
+                        if not payload:
+                            continue
+                        try:
+                            chunk = json.loads(payload)
+                        except json.JSONDecodeError:
+                            continue
+                        # Kullanım bilgisi parçalarda kümülatif gelir; sonuncusu geçerlidir
+                        usage = chunk.get("usageMetadata") or usage
+                        for candidate in chunk.get("candidates", [])[:1]:
+                            for part in candidate.get("content", {}).get("parts", []):
+                                if part.get("text"):
+                                    if first_token:
+                                        self.first_token_seconds.observe(time.monotonic() - started)
+                                        first_token = False
+                                    yield part["text"]
+            except httpx.TimeoutException as e:
+                raise GeminiError(f"Gemini API zaman aşımı: {str(e)}")
+            except httpx.HTTPError as e:
+                raise GeminiError(f"Gemini API bağlantı hatası: {str(e)}")
+        self._record_usage(usage)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def extract_text(response_json: Dict[str, Any]) -> str:
+    """generateContent yanıtından ilk adayın metnini çıkarır"""
+    try:
+        return response_json["candidates"][0]["content"]["parts"][0]["text"]
+    except (KeyError, IndexError) as e:
+        raise GeminiError(f"Gemini API yanıt formatı beklenenden farklı: {str(e)}")
@@ -0,0 +1,365 @@
+import json
+import os
+import time
+from array import array
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from pydantic_core import from_json, to_json
+
+from metrics import registry
+from reports import ReportStatus
+from session_store import SessionCodec
+from tts import DEFAULT_VOICE_ID
+
+
+# Aynı içerikli soru setlerinden bellekte tek kopya tutulur; bu kadar farklı set hatırlanır
+QUESTION_SET_CACHE = int(os.getenv("QUESTION_SET_CACHE", "1024"))
+
+# Gemini "contents" rolleri; mesaj başına ayrı metin tutulmaz
+ROLE_USER = "user"
+ROLE_MODEL = "model"
+
+# Aşaması bilinmeyen mesajlar (ör. dışarıdan verilen geçmiş) için
+NO_STAGE = -1
+
+question_sets_shared = registry.counter(
+    "question_sets_shared_total", "Bellekte zaten bulunan bir soru setiyle karşılanan atamalar"
+)
+
+
+class StageStatus(str, Enum):
+    NOT_STARTED = "not_started"
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+
+
+class Question:
+    """Aşama sorusu; oturumlar arasında paylaşıldığı için değiştirilmez"""
+
+    __slots__ = ("question", "intent", "expected_themes")
+
+    def __init__(self, question: str, intent: str = "", expected_themes: Tuple[str, ...] = ()):
+        self.question = question
+        self.intent = intent
+        self.expected_themes = expected_themes
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Question":
+        return cls(data.get("question", ""), data.get("intent", ""), tuple(data.get("expected_themes") or ()))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"question": self.question, "intent": self.intent, "expected_themes": list(self.expected_themes)}
+
+
+QuestionSet = Tuple[Question, ...]
+
+_question_sets: "OrderedDict[str, QuestionSet]" = OrderedDict()
+registry.gauge("question_sets_cached", "Bellekte paylaşılan soru setleri", lambda: len(_question_sets))
+
+
+def intern_questions(questions: Iterable[Union[Question, Dict[str, Any]]]) -> QuestionSet:
+    """Soru listesini değişmez bir sete çevirir; aynı içerik için hep aynı nesne döner.
+
+    Soru bankasından aynı seti alan oturumlar soruları ayrı ayrı tutmaz.
+    """
+    if isinstance(questions, tuple):
+        return questions
+    raw = [q.to_dict() if isinstance(q, Question) else q for q in questions]
+    if not raw:
+        return ()
+    key = json.dumps(raw, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    shared = _question_sets.get(key)
+    if shared is not None:
+        _question_sets.move_to_end(key)
+        question_sets_shared.inc()
+        return shared
+    shared = tuple(Question.from_dict(q) for q in raw)
+    _question_sets[key] = shared
+    if len(_question_sets) > QUESTION_SET_CACHE:
+        _question_sets.popitem(last=False)
+    return shared
+
+
+class Turn:
+    """Sohbet geçmişindeki tek mesajın görünümü; ChatHistory okunurken üretilir"""
+
+    __slots__ = ("content", "is_user", "stage", "turn", "at")
+
+    def __init__(self, content: str, is_user: bool, stage: int, turn: int, at: float):
+        self.content = content
+        self.is_user = is_user
+        self.stage = stage
+        self.turn = turn
+        self.at = at
+
+    @property
+    def role(self) -> str:
+        return ROLE_USER if self.is_user else ROLE_MODEL
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "content": self.content,
+            "is_user": self.is_user,
+            "timestamp": self.at,
+            "stage": self.stage if self.stage != NO_STAGE else None,
+            "turn": self.turn,
+        }
+
+
+class ChatHistory:
+    """Sohbet geçmişini sütunlar halinde tutar.
+
+    Metinler bir listede, rol, aşama, tur ve zaman ise array'lerde saklanır; mesaj başına
+    sözlük yerine birkaç baytlık ek yük kalır. Zaman damgaları duvar saatidir ancak geçmiş
+    içinde azalmaz (saat geri alınsa bile sıralama korunur).
+    """
+
+    __slots__ = ("_content", "_is_user", "_stage", "_turn", "_at")
+
+    def __init__(self):
+        self._content: List[str] = []
+        self._is_user = array("B")
+        self._stage = array("h")
+        self._turn = array("H")
+        self._at = array("d")
+
+    def __len__(self) -> int:
+        return len(self._content)
+
+    def _view(self, i: int) -> Turn:
+        return Turn(self._content[i], bool(self._is_user[i]), self._stage[i], self._turn[i], self._at[i])
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Turn, "ChatHistory"]:
+        if isinstance(index, slice):
+            part = ChatHistory()
+            part._content = self._content[index]
+            part._is_user = self._is_user[index]
+            part._stage = self._stage[index]
+            part._turn = self._turn[index]
+            part._at = self._at[index]
+            return part
+        return self._view(index)
+
+    def __iter__(self) -> Iterator[Turn]:
+        for row in zip(self._content, self._is_user, self._stage, self._turn, self._at):
+            yield Turn(row[0], bool(row[1]), *row[2:])
+
+    def __reversed__(self) -> Iterator[Turn]:
+        for i in range(len(self._content) - 1, -1, -1):
+            yield self._view(i)
+
+    def append(self, content: str, is_user: bool, stage: Optional[int] = None, turn: int = 0,
+               at: Optional[float] = None) -> Turn:
+        if at is None:
+            at = time.time()
+        if self._at and at < self._at[-1]:
+            at = self._at[-1]
+        self._content.append(content)
+        self._is_user.append(1 if is_user else 0)
+        self._stage.append(NO_STAGE if stage is None else stage)
+        self._turn.append(turn)
+        self._at.append(at)
+        return self._view(len(self._content) - 1)
+
+    def copy(self) -> "ChatHistory":
+        return self[:]
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [
+            {"content": content, "is_user": bool(is_user), "timestamp": at,
+             "stage": stage if stage != NO_STAGE else None, "turn": turn}
+            for content, is_user, stage, turn, at in zip(self._content, self._is_user, self._stage, self._turn, self._at)
+        ]
+
+    def since(self, cursor: int) -> List[Dict[str, Any]]:
+        """cursor sırasından sonra eklenen mesajları sıra numaralarıyla (seq) döndürür.
+
+        Geçmiş yalnızca sona eklenerek büyüdüğü için sıra numarası kalıcı bir imleçtir.
+        """
+        messages = self[cursor:].to_list()
+        for seq, message in enumerate(messages, cursor):
+            message["seq"] = seq
+        return messages
+
+    @classmethod
+    def from_list(cls, items: Iterable[Dict[str, Any]]) -> "ChatHistory":
+        """Sözlük listesinden geçmiş oluşturur; eski kayıtlardaki "now" gibi zamanlar 0 kabul edilir"""
+        history = cls()
+        for item in items:
+            at = item.get("timestamp")
+            history.append(
+                item.get("content", ""),
+                bool(item.get("is_user")),
+                item.get("stage"),
+                item.get("turn") or 0,
+                at if isinstance(at, (int, float)) else 0.0,
+            )
+        return history
+
+
+class StageState:
+    """Mülakat aşamasının iç temsili; API'de InterviewStage modeline çevrilir"""
+
+    __slots__ = (
+        "id", "stage_key", "name", "description", "status", "attempts",
+        "questions", "satisfaction_score", "summary", "summarized_turns",
+    )
+
+    def __init__(self, id: str, name: str, description: str, stage_key: str = "",
+                 status: StageStatus = StageStatus.NOT_STARTED, attempts: int = 0,
+                 questions: QuestionSet = (), satisfaction_score: int = 0,
+                 summary: str = "", summarized_turns: int = 0):
+        self.id = id
+        self.stage_key = stage_key  # DEFAULT_INTERVIEW_STAGES içindeki sabit aşama kimliği
+        self.name = name
+        self.description = description
+        self.status = status
+        self.attempts = attempts
+        self.questions = questions
+        self.satisfaction_score = satisfaction_score  # 0-100 arası
+        self.summary = summary  # Aşamadaki konuşmanın artımlı olarak güncellenen özeti
+        self.summarized_turns = summarized_turns  # Özete işlenmiş son tur (attempts değeri)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "stage_key": self.stage_key,
+            "name": self.name,
+            "description": self.description,
+            "status": self.status.value,
+            "attempts": self.attempts,
+            "questions": [q.to_dict() for q in self.questions],
+            "satisfaction_score": self.satisfaction_score,
+            "summary": self.summary,
+            "summarized_turns": self.summarized_turns,
+        }
+
+    def copy(self) -> "StageState":
+        # Soru setleri değiştirilmez (tuple), paylaşılabilir
+        stage = object.__new__(StageState)
+        for name in self.__slots__:
+            setattr(stage, name, getattr(self, name))
+        return stage
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StageState":
+        return cls(
+            id=data["id"],
+            stage_key=data.get("stage_key", ""),
+            name=data["name"],
+            description=data["description"],
+            status=StageStatus(data.get("status", StageStatus.NOT_STARTED)),
+            attempts=data.get("attempts", 0),
+            questions=intern_questions(data.get("questions") or ()),
+            satisfaction_score=data.get("satisfaction_score", 0),
+            summary=data.get("summary", ""),
+            summarized_turns=data.get("summarized_turns", 0),
+        )
+
+
+class SessionState:
+    """Mülakat oturumunun iç temsili.
+
+    Depoda ve işlem sırasında bu sınıf kullanılır; Pydantic modellerine yalnızca API
+    yanıtı üretilirken (to_dict) ve dışarıdan oturum alınırken çevrilir.
+    """
+
+    __slots__ = (
+        "id", "position", "candidate_name", "current_stage_index", "stages", "completed",
+        "overall_feedback", "report_status", "voice_id", "chat_history", "replies", "delivered",
+    )
+
+    def __init__(self, id: str, position: str, candidate_name: str, stages: List[StageState],
+                 current_stage_index: int = 0, completed: bool = False, overall_feedback: str = "",
+                 report_status: ReportStatus = ReportStatus.NOT_STARTED, voice_id: str = DEFAULT_VOICE_ID,
+                 chat_history: Optional[ChatHistory] = None, replies: Optional[Dict[str, Dict[str, Any]]] = None,
+                 delivered: int = 0):
+        self.id = id
+        self.position = position
+        self.candidate_name = candidate_name
+        self.current_stage_index = current_stage_index
+        self.stages = stages
+        self.completed = completed
+        self.overall_feedback = overall_feedback
+        self.report_status = report_status
+        self.voice_id = voice_id  # Mülakatçının bu oturumdaki sesi
+        self.chat_history = chat_history if chat_history is not None else ChatHistory()
+        # message_id -> işlenmiş turun yanıtı; tekrar gelen mesajlar yeniden işlenmez
+        self.replies = replies if replies is not None else {}
+        # /get-message ile tek tek teslim edilmiş mesaj sayısı (eski sorgulama istemcileri için)
+        self.delivered = delivered
+
+    def to_public_dict(self) -> Dict[str, Any]:
+        """API yanıtında gösterilen alanlar; yanıt kayıtları ve teslim imleci dahil edilmez"""
+        return {
+            "id": self.id,
+            "position": self.position,
+            "candidate_name": self.candidate_name,
+            "current_stage_index": self.current_stage_index,
+            "stages": [stage.to_dict() for stage in self.stages],
+            "completed": self.completed,
+            "overall_feedback": self.overall_feedback,
+            "report_status": self.report_status.value,
+            "voice_id": self.voice_id,
+            "chat_history": self.chat_history.to_list(),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = self.to_public_dict()
+        data["replies"] = self.replies
+        data["delivered"] = self.delivered
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SessionState":
+        return cls(
+            id=data["id"],
+            position=data["position"],
+            candidate_name=data["candidate_name"],
+            stages=[StageState.from_dict(stage) for stage in data["stages"]],
+            current_stage_index=data.get("current_stage_index", 0),
+            completed=data.get("completed", False),
+            overall_feedback=data.get("overall_feedback", ""),
+            report_status=ReportStatus(data.get("report_status", ReportStatus.NOT_STARTED)),
+            voice_id=data.get("voice_id") or DEFAULT_VOICE_ID,
+            chat_history=ChatHistory.from_list(data.get("chat_history") or ()),
+            replies=dict(data.get("replies") or {}),
+            delivered=data.get("delivered", 0),
+        )
+
+    def copy(self) -> "SessionState":
+        """Aşamaları, geçmişi ve yanıt kayıtları ayrı olan bağımsız kopya"""
+        session = self.with_history(self.chat_history.copy())
+        session.stages = [stage.copy() for stage in self.stages]
+        session.replies = dict(self.replies)
+        return session
+
+    def with_history(self, history: ChatHistory) -> "SessionState":
+        """Aynı oturumun farklı sohbet geçmişli, salt okunur kopyasını döndürür"""
+        copy = object.__new__(SessionState)
+        for name in self.__slots__:
+            setattr(copy, name, getattr(self, name))
+        copy.chat_history = history
+        return copy
+
+
+class StateCodec(SessionCodec[SessionState]):
+    """SessionState nesnelerini depolama ve API yanıtı için JSON baytlarına çevirir.
+
+    Doğrulama yapılmaz; JSON, Pydantic'in Rust kodlayıcısıyla doğrudan sözlüklerden üretilir.
+    """
+
+    def dumps(self, session: SessionState) -> bytes:
+        return to_json(session.to_dict())
+
+    def dumps_public(self, session: SessionState) -> bytes:
+        """API yanıtı için yalnızca dışarı açık alanları kodlar"""
+        return to_json(session.to_public_dict())
+
+    def loads(self, data: bytes) -> SessionState:
+        return SessionState.from_dict(from_json(data))
+
+    def copy(self, session: SessionState) -> SessionState:
+        return session.copy()
@@ -0,0 +1,449 @@
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import websockets
+
+
+LOADTEST_POSITION = os.getenv("LOADTEST_POSITION", "Backend Geliştirici")
+# Karşılaştırmada izin verilen kötüleşme oranı (0.2: %20)
+LOADTEST_TOLERANCE = float(os.getenv("LOADTEST_TOLERANCE", "0.2"))
+
+AUDIO_MESSAGE_TYPES = frozenset(("audio", "audio_chunk", "audio_data"))
+
+ANSWERS = (
+    "Son projemde Python ve FastAPI ile yüksek trafikli bir ödeme servisi geliştirdim, "
+    "veritabanı sorgularını optimize ederek yanıt süresini yarıya indirdim.",
+    "Ekipte kod incelemelerini ben yürütüyordum; anlaşmazlıkları veriye dayalı tartışmalarla çözdük.",
+    "Bir keresinde üretimde bellek sızıntısı yaşadık, profil çıkararak önbellekteki hatayı bulup düzelttim.",
+    "Yeni teknolojileri küçük deneme projeleriyle öğreniyorum, ardından ekibe kısa sunumlar yapıyorum.",
+    "Kariyer hedefim dağıtık sistemlerde derinleşmek ve ekibe teknik liderlik yapmak.",
+)
+
+# Raporlanan ve karşılaştırılan gecikme serileri
+SERIES = ("start", "turn", "first_audio")
+# Test süresince artışı rapora eklenen sunucu sayaçları
+SERVER_COUNTERS = (
+    "gemini_throttled_total", "gemini_retries_total", "gemini_circuit_opens_total",
+    "tts_throttled_total", "tts_retries_total", "tts_circuit_opens_total",
+    "ws_messages_dropped_total", "ws_slow_disconnects_total",
+)
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """En yakın sıra yöntemiyle yüzdelik (q: 0-100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+    }
+
+
+def parse_metrics(text: str) -> Dict[str, float]:
+    """Prometheus metin çıktısından etiketsiz örnekleri okur"""
+    values = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#") or "{" in line:
+            continue
+        name, _, value = line.partition(" ")
+        try:
+            values[name] = float(value)
+        except ValueError:
+            continue
+    return values
+
+
+class Results:
+    """Adayların ölçümlerini toplar"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {name: [] for name in SERIES}
+        self.errors: Dict[str, int] = {}
+        self.turns = 0
+        self.sessions = 0
+        self.completed = 0
+
+    def observe(self, series: str, seconds: float):
+        self.latencies[series].append(seconds)
+
+    def error(self, kind: str):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+class Candidate:
+    """Bir mülakatı baştan sona yürüten sanal aday.
+
+    REST modunda turlar /send-message ile, WebSocket modunda /ws/{session_id} üzerinden
+    gönderilir; WebSocket'te ilk ses mesajına kadar geçen süre de ölçülür. Mülakat
+    tamamlanınca veya max_turns turdan sonra biter.
+    """
+
+    def __init__(self, index: int, client: httpx.AsyncClient, results: Results, args: argparse.Namespace):
+        self.index = index
+        self.client = client
+        self.results = results
+        self.args = args
+        self.session_id: Optional[str] = None
+
+    def answer(self, turn: int) -> str:
+        return ANSWERS[(self.index + turn) % len(ANSWERS)]
+
+    async def start(self) -> bool:
+        started = time.monotonic()
+        try:
+            response = await self.client.post("/start-interview", json={
+                "position": LOADTEST_POSITION,
+                "candidate_name": f"Aday {self.index}",
+            })
+        except httpx.HTTPError as e:
+            self.results.error(f"start:{type(e).__name__}")
+            return False
+        if response.status_code != 200:
+            self.results.error(f"start:{response.status_code}")
+            return False
+        self.results.observe("start", time.monotonic() - started)
+        self.results.sessions += 1
+        self.session_id = response.json()["session_id"]
+        return True
+
+    async def think(self):
+        if self.args.think_time > 0:
+            await asyncio.sleep(self.args.think_time)
+
+    async def run(self, transport: str):
+        if not await self.start():
+            return
+        if transport == "ws":
+            await self.run_ws()
+        else:
+            await self.run_rest()
+
+    async def run_rest(self):
+        for turn in range(self.args.max_turns):
+            await self.think()
+            started = time.monotonic()
+            try:
+                response = await self.client.post("/send-message", json={
+                    "session_id": self.session_id,
+                    "message": self.answer(turn),
+                    "message_id": uuid.uuid4().hex,
+                })
+            except httpx.HTTPError as e:
+                self.results.error(f"turn:{type(e).__name__}")
+                return
+            if response.status_code != 200:
+                self.results.error(f"turn:{response.status_code}")
+                return
+            self.results.observe("turn", time.monotonic() - started)
+            self.results.turns += 1
+            if response.json().get("is_completed"):
+                self.results.completed += 1
+                return
+
+    def ws_url(self) -> str:
+        base = self.args.base_url.replace("https://", "wss://").replace("http://", "ws://")
+        query = f"audio={self.args.audio}"
+        if self.args.stream:
+            query += "&stream=1"
+        return f"{base}/ws/{self.session_id}?{query}"
+
+    async def run_ws(self):
+        # Akış modunda tur stream_complete ile, diğer durumda "message" yanıtıyla biter
+        done_type = "stream_complete" if self.args.stream else "message"
+        try:
+            async with websockets.connect(self.ws_url(), max_size=None) as ws:
+                hello = json.loads(await asyncio.wait_for(ws.recv(), self.args.turn_timeout))
+                if hello.get("type") != "connection_response":
+                    self.results.error("ws:handshake")
+                    return
+                for turn in range(self.args.max_turns):
+                    await self.think()
+                    started = time.monotonic()
+                    first_audio = None
+                    completed = False
+                    await ws.send(json.dumps({"type": "message", "data": {
+                        "session_id": self.session_id,
+                        "message": self.answer(turn),
+                        "message_id": uuid.uuid4().hex,
+                    }}))
+                    while True:
+                        frame = await asyncio.wait_for(ws.recv(), self.args.turn_timeout)
+                        if isinstance(frame, bytes):
+                            kind = "audio"
+                        else:
+                            message = json.loads(frame)
+                            kind = message.get("type")
+                            if kind == "ping":
+                                await ws.send(json.dumps({"type": "pong", "data": message.get("data")}))
+                                continue
+                        if first_audio is None and (kind == "audio" or kind in AUDIO_MESSAGE_TYPES):
+                            first_audio = time.monotonic() - started
+                        if kind == done_type:
+                            # Tamamlanma bilgisi turu kapatan mesajda gelir
+                            completed = message["data"].get("is_completed", False)
+                            break
+                    self.results.observe("turn", time.monotonic() - started)
+                    self.results.turns += 1
+                    if first_audio is not None:
+                        self.results.observe("first_audio", first_audio)
+                    else:
+                        self.results.error("turn:no_audio")
+                    if completed:
+                        self.results.completed += 1
+                        return
+        except asyncio.TimeoutError:
+            self.results.error("turn:timeout")
+        except (websockets.WebSocketException, OSError) as e:
+            self.results.error(f"ws:{type(e).__name__}")
+
+
+async def scrape(client: httpx.AsyncClient) -> Dict[str, float]:
+    values = parse_metrics((await client.get("/metrics")).text)
+    stats = (await client.get("/sessions/stats")).json()
+    values["sessions"] = stats.get("sessions", 0)
+    values["session_store_bytes"] = stats.get("approx_bytes", 0)
+    return values
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    results = Results()
+    limits = httpx.Limits(max_connections=args.candidates + 8, max_keepalive_connections=args.candidates + 8)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.turn_timeout, limits=limits) as client:
+        before = await scrape(client)
+
+        async def candidate(index: int):
+            # Adaylar ramp_up süresine yayılarak başlatılır
+            if args.ramp_up > 0:
+                await asyncio.sleep(args.ramp_up * index / args.candidates)
+            transport = args.transport
+            if transport == "mixed":
+                transport = "ws" if index % 2 else "rest"
+            await Candidate(index, client, results, args).run(transport)
+
+        started = time.monotonic()
+        await asyncio.gather(*(candidate(i) for i in range(args.candidates)))
+        elapsed = time.monotonic() - started
+        after = await scrape(client)
+
+        mock = None
+        if args.mock_url:
+            try:
+                async with httpx.AsyncClient(base_url=args.mock_url) as mock_client:
+                    mock = (await mock_client.get("/mock/stats")).json()
+            except httpx.HTTPError:
+                pass
+
+    rss_before = before.get("process_resident_memory_bytes", 0)
+    rss_after = after.get("process_resident_memory_bytes", 0)
+    sessions = max(results.sessions, 1)
+    return {
+        "config": {
+            "candidates": args.candidates,
+            "transport": args.transport,
+            "audio": args.audio,
+            "stream": args.stream,
+            "max_turns": args.max_turns,
+            "think_time": args.think_time,
+            "ramp_up": args.ramp_up,
+        },
+        "elapsed_seconds": elapsed,
+        "sessions": results.sessions,
+        "completed_interviews": results.completed,
+        "turns": results.turns,
+        "throughput": {
+            "turns_per_second": results.turns / elapsed if elapsed else 0.0,
+            "interviews_per_minute": results.completed * 60 / elapsed if elapsed else 0.0,
+        },
+        "latency_seconds": {name: summarize(values) for name, values in results.latencies.items()},
+        "errors": results.errors,
+        "memory": {
+            "rss_before_bytes": rss_before,
+            "rss_after_bytes": rss_after,
+            "rss_per_session_bytes": (rss_after - rss_before) / sessions,
+            "store_per_session_bytes": after["session_store_bytes"] / max(after["sessions"], 1),
+        },
+        "server": {
+            name: after.get(name, 0) - before.get(name, 0)
+            for name in SERVER_COUNTERS
+            if name in after
+        },
+        "mock": mock,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Temel rapora göre tolerans üzerinde kötüleşen ölçümleri döndürür"""
+    regressions = []
+    for name in SERIES:
+        for q in ("p50", "p95", "p99"):
+            current = report["latency_seconds"][name][q]
+            previous = baseline.get("latency_seconds", {}).get(name, {}).get(q)
+            if current is not None and previous and current > previous * (1 + tolerance):
+                regressions.append(f"{name} {q}: {previous * 1000:.0f} ms -> {current * 1000:.0f} ms")
+    current = report["memory"]["store_per_session_bytes"]
+    previous = baseline.get("memory", {}).get("store_per_session_bytes")
+    if previous and current > previous * (1 + tolerance):
+        regressions.append(f"oturum başına bellek: {previous / 1024:.1f} KB -> {current / 1024:.1f} KB")
+    previous = baseline.get("throughput", {}).get("turns_per_second")
+    current = report["throughput"]["turns_per_second"]
+    if previous and current < previous * (1 - tolerance):
+        regressions.append(f"tur/sn: {previous:.2f} -> {current:.2f}")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]):
+    def ms(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value * 1000:.0f} ms"
+
+    print(f"{report['sessions']} oturum, {report['completed_interviews']} tamamlanan mülakat, "
+          f"{report['turns']} tur, {report['elapsed_seconds']:.1f} sn")
+    for name, stats in report["latency_seconds"].items():
+        print(f"  {name:<12} n={stats['count']:<6} p50={ms(stats['p50'])}  p95={ms(stats['p95'])}  "
+              f"p99={ms(stats['p99'])}  max={ms(stats['max'])}")
+    throughput = report["throughput"]
+    print(f"  verim: {throughput['turns_per_second']:.2f} tur/sn, "
+          f"{throughput['interviews_per_minute']:.1f} mülakat/dk")
+    memory = report["memory"]
+    print(f"  bellek: oturum başına {memory['rss_per_session_bytes'] / 1024:.1f} KB RSS, "
+          f"{memory['store_per_session_bytes'] / 1024:.1f} KB depo")
+    if report["errors"]:
+        print(f"  hatalar: {report['errors']}")
+    server = {name: value for name, value in report["server"].items() if value}
+    if server:
+        print(f"  sunucu: {server}")
+    if report["mock"]:
+        print(f"  sahte sağlayıcı: {report['mock']}")
+
+
+def wait_ready(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Sunucu hazır olmadı: {url}")
+
+
+def spawn(args: argparse.Namespace) -> Tuple[List[subprocess.Popen], str]:
+    """Sahte sağlayıcıyı ve API'yi ona yönlendirilmiş olarak alt süreç olarak başlatır.
+
+    API'nin diske yazdığı her şey (soru havuzu, TTS disk önbelleği, arşiv) geçici bir
+    dizine yönlendirilir ve oturumlar bellekte tutulur; sahte sağlayıcının ürettiği
+    sorular ve sesler gerçek önbelleklere karışmaz. Geçici dizini de döndürür.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    workdir = tempfile.mkdtemp(prefix="hirex-loadtest-")
+    mock = subprocess.Popen(
+        [sys.executable, "mock_upstream.py", "--port", str(args.mock_port), *shlex.split(args.mock_args)], cwd=here
+    )
+    args.mock_url = f"http://127.0.0.1:{args.mock_port}"
+    env = {
+        **os.environ,
+        "GEMINI_BASE_URL": f"{args.mock_url}/v1beta",
+        "ELEVENLABS_BASE_URL": args.mock_url,
+        "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY", "loadtest"),
+        "ELEVENLABS_API_KEY": os.getenv("ELEVENLABS_API_KEY", "loadtest"),
+        "SESSION_STORE": "memory",
+        "QUESTION_BANK_PATH": os.path.join(workdir, "question_bank.sqlite3"),
+        "TTS_CACHE_DIR": os.path.join(workdir, "tts_cache"),
+        "SESSION_ARCHIVE_DIR": os.path.join(workdir, "archive"),
+    }
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=here, env=env,
+    )
+    args.base_url = f"http://127.0.0.1:{args.port}"
+    processes = [mock, api]
+    try:
+        wait_ready(f"{args.mock_url}/mock/stats")
+        wait_ready(f"{args.base_url}/status")
+    except RuntimeError:
+        stop(processes, workdir)
+        raise
+    return processes, workdir
+
+
+def stop(processes: List[subprocess.Popen], workdir: Optional[str] = None):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    if workdir is not None:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sahte sağlayıcılara karşı uçtan uca mülakat yük testi")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8001", help="Test edilen API adresi")
+    parser.add_argument("--candidates", type=int, default=20, help="Eşzamanlı sanal aday sayısı")
+    parser.add_argument("--transport", choices=("rest", "ws", "mixed"), default="mixed")
+    parser.add_argument("--audio", choices=("json", "binary"), default="binary", help="WebSocket ses modu")
+    parser.add_argument("--stream", action="store_true", help="WebSocket'te cümle cümle akış modunu kullan")
+    parser.add_argument("--max-turns", type=int, default=30, help="Aday başına en fazla tur")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Turlar arası bekleme (sn)")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Adayların başlatılmasının yayılacağı süre (sn)")
+    parser.add_argument("--turn-timeout", type=float, default=120.0, help="Tek tur için süre sınırı (sn)")
+    parser.add_argument("--mock-url", default=None, help="Sahte sağlayıcı adresi; istatistikleri rapora eklenir")
+    parser.add_argument("--spawn", action="store_true",
+                        help="Sahte sağlayıcıyı ve API'yi alt süreç olarak başlat (--base-url yok sayılır)")
+    parser.add_argument("--port", type=int, default=8011, help="--spawn ile başlatılan API'nin portu")
+    parser.add_argument("--mock-port", type=int, default=8100, help="--spawn ile başlatılan sahte sağlayıcının portu")
+    parser.add_argument("--mock-args", default="", help="Sahte sağlayıcıya geçirilecek argümanlar (ör. gecikme, hata oranı)")
+    parser.add_argument("--output", default=None, help="Raporun yazılacağı JSON dosyası")
+    parser.add_argument("--baseline", default=None, help="Karşılaştırılacak önceki rapor; kötüleşmede çıkış kodu 1")
+    parser.add_argument("--tolerance", type=float, default=LOADTEST_TOLERANCE, help="İzin verilen kötüleşme oranı")
+    args = parser.parse_args()
+
+    processes, workdir = spawn(args) if args.spawn else ([], None)
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        stop(processes, workdir)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print("Uyarı: temel rapor farklı ayarlarla alınmış, karşılaştırma yanıltıcı olabilir")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("Kötüleşen ölçümler:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("Temel rapora göre kötüleşme yok")
+
+
+if __name__ == "__main__":
+    main()
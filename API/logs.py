@@ -0,0 +1,87 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from typing import Optional
+
+from metrics import registry
+
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# text: okunabilir satırlar, json: satır başına bir JSON nesnesi (log toplayıcılar için)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+ROOT_LOGGER = "hirex"
+
+dropped = registry.counter("log_records_dropped_total", "Kuyruk dolu olduğu için atılan log kayıtları")
+
+# LogRecord'un kendi alanları; geri kalanlar extra= ile verilen bağlam alanlarıdır
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Kuyruk doluysa kaydı beklemeden atar; istek yolu log yazımı yüzünden yavaşlamaz"""
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped.inc()
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, queue_size: int = LOG_QUEUE_SIZE):
+    """Uygulama loglarını sınırlı bir kuyruk üzerinden ayrı bir iş parçacığında stderr'e yazar.
+
+    Çağıran taraf yalnızca kaydı kuyruğa koyar; biçimlendirme ve yazma G/Ç'si event
+    loop'u bloklamaz. Birden fazla çağrı zararsızdır.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    handler = logging.StreamHandler(sys.stderr)
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(level)
+    root.addHandler(_DroppingQueueHandler(log_queue))
+    root.propagate = False
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Kuyrukta kalan kayıtları yazar ve yazıcı iş parçacığını durdurur"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
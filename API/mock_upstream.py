@@ -0,0 +1,371 @@
+import argparse
+import asyncio
+import glob
+import json
+import math
+import os
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+
+# Gemini yanıtı akışta bu kadar karakterlik parçalara bölünür
+MOCK_STREAM_CHUNK_CHARS = int(os.getenv("MOCK_STREAM_CHUNK_CHARS", "24"))
+# Sahte ElevenLabs sesi bu boyutta parçalar halinde gönderilir (bayt)
+MOCK_AUDIO_CHUNK_BYTES = int(os.getenv("MOCK_AUDIO_CHUNK_BYTES", "4096"))
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, mono çerçeve başlığı; çerçeve 417 bayt ve ~26 ms sürer
+_MP3_FRAME = b"\xff\xfb\x90\xc4" + bytes(413)
+_MP3_FRAME_SECONDS = 1152 / 44100
+
+
+class Latency:
+    """Medyan ve p99 değerinden kurulan log-normal gecikme dağılımı (sn).
+
+    "0.8" sabit gecikme, "0.8:2.5" medyanı 0.8 ve p99'u 2.5 sn olan dağılım anlamına gelir.
+    """
+
+    def __init__(self, median: float, p99: Optional[float] = None):
+        self.median = median
+        self.p99 = p99 if p99 is not None else median
+        # Standart normalin %99 noktası 2.326'dır
+        self.sigma = math.log(self.p99 / self.median) / 2.326 if self.median > 0 and self.p99 > self.median else 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        median, _, p99 = spec.partition(":")
+        return cls(float(median), float(p99) if p99 else None)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.median <= 0:
+            return 0.0
+        if not self.sigma:
+            return self.median
+        return rng.lognormvariate(math.log(self.median), self.sigma)
+
+
+class Faults:
+    """Hata enjeksiyonu: her istek error_rate olasılıkla 5xx alır; burst_every sn'de bir,
+    burst_for sn boyunca tüm istekler 429 ile reddedilir (kota aşımı)."""
+
+    def __init__(self, error_rate: float = 0.0, burst_every: float = 0.0, burst_for: float = 0.0,
+                 retry_after: float = 1.0):
+        self.error_rate = error_rate
+        self.burst_every = burst_every
+        self.burst_for = burst_for
+        self.retry_after = retry_after
+        self.started = time.monotonic()
+
+    def throttled(self) -> bool:
+        if self.burst_every <= 0 or self.burst_for <= 0:
+            return False
+        return (time.monotonic() - self.started) % self.burst_every < self.burst_for
+
+    def failed(self, rng: random.Random) -> bool:
+        return self.error_rate > 0 and rng.random() < self.error_rate
+
+
+class Recordings:
+    """Kaydedilmiş sağlayıcı yanıtları.
+
+    Dizin yapısı: gemini/questions*.json, gemini/evaluation*.json, gemini/text*.json
+    (generateContent yanıtı ya da bunların listesi) ve tts/*.mp3. Bulunmayan türler için
+    şemaya uyan sentetik yanıtlar üretilir.
+    """
+
+    KINDS = ("questions", "evaluation", "text")
+
+    def __init__(self, directory: Optional[str] = None):
+        self.gemini: Dict[str, List[Dict[str, Any]]] = {kind: [] for kind in self.KINDS}
+        self.audio: List[bytes] = []
+        if directory:
+            self._load(directory)
+
+    def _load(self, directory: str):
+        for kind in self.KINDS:
+            for path in sorted(glob.glob(os.path.join(directory, "gemini", f"{kind}*.json"))):
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                self.gemini[kind].extend(data if isinstance(data, list) else [data])
+        for path in sorted(glob.glob(os.path.join(directory, "tts", "*.mp3"))):
+            with open(path, "rb") as f:
+                self.audio.append(f.read())
+
+    def counts(self) -> Dict[str, int]:
+        return {**{kind: len(items) for kind, items in self.gemini.items()}, "audio": len(self.audio)}
+
+
+def response_text(response: Dict[str, Any]) -> str:
+    try:
+        return response["candidates"][0]["content"]["parts"][0]["text"]
+    except (KeyError, IndexError, TypeError):
+        return ""
+
+
+def request_kind(body: Dict[str, Any]) -> str:
+    """İsteğin türünü responseSchema'dan çıkarır: soru listesi, değerlendirme veya düz metin"""
+    schema = (body.get("generationConfig") or {}).get("responseSchema") or {}
+    if schema.get("type", "").upper() == "ARRAY":
+        return "questions"
+    if "satisfaction_score" in (schema.get("properties") or {}):
+        return "evaluation"
+    return "text"
+
+
+class MockUpstream:
+    """Gemini ve ElevenLabs REST uçlarını taklit eden sahte sağlayıcı.
+
+    Yanıt süresi ilk parçaya kadar geçen gecikme (latency) ve parçalar arası gecikmeden
+    (chunk_latency) oluşur; akışsız yanıtlar tüm parçalar üretildiğinde döner.
+    """
+
+    def __init__(
+        self,
+        recordings: Optional[Recordings] = None,
+        gemini_latency: Latency = Latency(0.8, 2.5),
+        gemini_chunk_latency: Latency = Latency(0.03),
+        tts_latency: Latency = Latency(0.3, 1.0),
+        tts_chunk_latency: Latency = Latency(0.02),
+        gemini_faults: Optional[Faults] = None,
+        tts_faults: Optional[Faults] = None,
+        complete_rate: float = 0.5,
+        seed: Optional[int] = None,
+    ):
+        self.recordings = recordings or Recordings()
+        self.gemini_latency = gemini_latency
+        self.gemini_chunk_latency = gemini_chunk_latency
+        self.tts_latency = tts_latency
+        self.tts_chunk_latency = tts_chunk_latency
+        self.gemini_faults = gemini_faults or Faults()
+        self.tts_faults = tts_faults or Faults()
+        self.complete_rate = complete_rate
+        self.rng = random.Random(seed)
+        self.stats: Dict[str, Dict[str, int]] = {
+            "gemini": {"requests": 0, "streams": 0, "errors": 0, "throttled": 0, "cache": 0},
+            "tts": {"requests": 0, "errors": 0, "throttled": 0, "bytes": 0},
+        }
+
+    # Gemini
+
+    def _synthetic(self, kind: str) -> str:
+        if kind == "questions":
+            return json.dumps([
+                {
+                    "question": f"Bu alandaki deneyiminizden örnek {i} verebilir misiniz?",
+                    "intent": "Deneyimin derinliğini ölçmek",
+                    "expected_themes": ["somut örnek", "sonuç", "öğrenilen ders"],
+                }
+                for i in range(1, 4)
+            ], ensure_ascii=False)
+        if kind == "evaluation":
+            return json.dumps({
+                "satisfaction_score": self.rng.randint(40, 95),
+                "stage_complete": self.rng.random() < self.complete_rate,
+                "next_question": "Anlattığınız projede karşılaştığınız en zor teknik problem neydi? "
+                                 "Bu problemi çözmek için hangi adımları izlediniz?",
+            }, ensure_ascii=False)
+        return ("Aday sorulara açık ve yapılandırılmış yanıtlar verdi. Teknik konularda somut "
+                "örnekler sundu, ekip çalışması ve iletişim becerileri güçlü görünüyor. "
+                "Ölçeklenebilirlik ve test konularında daha fazla deneyim kazanması önerilir.")
+
+    def _generate(self, kind: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        recorded = self.recordings.gemini[kind]
+        if recorded:
+            response = dict(self.rng.choice(recorded))
+        else:
+            response = {"candidates": [{
+                "content": {"role": "model", "parts": [{"text": self._synthetic(kind)}]},
+                "finishReason": "STOP",
+            }]}
+        text = response_text(response)
+        response.setdefault("usageMetadata", {
+            "promptTokenCount": len(json.dumps(body.get("contents", []), ensure_ascii=False)) // 4,
+            "candidatesTokenCount": len(text) // 4 + 1,
+        })
+        return response
+
+    def _gemini_fault(self) -> Optional[Response]:
+        faults = self.gemini_faults
+        if faults.throttled():
+            self.stats["gemini"]["throttled"] += 1
+            return JSONResponse({"error": {
+                "code": 429, "message": "Resource has been exhausted (mock)", "status": "RESOURCE_EXHAUSTED",
+                "details": [{
+                    "@type": "type.googleapis.com/google.rpc.RetryInfo",
+                    "retryDelay": f"{faults.retry_after:g}s",
+                }],
+            }}, status_code=429)
+        if faults.failed(self.rng):
+            self.stats["gemini"]["errors"] += 1
+            return JSONResponse({"error": {
+                "code": 503, "message": "The model is overloaded (mock)", "status": "UNAVAILABLE"
+            }}, status_code=503)
+        return None
+
+    def _chunks(self, text: str) -> List[str]:
+        size = max(1, MOCK_STREAM_CHUNK_CHARS)
+        return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+    async def generate(self, body: Dict[str, Any]) -> Response:
+        self.stats["gemini"]["requests"] += 1
+        fault = self._gemini_fault()
+        if fault is not None:
+            return fault
+        response = self._generate(request_kind(body), body)
+        chunks = self._chunks(response_text(response))
+        await asyncio.sleep(
+            self.gemini_latency.sample(self.rng)
+            + sum(self.gemini_chunk_latency.sample(self.rng) for _ in chunks[1:])
+        )
+        return JSONResponse(response)
+
+    async def stream_generate(self, body: Dict[str, Any]) -> Response:
+        self.stats["gemini"]["requests"] += 1
+        self.stats["gemini"]["streams"] += 1
+        fault = self._gemini_fault()
+        if fault is not None:
+            return fault
+        response = self._generate(request_kind(body), body)
+        chunks = self._chunks(response_text(response))
+
+        async def events():
+            await asyncio.sleep(self.gemini_latency.sample(self.rng))
+            for index, text in enumerate(chunks):
+                if index:
+                    await asyncio.sleep(self.gemini_chunk_latency.sample(self.rng))
+                event = {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+                if index == len(chunks) - 1:
+                    event["usageMetadata"] = response["usageMetadata"]
+                yield "data: " + json.dumps(event, ensure_ascii=False) + "\r\n\r\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    def cached_content(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        self.stats["gemini"]["cache"] += 1
+        ttl = float(str(body.get("ttl", "3600s")).rstrip("s") or 3600)
+        return {
+            "name": f"cachedContents/{uuid.uuid4().hex}",
+            "model": body.get("model"),
+            "expireTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + ttl)),
+        }
+
+    # ElevenLabs
+
+    def _audio(self, text: str) -> bytes:
+        if self.recordings.audio:
+            return self.rng.choice(self.recordings.audio)
+        # Konuşma hızı ~15 karakter/sn varsayılarak metin uzunluğunda sessiz MP3
+        frames = max(1, int(len(text) / 15 / _MP3_FRAME_SECONDS))
+        return _MP3_FRAME * frames
+
+    async def text_to_speech(self, body: Dict[str, Any]) -> Response:
+        self.stats["tts"]["requests"] += 1
+        faults = self.tts_faults
+        if faults.throttled():
+            self.stats["tts"]["throttled"] += 1
+            return JSONResponse(
+                {"detail": {"status": "too_many_concurrent_requests", "message": "Rate limited (mock)"}},
+                status_code=429, headers={"Retry-After": f"{faults.retry_after:g}"},
+            )
+        if faults.failed(self.rng):
+            self.stats["tts"]["errors"] += 1
+            return JSONResponse({"detail": {"status": "internal_error", "message": "Mock failure"}}, status_code=500)
+
+        audio = self._audio(body.get("text", ""))
+        size = max(1, MOCK_AUDIO_CHUNK_BYTES)
+        self.stats["tts"]["bytes"] += len(audio)
+
+        async def chunks():
+            await asyncio.sleep(self.tts_latency.sample(self.rng))
+            for start in range(0, len(audio), size):
+                if start:
+                    await asyncio.sleep(self.tts_chunk_latency.sample(self.rng))
+                yield audio[start:start + size]
+
+        return StreamingResponse(chunks(), media_type="audio/mpeg")
+
+
+def create_app(upstream: MockUpstream) -> FastAPI:
+    """Sahte sağlayıcı uygulaması. Gemini /v1beta altında, ElevenLabs /v1 altında sunulur:
+    GEMINI_BASE_URL=http://<adres>/v1beta ve ELEVENLABS_BASE_URL=http://<adres> kullanılır."""
+    app = FastAPI(title="HireX sahte sağlayıcılar")
+
+    @app.post("/v1beta/models/{target}")
+    async def gemini_models(target: str, request: Request):
+        body = await request.json()
+        _, _, method = target.partition(":")
+        if method == "streamGenerateContent":
+            return await upstream.stream_generate(body)
+        if method == "generateContent":
+            return await upstream.generate(body)
+        return JSONResponse({"error": {"code": 404, "message": f"Bilinmeyen metot: {method}"}}, status_code=404)
+
+    @app.post("/v1beta/cachedContents")
+    async def create_cached_content(request: Request):
+        return upstream.cached_content(await request.json())
+
+    @app.patch("/v1beta/cachedContents/{cache_id}")
+    async def update_cached_content(cache_id: str, request: Request):
+        return {**upstream.cached_content(await request.json()), "name": f"cachedContents/{cache_id}"}
+
+    @app.delete("/v1beta/cachedContents/{cache_id}")
+    async def delete_cached_content(cache_id: str):
+        return {}
+
+    @app.post("/v1/text-to-speech/{voice_id}")
+    @app.post("/v1/text-to-speech/{voice_id}/stream")
+    async def text_to_speech(voice_id: str, request: Request):
+        return await upstream.text_to_speech(await request.json())
+
+    @app.get("/mock/stats")
+    async def stats():
+        return {**upstream.stats, "recordings": upstream.recordings.counts()}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Yük testi için sahte Gemini ve ElevenLabs sunucusu")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--recordings", default=None,
+                        help="Kaydedilmiş yanıtların dizini (gemini/*.json, tts/*.mp3); yoksa sentetik yanıtlar")
+    parser.add_argument("--gemini-latency", default="0.8:2.5", help="İlk parçaya kadar gecikme, medyan[:p99] sn")
+    parser.add_argument("--gemini-chunk-latency", default="0.03", help="Akış parçaları arası gecikme, medyan[:p99] sn")
+    parser.add_argument("--tts-latency", default="0.3:1.0", help="İlk ses baytına kadar gecikme, medyan[:p99] sn")
+    parser.add_argument("--tts-chunk-latency", default="0.02", help="Ses parçaları arası gecikme, medyan[:p99] sn")
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0, help="503 dönen Gemini isteklerinin oranı")
+    parser.add_argument("--tts-error-rate", type=float, default=0.0, help="500 dönen TTS isteklerinin oranı")
+    parser.add_argument("--gemini-429-every", type=float, default=0.0, help="Gemini 429 patlamalarının aralığı (sn)")
+    parser.add_argument("--gemini-429-for", type=float, default=0.0, help="Gemini 429 patlamasının süresi (sn)")
+    parser.add_argument("--tts-429-every", type=float, default=0.0, help="TTS 429 patlamalarının aralığı (sn)")
+    parser.add_argument("--tts-429-for", type=float, default=0.0, help="TTS 429 patlamasının süresi (sn)")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 yanıtlarında bildirilen bekleme (sn)")
+    parser.add_argument("--complete-rate", type=float, default=0.5,
+                        help="Sentetik değerlendirmelerde aşamanın tamamlanma olasılığı")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    upstream = MockUpstream(
+        recordings=Recordings(args.recordings),
+        gemini_latency=Latency.parse(args.gemini_latency),
+        gemini_chunk_latency=Latency.parse(args.gemini_chunk_latency),
+        tts_latency=Latency.parse(args.tts_latency),
+        tts_chunk_latency=Latency.parse(args.tts_chunk_latency),
+        gemini_faults=Faults(args.gemini_error_rate, args.gemini_429_every, args.gemini_429_for, args.retry_after),
+        tts_faults=Faults(args.tts_error_rate, args.tts_429_every, args.tts_429_for, args.retry_after),
+        complete_rate=args.complete_rate,
+        seed=args.seed,
+    )
+    print(f"Kayıtlı yanıtlar: {upstream.recordings.counts()}")
+    uvicorn.run(create_app(upstream), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import random
+from typing import List
+
+
+# Mülakatçının her görüşmede aynen söylediği sabit ifadeler.
+# Bu metinler TTS önbelleğinde tutulur ve uygulama açılışında önceden seslendirilir.
+
+INTRO_GREETING = """Merhaba ve görüşmeye hoş geldiniz! Ben sizin sanal mülakatçınız Hirexim. Bugün yazılım geliştirici pozisyonu için konuşacağız. Endişelenmenize gerek yok, bu sadece sizin deneyim ve becerilerinizi anlamak için bir sohbet. 
+
+Başlamadan önce, kendinizi kısaca tanıtabilir misiniz? Eğitim geçmişiniz, teknik becerileriniz ve bu pozisyonla ilgili motivasyonunuz hakkında biraz bilgi paylaşırsanız sevinirim."""
+
+# Yeni aşamanın ilk sorusundan önce söylenen geçişler
+STAGE_INTRO_TRANSITIONS = {
+    "experience": "Şimdi biraz iş deneyimlerinizden bahsedelim. ",
+    "technical": "Biraz teknik becerilerinizden konuşalım. ",
+    "behavioral": "Çalışma tarzınız hakkında merak ettiğim birkaç şey var. ",
+    "company_fit": "Şimdi biraz beklentilerinizden ve kariyer hedeflerinizden bahsedelim. ",
+    "questions": "Son olarak, bana sormak istediğiniz sorular var mı? "
+}
+
+# Aşama tamamlandığında bir sonraki aşamaya geçiş cümleleri
+STAGE_COMPLETE_TRANSITIONS = {
+    "experience": "Anladım, teşekkür ederim. Peki, daha önceki iş deneyimlerinizle ilgili biraz konuşabilir miyiz?",
+    "technical": "Teşekkürler. Şimdi biraz teknik bilgi ve becerilerinizden bahsedelim.",
+    "behavioral": "İş deneyimleriniz etkileyici. Peki, zorlu durumlarla nasıl başa çıktığınız hakkında konuşabilir miyiz?",
+    "company_fit": "Anladım. Şimdi, kariyer hedefleriniz ve şirket kültürüyle ilgili beklentileriniz neler?",
+    "questions": "Harika, teşekkürler. Son olarak, bana sormak istediğiniz herhangi bir soru var mı?"
+}
+DEFAULT_STAGE_COMPLETE_TRANSITION = "Şimdi başka bir konuya geçelim."
+
+STAGE_OPEN_QUESTION = "Bu konuda düşüncelerinizi paylaşır mısınız?"
+DEFAULT_FOLLOW_UP = "Biraz daha detaylı bilgi verebilir misiniz?"
+FALLBACK_FOLLOW_UP = "Bu konuda biraz daha detay verebilir misiniz?"
+
+FINAL_STAGE_THANKS = "Bu bilgiler için teşekkür ederim. Görüşmemizi burada sonlandırabiliriz. Değerlendirme sonucunu yakında sizinle paylaşacağız."
+# Akışlı yanıt yarıda kaldığında istemciye yalnızca metin olarak gönderilir, seslendirilmez
+STREAM_ERROR_MESSAGE = "Yanıtım yarıda kaldı, kusura bakmayın. Son cevabınızı tekrar gönderebilir misiniz?"
+COMPLETION_MESSAGE = "Mülakat tamamlandı. Değerlendirme raporunuz hazırlanıyor. İlginiz ve zamanınız için teşekkür ederiz. Görüşmek üzere!"
+
+# Puan aralığına göre soru öncesi kullanılan doğal geçiş ifadeleri
+# Çok düşük puan (0-39) - bağlamdan uzak veya çok yetersiz
+LOW_SCORE_PREFIXES = [
+    "Sanırım konudan biraz uzaklaştık.",
+    "Bu konuyu biraz daha açmak isterim.",
+    "Belki biraz daha spesifik olabilir miyiz?",
+    "İlginç, ama sanırım aradığım bilgiye tam ulaşamadım."
+]
+
+# Orta puan (40-59) - ek detaya ihtiyaç var
+MEDIUM_SCORE_PREFIXES = [
+    "Anlıyorum.",
+    "İlginç.",
+    "Teşekkür ederim.",
+    "Bu iyi bir başlangıç."
+]
+
+# İyi puan (60+) ama hala detay gerekiyor
+HIGH_SCORE_PREFIXES = [
+    "Çok güzel bir perspektif.",
+    "İlginç bir bakış açısı.",
+    "Bu gerçekten değerli bir bilgi.",
+    "Harika."
+]
+
+
+def choose_reply_prefix(satisfaction_score: int) -> str:
+    """Değerlendirme puanına uygun geçiş ifadesini rastgele seçer"""
+    if satisfaction_score < 40:
+        return random.choice(LOW_SCORE_PREFIXES)
+    elif satisfaction_score < 60:
+        return random.choice(MEDIUM_SCORE_PREFIXES)
+    return random.choice(HIGH_SCORE_PREFIXES)
+
+
+def static_phrases() -> List[str]:
+    """Önceden seslendirilecek tüm sabit ifadeleri döndürür"""
+    phrases = [
+        INTRO_GREETING,
+        DEFAULT_STAGE_COMPLETE_TRANSITION,
+        STAGE_OPEN_QUESTION,
+        DEFAULT_FOLLOW_UP,
+        FALLBACK_FOLLOW_UP,
+        FINAL_STAGE_THANKS,
+        COMPLETION_MESSAGE,
+    ]
+    phrases += [t.strip() for t in STAGE_INTRO_TRANSITIONS.values()]
+    phrases += list(STAGE_COMPLETE_TRANSITIONS.values())
+    phrases += LOW_SCORE_PREFIXES + MEDIUM_SCORE_PREFIXES + HIGH_SCORE_PREFIXES
+    # Sıra korunarak tekrarlar çıkarılır
+    return list(dict.fromkeys(phrases))
@@ -0,0 +1,70 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from logs import get_logger
+from metrics import registry
+
+
+logger = get_logger(__name__)
+
+QuestionList = List[Dict[str, Any]]
+
+
+class QuestionPrefetcher:
+    """Bir sonraki aşamanın sorularını, mevcut aşama sürerken arka planda üretir.
+
+    Aşama geçişinde hazır liste varsa hemen kullanılır; üretim sürüyorsa yeni bir
+    istek başlatmak yerine devam eden sonuç beklenir. Üretim başarısız olduysa veya
+    hiç başlatılmadıysa çağıran taraf talep anında üretime döner.
+    """
+
+    def __init__(self, generate: Callable[..., Awaitable[QuestionList]]):
+        self._generate = generate
+        self._tasks: Dict[Tuple[str, int], asyncio.Task] = {}
+        self.hits = registry.counter("question_prefetch_hits_total", "Önceden hazırlanmış soru listesiyle yapılan aşama geçişleri")
+        self.waits = registry.counter("question_prefetch_waits_total", "Devam eden ön üretimin beklendiği aşama geçişleri")
+        self.misses = registry.counter("question_prefetch_misses_total", "Talep anında soru üretilen aşama geçişleri")
+        registry.gauge("question_prefetch_pending", "Devam eden ön üretim görevleri", lambda: len(self._tasks))
+
+    def schedule(self, session_id: str, stage_index: int, *args: Any):
+        """Verilen aşama için soru üretimini arka planda başlatır (zaten varsa tekrar başlatmaz)"""
+        key = (session_id, stage_index)
+        if key in self._tasks:
+            return
+        task = asyncio.create_task(self._generate(*args))
+        # Sonucu alınmadan biten görevlerin hatası loglanır, görev kaydı take() ile silinir
+        task.add_done_callback(self._log_failure)
+        self._tasks[key] = task
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Soru ön üretimi başarısız: %s", task.exception())
+
+    async def take(self, session_id: str, stage_index: int) -> Optional[QuestionList]:
+        """Ön üretilmiş soruları döndürür; yoksa veya başarısız olduysa None döner"""
+        task = self._tasks.pop((session_id, stage_index), None)
+        if task is None:
+            self.misses.inc()
+            return None
+        if task.done():
+            if task.cancelled() or task.exception() is not None:
+                self.misses.inc()
+                return None
+            self.hits.inc()
+            return task.result()
+        self.waits.inc()
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():
+                return None
+            raise
+        except Exception:
+            self.misses.inc()
+            return None
+
+    def cancel_session(self, session_id: str):
+        """Oturuma ait tüm ön üretim görevlerini iptal eder"""
+        for key in [k for k in self._tasks if k[0] == session_id]:
+            self._tasks.pop(key).cancel()
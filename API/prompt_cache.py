@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import os
+import time
+from typing import Any, Dict, Optional, Set
+
+from context import estimate_tokens
+from gemini_client import GeminiClient, GeminiError
+from logs import get_logger
+from metrics import registry
+
+
+logger = get_logger(__name__)
+
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "true").lower() in ("1", "true", "yes")
+# Önbelleğin Gemini tarafındaki ömrü ve bitmeden ne kadar önce uzatılacağı (saniye)
+GEMINI_CACHE_TTL = float(os.getenv("GEMINI_CACHE_TTL", "3600"))
+GEMINI_CACHE_REFRESH_MARGIN = float(os.getenv("GEMINI_CACHE_REFRESH_MARGIN", "300"))
+# Oluşturma geçici bir hatayla başarısız olursa bu süre boyunca talimat istek içinde gönderilir
+GEMINI_CACHE_RETRY_AFTER = float(os.getenv("GEMINI_CACHE_RETRY_AFTER", "600"))
+# Gemini'nin cachedContents için kabul ettiği asgari boyut (token), model ailesine göre;
+# listede olmayan modeller için 4096 varsayılır. Daha kısa talimatlar için önbellek hiç denenmez
+CACHE_MIN_TOKENS_BY_MODEL = {
+    "gemini-2.5-flash": 1024,
+    "gemini-2.5-pro": 4096,
+    "gemini-2.0-flash": 4096,
+}
+DEFAULT_CACHE_MIN_TOKENS = 4096
+GEMINI_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CACHE_MIN_TOKENS", "0")) or None
+
+
+def cache_min_tokens(model: str) -> int:
+    """Modelin açık önbellek (cachedContents) için istediği asgari token sayısı"""
+    for prefix, tokens in CACHE_MIN_TOKENS_BY_MODEL.items():
+        if model.startswith(prefix):
+            return tokens
+    return DEFAULT_CACHE_MIN_TOKENS
+
+
+class _Entry:
+    __slots__ = ("name", "expires_at")
+
+    def __init__(self, name: str, expires_at: float):
+        self.name = name
+        self.expires_at = expires_at
+
+
+class PromptCache:
+    """Sabit sistem talimatlarını Gemini cachedContents olarak bir kez kaydeder.
+
+    resolve() generateContent isteğine eklenecek alanları döndürür: önbellek hazırsa
+    yalnızca "cachedContent" adı, değilse talimatın kendisi ("systemInstruction").
+    Önbellek, süresi dolmadan arka planda uzatılır; oluşturma başarısız olursa bir
+    süre satır içi talimata dönülür, istekler hiçbir zaman önbelleği beklemez. Asgari
+    boyutun altındaki veya Gemini'nin geçersiz saydığı (400) talimatlar için önbellek
+    bir daha denenmez, durum bir kez loglanır.
+    """
+
+    def __init__(
+        self,
+        client: GeminiClient,
+        enabled: bool = GEMINI_CONTEXT_CACHE,
+        ttl: float = GEMINI_CACHE_TTL,
+        refresh_margin: float = GEMINI_CACHE_REFRESH_MARGIN,
+        retry_after: float = GEMINI_CACHE_RETRY_AFTER,
+        min_tokens: Optional[int] = GEMINI_CACHE_MIN_TOKENS,
+    ):
+        self.client = client
+        self.enabled = enabled
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after
+        self.min_tokens = min_tokens or cache_min_tokens(client.model)
+        self._entries: Dict[str, _Entry] = {}
+        self._failed_until: Dict[str, float] = {}
+        # Önbelleğe alınamayacağı kesinleşen talimatlar
+        self._uncacheable: Set[str] = set()
+        self._pending: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = registry.counter("gemini_context_cache_hits_total", "cachedContent ile gönderilen istekler")
+        self.misses = registry.counter("gemini_context_cache_misses_total", "Talimatı satır içi gönderilen istekler")
+        self.created = registry.counter("gemini_context_cache_created_total", "Oluşturulan cachedContents kayıtları")
+        self.failures = registry.counter("gemini_context_cache_failures_total", "Başarısız önbellek oluşturma/uzatma")
+        registry.gauge("gemini_context_caches", "Kayıtlı cachedContents sayısı", lambda: len(self._entries))
+
+    @staticmethod
+    def key(instructions: str) -> str:
+        return hashlib.sha256(instructions.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def inline(instructions: str) -> Dict[str, Any]:
+        return {"systemInstruction": {"parts": [{"text": instructions}]}}
+
+    def resolve(self, instructions: str) -> Dict[str, Any]:
+        """İsteğe eklenecek alanları döndürür; gerekirse oluşturma/uzatmayı arka planda başlatır"""
+        if not self.enabled:
+            return self.inline(instructions)
+        key = self.key(instructions)
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > now:
+            if entry.expires_at - now < self.refresh_margin:
+                self._spawn(key, self._refresh(key, instructions))
+            self.hits.inc()
+            return {"cachedContent": entry.name}
+        if self._cacheable(key, instructions) and self._failed_until.get(key, 0) <= now:
+            self._spawn(key, self._create(key, instructions))
+        self.misses.inc()
+        return self.inline(instructions)
+
+    def _cacheable(self, key: str, instructions: str) -> bool:
+        if key in self._uncacheable:
+            return False
+        tokens = estimate_tokens(instructions)
+        if tokens < self.min_tokens:
+            self._uncacheable.add(key)
+            logger.info("Talimat önbellek için çok kısa (~%d < %d token), satır içi gönderilecek", tokens, self.min_tokens)
+            return False
+        return True
+
+    def invalidate(self, instructions: str):
+        """Gemini tarafında bulunamayan (silinmiş / süresi dolmuş) kaydı unutur"""
+        self._entries.pop(self.key(instructions), None)
+
+    def _spawn(self, key: str, coro):
+        # Aynı talimat için aynı anda tek oluşturma/uzatma işi çalışır
+        if key in self._pending:
+            coro.close()
+            return
+        self._pending.add(key)
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda _: self._pending.discard(key))
+
+    async def _create(self, key: str, instructions: str):
+        try:
+            result = await self.client.create_cached_content(instructions, self.ttl, display_name=f"hirex-{key[:12]}")
+        except GeminiError as e:
+            self.failures.inc()
+            if e.status_code == 400:
+                # Geçersiz istek (ör. asgari boyutun altında): tekrar denemek sonucu değiştirmez
+                self._uncacheable.add(key)
+                logger.warning("Talimat Gemini önbelleğine alınamıyor, satır içi gönderilecek: %s", e)
+                return
+            self._failed_until[key] = time.time() + self.retry_after
+            logger.warning("Gemini önbelleği oluşturulamadı, talimat satır içi gönderilecek: %s", e)
+            return
+        self._entries[key] = _Entry(result["name"], time.time() + self.ttl)
+        self._failed_until.pop(key, None)
+        self.created.inc()
+
+    async def _refresh(self, key: str, instructions: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        try:
+            await self.client.update_cached_content_ttl(entry.name, self.ttl)
+            entry.expires_at = time.time() + self.ttl
+        except GeminiError as e:
+            # Uzatılamayan kayıt bırakılır; bir sonraki istek yenisini oluşturur
+            self.failures.inc()
+            self._entries.pop(key, None)
+            logger.warning("Gemini önbelleği uzatılamadı: %s", e)
+
+    async def close(self):
+        """Kayıtları siler; Gemini tarafında ömürleri dolana kadar ücretlendirilmemeleri için"""
+        for task in list(self._tasks):
+            task.cancel()
+        for entry in list(self._entries.values()):
+            try:
+                await self.client.delete_cached_content(entry.name)
+            except GeminiError:
+                pass
+        self._entries.clear()
+
+
+def is_cache_miss(error: GeminiError, extra: Dict[str, Any]) -> bool:
+    """İstek, Gemini tarafında artık bulunmayan bir cachedContent yüzünden mi başarısız oldu?"""
+    return "cachedContent" in extra and error.status_code in (400, 403, 404)
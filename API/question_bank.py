@@ -0,0 +1,239 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from logs import get_logger
+from metrics import registry
+
+
+logger = get_logger(__name__)
+
+# Varsayılan yol, modülü hangi dizinden yüklenirse yüklensin API/data altındadır
+QUESTION_BANK_PATH = os.getenv(
+    "QUESTION_BANK_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "question_bank.sqlite3")
+)
+QUESTION_BANK_POOL_SIZE = int(os.getenv("QUESTION_BANK_POOL_SIZE", "20"))
+# Arka planda doldurulacak pozisyonlar (virgülle ayrılmış); listede olmayan bir pozisyon
+# QUESTION_BANK_MIN_SEEN oturumda görüldükten sonra doldurulur (0: hiç doldurulmaz)
+QUESTION_BANK_POSITIONS = os.getenv("QUESTION_BANK_POSITIONS", "")
+QUESTION_BANK_MIN_SEEN = int(os.getenv("QUESTION_BANK_MIN_SEEN", "3"))
+# Aynı anda çalışabilecek en fazla doldurma görevi ve sayacı tutulan en fazla pozisyon
+QUESTION_BANK_MAX_REFILLS = int(os.getenv("QUESTION_BANK_MAX_REFILLS", "2"))
+QUESTION_BANK_SEEN_LIMIT = int(os.getenv("QUESTION_BANK_SEEN_LIMIT", "10000"))
+
+# Bankadan üretilen sorular kişiye özel olmamalı; adayın adı yerine bu kullanılır
+GENERIC_CANDIDATE_NAME = "Aday"
+
+QuestionList = List[Dict[str, Any]]
+
+
+def normalize_position(position: str) -> str:
+    """Pozisyon adını anahtar olarak kullanılabilecek biçime getirir ("Backend  Geliştirici!" -> "backend geliştirici")"""
+    # Türkçe büyük İ/I harfleri str.lower() ile doğru küçülmez
+    text = position.replace("İ", "i").replace("I", "ı").lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+class QuestionBank:
+    """(pozisyon, aşama) başına önceden üretilmiş soru setlerini saklayan kalıcı havuz.
+
+    Her oturum havuzdan rastgele bir set alır, böylece aynı pozisyondaki mülakatlar
+    farklılaşmaya devam eder. Havuz belirlenen boyutun altına düştüğünde arka planda
+    doldurulur. Pozisyon istemciden serbest metin olarak geldiğinden yalnızca izin
+    listesindeki veya yeterince sık görülen pozisyonlar doldurulur ve aynı anda
+    çalışan doldurma sayısı sınırlıdır; yeni veya yanlış yazılmış her pozisyon onlarca
+    Gemini çağrısı başlatmaz.
+    """
+
+    def __init__(
+        self,
+        path: str = QUESTION_BANK_PATH,
+        pool_size: int = QUESTION_BANK_POOL_SIZE,
+        positions: str = QUESTION_BANK_POSITIONS,
+        min_seen: int = QUESTION_BANK_MIN_SEEN,
+        max_refills: int = QUESTION_BANK_MAX_REFILLS,
+    ):
+        self.path = path
+        self.pool_size = pool_size
+        self.positions = {normalize_position(p) for p in positions.split(",") if p.strip()}
+        self.min_seen = min_seen
+        self.max_refills = max_refills
+        self._seen: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self._local = threading.local()
+        self._refilling: Set[Tuple[str, str]] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connect().execute(
+            """
+            CREATE TABLE IF NOT EXISTS question_sets (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                position_key TEXT NOT NULL,
+                stage_key TEXT NOT NULL,
+                questions TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._connect().execute(
+            "CREATE INDEX IF NOT EXISTS idx_question_sets_key ON question_sets (position_key, stage_key)"
+        )
+        self._connect().commit()
+
+        self.hits = registry.counter("question_bank_hits_total", "Soru bankasından karşılanan aşamalar")
+        self.misses = registry.counter("question_bank_misses_total", "Bankada set bulunmayan aşamalar")
+        self.refills_skipped = registry.counter(
+            "question_bank_refills_skipped_total",
+            "İzin listesi, görülme sayısı veya eşzamanlılık sınırı nedeniyle başlatılmayan doldurmalar"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 bağlantıları iş parçacıkları arasında paylaşılmaz
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def count_sync(self, position: str, stage_key: str) -> int:
+        row = self._connect().execute(
+            "SELECT COUNT(*) FROM question_sets WHERE position_key = ? AND stage_key = ?",
+            (normalize_position(position), stage_key),
+        ).fetchone()
+        return row[0]
+
+    def sample_sync(self, position: str, stage_key: str) -> Optional[QuestionList]:
+        row = self._connect().execute(
+            "SELECT questions FROM question_sets WHERE position_key = ? AND stage_key = ? ORDER BY RANDOM() LIMIT 1",
+            (normalize_position(position), stage_key),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def add_sync(self, position: str, stage_key: str, questions: QuestionList):
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO question_sets (position_key, stage_key, questions, created_at) VALUES (?, ?, ?, ?)",
+            (normalize_position(position), stage_key, json.dumps(questions, ensure_ascii=False), time.time()),
+        )
+        conn.commit()
+
+    async def sample(self, position: str, stage_key: str) -> Optional[QuestionList]:
+        """Havuzdan rastgele bir soru seti döndürür; havuz boşsa None döner"""
+        questions = await asyncio.to_thread(self.sample_sync, position, stage_key)
+        if questions is None:
+            self.misses.inc()
+        else:
+            self.hits.inc()
+        return questions
+
+    async def fill(
+        self,
+        position: str,
+        stage_key: str,
+        generate: Callable[[], Awaitable[QuestionList]],
+        target: Optional[int] = None,
+    ) -> int:
+        """Havuzu hedef boyuta kadar doldurur ve eklenen set sayısını döndürür"""
+        target = target or self.pool_size
+        missing = target - await asyncio.to_thread(self.count_sync, position, stage_key)
+        added = 0
+        for _ in range(max(missing, 0)):
+            questions = await generate()
+            if questions:
+                await asyncio.to_thread(self.add_sync, position, stage_key, questions)
+                added += 1
+        return added
+
+    def _eligible(self, key: Tuple[str, str]) -> bool:
+        if key[0] in self.positions:
+            return True
+        if self.min_seen <= 0:
+            return False
+        seen = self._seen.pop(key, 0) + 1
+        self._seen[key] = seen
+        if len(self._seen) > QUESTION_BANK_SEEN_LIMIT:
+            self._seen.popitem(last=False)
+        return seen >= self.min_seen
+
+    def refill_in_background(self, position: str, stage_key: str, generate: Callable[[], Awaitable[QuestionList]]):
+        """Aynı anahtar için tek bir doldurma görevi olacak şekilde arka planda doldurur"""
+        key = (normalize_position(position), stage_key)
+        if key in self._refilling:
+            return
+        if not self._eligible(key) or len(self._refilling) >= self.max_refills:
+            # Sınırda kalan doldurma sonraki oturumlarda tekrar denenir
+            self.refills_skipped.inc()
+            return
+
+        async def run():
+            try:
+                await self.fill(position, stage_key, generate)
+            except Exception as e:
+                logger.warning("Soru bankası doldurma hatası (%s/%s): %s", position, stage_key, e)
+            finally:
+                self._refilling.discard(key)
+
+        self._refilling.add(key)
+        task = asyncio.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        rows = self._connect().execute(
+            "SELECT position_key, stage_key, COUNT(*) FROM question_sets GROUP BY position_key, stage_key ORDER BY 1, 2"
+        ).fetchall()
+        return [{"position": p, "stage": s, "sets": n} for p, s, n in rows]
+
+
+async def _bulk_fill(positions: List[str], pool_size: int, concurrency: int):
+    # api modülü burada yüklenir; Gemini istemcisi ve aşama tanımları oradan gelir
+    import api
+
+    bank = QuestionBank(pool_size=pool_size)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fill_one(position: str, stage_info: Dict[str, str]):
+        stage = api.StageState(id=stage_info["id"], stage_key=stage_info["id"],
+                               name=stage_info["name"], description=stage_info["description"])
+
+        async def generate():
+            async with semaphore:
+                return await api.request_stage_questions(position, stage, GENERIC_CANDIDATE_NAME)
+
+        added = await bank.fill(position, stage_info["id"], generate)
+        print(f"{position} / {stage_info['id']}: {added} yeni set")
+
+    try:
+        await asyncio.gather(*[
+            fill_one(position, stage_info)
+            for position in positions
+            for stage_info in api.DEFAULT_INTERVIEW_STAGES
+        ])
+    finally:
+        await api.gemini_client.aclose()
+
+    for row in bank.stats():
+        print(f"{row['position']:<40} {row['stage']:<15} {row['sets']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soru bankasını kampanya öncesinde toplu olarak doldurur")
+    parser.add_argument("positions", nargs="+", help="Soruları üretilecek pozisyon adları")
+    parser.add_argument("--pool-size", type=int, default=QUESTION_BANK_POOL_SIZE,
+                        help="(pozisyon, aşama) başına tutulacak set sayısı")
+    parser.add_argument("--concurrency", type=int, default=4, help="Eşzamanlı Gemini isteği sayısı")
+    args = parser.parse_args()
+    asyncio.run(_bulk_fill(args.positions, args.pool_size, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import asyncio
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from logs import get_logger
+from metrics import registry
+
+
+logger = get_logger(__name__)
+
+
+class ReportStatus(str, Enum):
+    NOT_STARTED = "not_started"
+    PENDING = "pending"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class ReportManager:
+    """Mülakat sonu değerlendirme raporunu oturum başına tek bir arka plan işi olarak üretir.
+
+    Aynı oturum için iş zaten sürüyorsa start() yeni bir Gemini çağrısı başlatmaz.
+    Çağıran taraf, oturumu depoda PENDING olarak işaretleyen güncellemeyi başarıyla
+    yazdıktan sonra start() çağırır; böylece birden fazla worker olsa bile rapor bir
+    kez üretilir. Sonuç (başarısızlıkta None) complete ile kalıcı hale getirilir.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[Any], Awaitable[str]],
+        complete: Callable[[str, Optional[str]], Awaitable[None]],
+    ):
+        self._generate = generate
+        self._complete = complete
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.completed = registry.counter("report_jobs_completed_total", "Tamamlanan rapor işleri")
+        self.failed = registry.counter("report_jobs_failed_total", "Başarısız rapor işleri")
+        registry.gauge("report_jobs_running", "Süren rapor işleri", lambda: len(self._tasks))
+
+    def start(self, session) -> bool:
+        """Rapor işini başlatır; yeni bir iş başlatıldıysa True döner"""
+        if session.id in self._tasks:
+            return False
+        task = asyncio.create_task(self._run(session))
+        self._tasks[session.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(session.id, None))
+        return True
+
+    async def _run(self, session):
+        try:
+            feedback = await self._generate(session)
+            self.completed.inc()
+        except Exception as e:
+            feedback = None
+            self.failed.inc()
+            logger.error("Rapor oluşturma hatası (%s): %s", session.id, e)
+
+        try:
+            await self._complete(session.id, feedback)
+        except Exception as e:
+            logger.error("Rapor kaydedilemedi (%s): %s", session.id, e)
+
+    async def wait(self, session_id: str):
+        """Süren rapor işi varsa bitmesini bekler"""
+        task = self._tasks.get(session_id)
+        if task is not None:
+            await asyncio.shield(task)
+
+    def cancel(self, session_id: str):
+        task = self._tasks.pop(session_id, None)
+        if task is not None:
+            task.cancel()
@@ -0,0 +1,612 @@
+import asyncio
+import copy
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+
+from logs import get_logger
+from metrics import registry
+
+
+logger = get_logger(__name__)
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_STORE_URL = os.getenv("SESSION_STORE_URL", "")
+SESSION_STORE_PREFIX = os.getenv("SESSION_STORE_PREFIX", "hirex")
+
+# Çakışan güncellemelerde mutate() kaç kez yeniden denensin
+MUTATE_RETRIES = 5
+
+# Süre ve kapasite sınırları; 0 sınırı devre dışı bırakır
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", str(2 * 60 * 60)))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+# Boş bırakılırsa tamamlanan oturumlar silinmeden önce arşivlenmez
+SESSION_ARCHIVE_DIR = os.getenv("SESSION_ARCHIVE_DIR", "")
+
+S = TypeVar("S")
+
+
+class SessionNotFoundError(Exception):
+    """Oturum depoda bulunamadığında fırlatılır"""
+
+
+class ConcurrentUpdateError(Exception):
+    """Oturum, okunduktan sonra başka bir istek/worker tarafından güncellendiğinde fırlatılır"""
+
+
+# (oturum kimliği, son güncelleme zamanı, tamamlandı mı)
+SessionEntry = Tuple[str, float, bool]
+
+
+def approx_size(obj: Any, seen: Optional[set] = None) -> int:
+    """Nesnenin iç içe tuttuğu verilerle birlikte yaklaşık bellek boyutunu (bayt) hesaplar"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict):
+        size += sum(approx_size(k, seen) + approx_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approx_size(item, seen) for item in obj)
+    else:
+        if hasattr(obj, "__dict__"):
+            size += approx_size(vars(obj), seen)
+        for slot in getattr(type(obj), "__slots__", ()):
+            if hasattr(obj, slot):
+                size += approx_size(getattr(obj, slot), seen)
+    return size
+
+
+class SessionCodec(Generic[S]):
+    """Oturum nesnelerini depolama için baytlara çevirir ve geri okur"""
+
+    def dumps(self, session: S) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data: bytes) -> S:
+        raise NotImplementedError
+
+    def copy(self, session: S) -> S:
+        """Oturumun bağımsız bir kopyasını döndürür (bellek içi depo için)"""
+        return self.loads(self.dumps(session))
+
+
+class PydanticCodec(SessionCodec[S]):
+    """Pydantic oturum modellerini depolama için JSON baytlarına çevirir"""
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+
+    def dumps(self, session: S) -> bytes:
+        return session.model_dump_json().encode("utf-8")
+
+    def loads(self, data: bytes) -> S:
+        return self.model.model_validate_json(data)
+
+    def copy(self, session: S) -> S:
+        return session.model_copy(deep=True)
+
+
+class SessionStore(Generic[S]):
+    """Mülakat oturumları için sürüm numaralı (iyimser eşzamanlılık) depo arayüzü.
+
+    get() oturumla birlikte sürümünü döndürür; update() yalnızca depodaki sürüm
+    beklenen sürümle aynıysa yazar, aksi halde ConcurrentUpdateError fırlatır.
+    Böylece birden fazla worker aynı oturumu güvenle paylaşabilir.
+    """
+
+    async def get(self, session_id: str) -> Optional[Tuple[S, int]]:
+        raise NotImplementedError
+
+    async def create(self, session_id: str, session: S) -> int:
+        raise NotImplementedError
+
+    async def update(self, session_id: str, session: S, expected_version: int) -> int:
+        raise NotImplementedError
+
+    async def delete(self, session_id: str):
+        raise NotImplementedError
+
+    async def ids(self) -> List[str]:
+        raise NotImplementedError
+
+    async def count(self) -> int:
+        return len(await self.ids())
+
+    async def entries(self) -> List[SessionEntry]:
+        """Tahliye kararı için her oturumun son güncelleme zamanını ve durumunu döndürür"""
+        raise NotImplementedError
+
+    async def approx_bytes(self) -> int:
+        """Depoda tutulan oturum verisinin yaklaşık boyutu (bayt)"""
+        raise NotImplementedError
+
+    async def mutate(self, session_id: str, fn: Callable[[S], Any], retries: int = MUTATE_RETRIES) -> S:
+        """Oturumu okuyup fn ile değiştirir ve yazar; çakışmada baştan tekrar dener"""
+        for _ in range(retries):
+            loaded = await self.get(session_id)
+            if loaded is None:
+                raise SessionNotFoundError(session_id)
+            session, version = loaded
+            fn(session)
+            try:
+                await self.update(session_id, session, version)
+                return session
+            except ConcurrentUpdateError:
+                continue
+        raise ConcurrentUpdateError(session_id)
+
+    async def close(self):
+        pass
+
+
+class InMemorySessionStore(SessionStore[S]):
+    """Tek süreçli, bellek içi depo.
+
+    Okunan ve yazılan oturumlar kopyalanır; böylece update() ile kaydedilmemiş
+    değişiklikler (ör. yarıda kalan bir turun eklediği mesaj) diğer depolarda olduğu
+    gibi depoya ve diğer okuyuculara yansımaz, sürüm kontrolü de anlamını korur.
+    """
+
+    def __init__(self, clone: Callable[[S], S] = copy.deepcopy):
+        self._copy = clone
+        self._sessions: Dict[str, Tuple[S, int]] = {}
+        # Oturum başına [son güncelleme zamanı, ölçülen boyut]; boyut yazımdan sonra
+        # ilk istatistik isteğinde yeniden hesaplanır
+        self._meta: Dict[str, List] = {}
+
+    async def get(self, session_id: str) -> Optional[Tuple[S, int]]:
+        current = self._sessions.get(session_id)
+        if current is None:
+            return None
+        return self._copy(current[0]), current[1]
+
+    async def create(self, session_id: str, session: S) -> int:
+        if session_id in self._sessions:
+            raise ConcurrentUpdateError(session_id)
+        self._sessions[session_id] = (self._copy(session), 1)
+        self._meta[session_id] = [time.time(), None]
+        return 1
+
+    async def update(self, session_id: str, session: S, expected_version: int) -> int:
+        current = self._sessions.get(session_id)
+        if current is None:
+            raise SessionNotFoundError(session_id)
+        if current[1] != expected_version:
+            raise ConcurrentUpdateError(session_id)
+        self._sessions[session_id] = (self._copy(session), expected_version + 1)
+        self._meta[session_id] = [time.time(), None]
+        return expected_version + 1
+
+    async def delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+        self._meta.pop(session_id, None)
+
+    async def ids(self) -> List[str]:
+        return list(self._sessions)
+
+    async def count(self) -> int:
+        return len(self._sessions)
+
+    async def entries(self) -> List[SessionEntry]:
+        return [
+            (session_id, self._meta[session_id][0], bool(getattr(session, "completed", False)))
+            for session_id, (session, _) in self._sessions.items()
+        ]
+
+    async def approx_bytes(self) -> int:
+        total = 0
+        for session_id, (session, _) in list(self._sessions.items()):
+            meta = self._meta.get(session_id)
+            if meta is None:
+                continue
+            if meta[1] is None:
+                meta[1] = approx_size(session)
+            total += meta[1]
+        return total
+
+
+class SQLiteSessionStore(SessionStore[S]):
+    """Tek sunuculu kalıcılık için SQLite (WAL) deposu; yeniden başlatmada oturumlar korunur"""
+
+    def __init__(self, path: str, codec: SessionCodec):
+        self.path = path
+        self.codec = codec
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                completed INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        # Önceki sürümlerin oluşturduğu tablolarda completed sütunu yoktur
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+        if "completed" not in columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN completed INTEGER NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _get(self, session_id: str):
+        return self._connect().execute(
+            "SELECT data, version FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+
+    def _create(self, session_id: str, data: bytes, completed: bool):
+        try:
+            self._connect().execute(
+                "INSERT INTO sessions (id, version, data, completed, updated_at) VALUES (?, 1, ?, ?, ?)",
+                (session_id, data, int(completed), time.time()),
+            )
+        except sqlite3.IntegrityError:
+            raise ConcurrentUpdateError(session_id)
+
+    def _update(self, session_id: str, data: bytes, completed: bool, expected_version: int) -> int:
+        cursor = self._connect().execute(
+            "UPDATE sessions SET data = ?, completed = ?, version = version + 1, updated_at = ? "
+            "WHERE id = ? AND version = ?",
+            (data, int(completed), time.time(), session_id, expected_version),
+        )
+        return cursor.rowcount
+
+    async def get(self, session_id: str) -> Optional[Tuple[S, int]]:
+        row = await asyncio.to_thread(self._get, session_id)
+        if row is None:
+            return None
+        return self.codec.loads(row[0]), row[1]
+
+    async def create(self, session_id: str, session: S) -> int:
+        completed = bool(getattr(session, "completed", False))
+        await asyncio.to_thread(self._create, session_id, self.codec.dumps(session), completed)
+        return 1
+
+    async def update(self, session_id: str, session: S, expected_version: int) -> int:
+        completed = bool(getattr(session, "completed", False))
+        updated = await asyncio.to_thread(
+            self._update, session_id, self.codec.dumps(session), completed, expected_version
+        )
+        if not updated:
+            if await asyncio.to_thread(self._get, session_id) is None:
+                raise SessionNotFoundError(session_id)
+            raise ConcurrentUpdateError(session_id)
+        return expected_version + 1
+
+    async def delete(self, session_id: str):
+        await asyncio.to_thread(
+            lambda: self._connect().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        )
+
+    async def ids(self) -> List[str]:
+        rows = await asyncio.to_thread(
+            lambda: self._connect().execute("SELECT id FROM sessions").fetchall()
+        )
+        return [row[0] for row in rows]
+
+    async def count(self) -> int:
+        row = await asyncio.to_thread(
+            lambda: self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()
+        )
+        return row[0]
+
+    async def entries(self) -> List[SessionEntry]:
+        rows = await asyncio.to_thread(
+            lambda: self._connect().execute("SELECT id, updated_at, completed FROM sessions").fetchall()
+        )
+        return [(row[0], row[1], bool(row[2])) for row in rows]
+
+    async def approx_bytes(self) -> int:
+        row = await asyncio.to_thread(
+            lambda: self._connect().execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM sessions").fetchone()
+        )
+        return row[0]
+
+
+# Sürüm kontrolü ve yazma işlemini atomik yapan Lua betiği
+# KEYS[1]: oturum anahtarı, KEYS[2]: oturum kimlikleri kümesi
+# ARGV[1]: beklenen sürüm (oluşturmada 0), ARGV[2]: veri, ARGV[3]: oturum kimliği,
+# ARGV[4]: güncelleme zamanı, ARGV[5]: tamamlandı mı (0/1)
+_CAS_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'version')
+local expected = tonumber(ARGV[1])
+if (current == false and expected == 0) or (current ~= false and tonumber(current) == expected) then
+    redis.call('HSET', KEYS[1], 'data', ARGV[2], 'version', expected + 1, 'updated_at', ARGV[4], 'completed', ARGV[5])
+    redis.call('SADD', KEYS[2], ARGV[3])
+    return expected + 1
+end
+if current == false then
+    return -2
+end
+return -1
+"""
+
+
+class RedisSessionStore(SessionStore[S]):
+    """Çok süreçli ölçekleme için Redis protokolü konuşan depo (Redis, KeyDB, Dragonfly vb.)"""
+
+    def __init__(self, url: str, codec: SessionCodec, prefix: str = SESSION_STORE_PREFIX, client: Any = None):
+        if client is None:
+            try:
+                import redis.asyncio as redis_asyncio
+            except ImportError:
+                raise RuntimeError("Redis deposu için 'redis' paketi gerekli: pip install redis")
+            client = redis_asyncio.from_url(url)
+        self.redis = client
+        self.codec = codec
+        self.prefix = prefix
+        self._cas = self.redis.register_script(_CAS_SCRIPT)
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}:session:{session_id}"
+
+    @property
+    def _index_key(self) -> str:
+        return f"{self.prefix}:sessions"
+
+    async def get(self, session_id: str) -> Optional[Tuple[S, int]]:
+        data, version = await self.redis.hmget(self._key(session_id), "data", "version")
+        if data is None:
+            return None
+        return self.codec.loads(data), int(version)
+
+    async def _write(self, session_id: str, session: S, expected_version: int) -> int:
+        return int(await self._cas(
+            keys=[self._key(session_id), self._index_key],
+            args=[
+                expected_version, self.codec.dumps(session), session_id,
+                time.time(), int(bool(getattr(session, "completed", False))),
+            ],
+        ))
+
+    async def create(self, session_id: str, session: S) -> int:
+        result = await self._write(session_id, session, 0)
+        if result < 0:
+            raise ConcurrentUpdateError(session_id)
+        return result
+
+    async def update(self, session_id: str, session: S, expected_version: int) -> int:
+        result = await self._write(session_id, session, expected_version)
+        if result == -2:
+            raise SessionNotFoundError(session_id)
+        if result < 0:
+            raise ConcurrentUpdateError(session_id)
+        return result
+
+    async def delete(self, session_id: str):
+        await self.redis.delete(self._key(session_id))
+        await self.redis.srem(self._index_key, session_id)
+
+    async def ids(self) -> List[str]:
+        members = await self.redis.smembers(self._index_key)
+        return [m.decode("utf-8") if isinstance(m, bytes) else m for m in members]
+
+    async def count(self) -> int:
+        return int(await self.redis.scard(self._index_key))
+
+    async def _fetch_fields(self, session_ids: List[str], *fields: str) -> List[List[Any]]:
+        pipe = self.redis.pipeline(transaction=False)
+        for session_id in session_ids:
+            pipe.hmget(self._key(session_id), *fields)
+        return await pipe.execute()
+
+    async def entries(self) -> List[SessionEntry]:
+        session_ids = await self.ids()
+        result = []
+        stale = []
+        for session_id, (updated_at, completed) in zip(
+            session_ids, await self._fetch_fields(session_ids, "updated_at", "completed")
+        ):
+            if updated_at is None:
+                # Anahtarı dışarıdan silinmiş oturum; kümeden de çıkarılır
+                stale.append(session_id)
+                continue
+            result.append((session_id, float(updated_at), completed in (b"1", "1")))
+        if stale:
+            await self.redis.srem(self._index_key, *stale)
+        return result
+
+    async def approx_bytes(self) -> int:
+        session_ids = await self.ids()
+        pipe = self.redis.pipeline(transaction=False)
+        for session_id in session_ids:
+            pipe.hstrlen(self._key(session_id), "data")
+        return sum(int(n or 0) for n in await pipe.execute())
+
+    async def close(self):
+        await self.redis.aclose()
+
+
+class SessionLocks:
+    """Oturum başına async kilit; aynı oturumun turları sırayla, farklı oturumlar paralel işlenir.
+
+    Kilitler ilk kullanımda oluşturulur ve bekleyen kalmadığında silinir. asyncio.Lock
+    bekleyenleri geliş sırasıyla uyandırdığından turlar geliş sırasında işlenir. Kilit
+    süreç içidir; worker'lar arası çakışmaları deponun sürüm kontrolü yakalar.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+        self.wait_seconds = registry.histogram(
+            "session_lock_wait_seconds", "Oturum kilidi için beklenen süre",
+            (0.001, 0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30)
+        )
+        self.contended = registry.counter("session_lock_contended_total", "Kilit başka bir işte olduğu için bekleyen istekler")
+        registry.gauge("session_locks_active", "Kullanımda veya beklenen oturum kilitleri", lambda: len(self._locks))
+
+    def locked(self, session_id: str) -> bool:
+        lock = self._locks.get(session_id)
+        return lock is not None and lock.locked()
+
+    @asynccontextmanager
+    async def hold(self, session_id: str):
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = self._locks[session_id] = asyncio.Lock()
+        self._users[session_id] = self._users.get(session_id, 0) + 1
+        try:
+            if lock.locked():
+                self.contended.inc()
+            started = time.monotonic()
+            async with lock:
+                self.wait_seconds.observe(time.monotonic() - started)
+                yield
+        finally:
+            self._users[session_id] -= 1
+            if not self._users[session_id]:
+                del self._users[session_id]
+                del self._locks[session_id]
+
+
+class SessionArchiver:
+    """Tamamlanan oturumları silinmeden önce gün bazlı klasörlere JSON olarak yazar"""
+
+    def __init__(self, directory: str, codec: SessionCodec):
+        self.directory = directory
+        self.codec = codec
+
+    def _write(self, session_id: str, data: bytes):
+        day_dir = os.path.join(self.directory, time.strftime("%Y-%m-%d"))
+        os.makedirs(day_dir, exist_ok=True)
+        with open(os.path.join(day_dir, f"{session_id}.json"), "wb") as f:
+            f.write(data)
+
+    async def archive(self, session_id: str, session: Any):
+        await asyncio.to_thread(self._write, session_id, self.codec.dumps(session))
+
+
+class SessionJanitor:
+    """Boşta kalan oturumları TTL ve azami oturum sayısına göre periyodik olarak tahliye eder.
+
+    Önce süresi dolanlar, sınır hala aşılıyorsa tamamlanmış ve en uzun süredir
+    güncellenmeyen oturumlar silinir. Arşiv tanımlıysa tamamlanan oturumlar
+    silinmeden önce diske yazılır. Oturum kilitleri verilirse o an turu işlenen
+    oturumlar atlanır, diğerleri kilit altında silinir.
+    """
+
+    def __init__(
+        self,
+        store: SessionStore,
+        idle_ttl: float = SESSION_IDLE_TTL,
+        max_sessions: int = SESSION_MAX,
+        interval: float = SESSION_SWEEP_INTERVAL,
+        archiver: Optional[SessionArchiver] = None,
+        on_evict: Optional[Callable[[str], Any]] = None,
+        locks: Optional[SessionLocks] = None,
+    ):
+        self.store = store
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.interval = interval
+        self.archiver = archiver
+        self.on_evict = on_evict
+        self.locks = locks
+        self._task: Optional[asyncio.Task] = None
+        self.evicted = registry.counter("sessions_evicted_total", "TTL veya kapasite nedeniyle silinen oturumlar")
+        self.archived = registry.counter("sessions_archived_total", "Silinmeden önce arşivlenen oturumlar")
+        # Depo sorguları async olduğundan gauge değerleri her taramada güncellenir
+        self.active = registry.gauge("sessions_active", "Depodaki oturum sayısı (taramada yenilenir, yeni oturumlarla artar)")
+        self.stored_bytes = registry.gauge("sessions_bytes", "Oturum verisinin yaklaşık boyutu (son tarama)")
+
+    def select_victims(self, entries: List[SessionEntry], now: float) -> List[str]:
+        victims = []
+        remaining = []
+        for entry in entries:
+            if self.idle_ttl and now - entry[1] > self.idle_ttl:
+                victims.append(entry[0])
+            else:
+                remaining.append(entry)
+        overflow = len(remaining) - self.max_sessions if self.max_sessions else 0
+        if overflow > 0:
+            # Tamamlanmış oturumlar önce, sonra en eski güncellenenler
+            remaining.sort(key=lambda e: (not e[2], e[1]))
+            victims.extend(e[0] for e in remaining[:overflow])
+        return victims
+
+    async def sweep(self) -> int:
+        """Tek bir tahliye turu çalıştırır ve silinen oturum sayısını döndürür"""
+        entries = await self.store.entries()
+        victims = self.select_victims(entries, time.time())
+        evicted = 0
+        for session_id in victims:
+            if self.locks is None:
+                evicted += await self._evict(session_id)
+            elif not self.locks.locked(session_id):
+                async with self.locks.hold(session_id):
+                    evicted += await self._evict(session_id)
+        self.evicted.inc(evicted)
+        self.active.set(len(entries) - evicted)
+        self.stored_bytes.set(await self.store.approx_bytes())
+        return evicted
+
+    async def _evict(self, session_id: str) -> int:
+        if self.archiver is not None:
+            loaded = await self.store.get(session_id)
+            if loaded is not None and getattr(loaded[0], "completed", False):
+                try:
+                    await self.archiver.archive(session_id, loaded[0])
+                    self.archived.inc()
+                except Exception as e:
+                    # Arşivlenemeyen oturum silinmez, bir sonraki turda tekrar denenir
+                    logger.error("Oturum arşivlenemedi (%s): %s", session_id, e)
+                    return 0
+        await self.store.delete(session_id)
+        if self.on_evict is not None:
+            self.on_evict(session_id)
+        return 1
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                evicted = await self.sweep()
+                if evicted:
+                    logger.info("%d oturum tahliye edildi", evicted)
+            except Exception as e:
+                logger.error("Oturum tahliye hatası: %s", e)
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def create_session_store(codec: SessionCodec, backend: str = SESSION_STORE, url: str = SESSION_STORE_URL) -> SessionStore:
+    """SESSION_STORE ortam değişkenine göre (memory / sqlite / redis) depo oluşturur"""
+    backend = backend.lower()
+    if backend == "memory":
+        return InMemorySessionStore(codec.copy)
+    if backend == "sqlite":
+        return SQLiteSessionStore(url or "data/sessions.sqlite3", codec)
+    if backend == "redis":
+        return RedisSessionStore(url or "redis://localhost:6379/0", codec)
+    raise ValueError(f"Bilinmeyen oturum deposu: {backend}")
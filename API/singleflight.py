@@ -0,0 +1,56 @@
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+from metrics import registry
+
+
+T = TypeVar("T")
+
+
+def request_key(*parts: Any) -> str:
+    """İstek parçalarından sıralı, boşluksuz JSON üzerinden kararlı bir anahtar üretir"""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Aynı anahtarla eşzamanlı gelen çağrıları tek bir üst akış çağrısında birleştirir.
+
+    İlk çağıran işi bir görev olarak başlatır; iş sürerken aynı anahtarla gelenler aynı
+    görevin sonucunu (veya hatasını) bekler. Sonuç saklanmaz, görev bitince anahtar
+    serbest kalır. Bekleyenlerden birinin iptal edilmesi ortak görevi iptal etmez.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[str, asyncio.Task] = {}
+        self.calls = registry.counter(f"{name}_singleflight_calls_total", f"Üst akışa giden {name} çağrıları")
+        self.shared = registry.counter(
+            f"{name}_singleflight_shared_total", f"Devam eden bir çağrıya eklenerek karşılanan {name} istekleri"
+        )
+        registry.gauge(
+            f"{name}_singleflight_in_flight", f"Devam eden tekil {name} çağrıları", lambda: len(self._flights)
+        )
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._flights.get(key)
+        if task is None:
+            self.calls.inc()
+            task = asyncio.create_task(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.shared.inc()
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        # Tüm bekleyenler iptal edildiyse hata kimse tarafından okunmaz; uyarı üretmesin
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,105 @@
+import json
+import re
+from typing import List, Optional
+
+
+# Cümle sonu: . ! ? … işaretlerinden sonra boşluk gelmesi gerekir ("1.5" gibi sayılar bölünmez)
+_SENTENCE_END = re.compile(r"[.!?…]+[\"')\]]*\s+")
+
+
+class JsonStringFieldExtractor:
+    """Parça parça gelen JSON metninden tek bir string alanın değerini akış halinde çıkarır.
+
+    Gemini yanıtı tamamlanmadan, örneğin "next_question" alanının içeriği
+    geldikçe okunabilsin diye kullanılır. Kaçış dizileri (\\n, \\", \\uXXXX)
+    parçalar arasında bölünse bile doğru çözülür.
+    """
+
+    def __init__(self, field: str):
+        self.buffer = ""
+        self.done = False
+        self._key = re.compile(r'"' + re.escape(field) + r'"\s*:\s*"')
+        self._start: Optional[int] = None
+        self._pos = 0
+
+    @property
+    def started(self) -> bool:
+        return self._start is not None
+
+    def feed(self, text: str) -> str:
+        """Yeni JSON parçasını ekler ve alanın yeni çözülen kısmını döndürür"""
+        self.buffer += text
+        if self.done:
+            return ""
+
+        if self._start is None:
+            match = self._key.search(self.buffer)
+            if not match:
+                return ""
+            self._start = self._pos = match.end()
+
+        decoded = []
+        i = self._pos
+        while i < len(self.buffer):
+            ch = self.buffer[i]
+            if ch == '"':
+                self.done = True
+                i += 1
+                break
+            if ch == "\\":
+                # Kaçış dizisi henüz tamamlanmadıysa bir sonraki parçayı bekle
+                if i + 1 >= len(self.buffer):
+                    break
+                if self.buffer[i + 1] == "u":
+                    if i + 6 > len(self.buffer):
+                        break
+                    escape = self.buffer[i:i + 6]
+                    i += 6
+                else:
+                    escape = self.buffer[i:i + 2]
+                    i += 2
+                try:
+                    decoded.append(json.loads(f'"{escape}"'))
+                except json.JSONDecodeError:
+                    decoded.append(escape)
+                continue
+            decoded.append(ch)
+            i += 1
+
+        self._pos = i
+        return "".join(decoded)
+
+
+class SentenceSplitter:
+    """Akış halinde gelen metni tamamlanmış cümlelere böler"""
+
+    def __init__(self, min_length: int = 12):
+        # Çok kısa parçalar ("Evet.") bir sonraki cümleyle birleştirilir
+        self.min_length = min_length
+        self._pending = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Metin ekler ve tamamlanan cümleleri döndürür"""
+        self._pending += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._pending):
+            candidate = self._pending[start:match.end()].strip()
+            if len(candidate) < self.min_length:
+                continue
+            sentences.append(candidate)
+            start = match.end()
+        self._pending = self._pending[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """Kalan metni son cümle olarak döndürür"""
+        remainder = self._pending.strip()
+        self._pending = ""
+        return [remainder] if remainder else []
+
+
+def extract_json_scalar(buffer: str, field: str) -> Optional[str]:
+    """Tamamlanmamış JSON metninden sayı/bool gibi basit bir alanın ham değerini okur"""
+    match = re.search(r'"' + re.escape(field) + r'"\s*:\s*(-?\d+(?:\.\d+)?|true|false)', buffer)
+    return match.group(1) if match else None
@@ -0,0 +1,122 @@
+from typing import Any, Dict, Generic, List, Optional, Type, TypeVar
+
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from typing_extensions import Annotated
+
+from metrics import registry
+
+
+T = TypeVar("T")
+
+# Değerlendirme puanının geçerli aralığı
+SCORE_MIN = 0
+SCORE_MAX = 100
+
+# Gemini responseSchema'nın desteklediği OpenAPI alanları; diğerleri (title, default, ...) atılır
+_SCHEMA_KEYS = {
+    "type", "format", "description", "nullable", "enum", "properties", "required",
+    "items", "minItems", "maxItems", "minimum", "maximum",
+}
+
+
+class StageQuestion(BaseModel):
+    question: str
+    intent: str
+    expected_themes: List[str]
+
+
+class EvaluationResult(BaseModel):
+    # Alan sırası önemlidir: akış modunda puan ve aşama durumu next_question'dan önce okunur
+    satisfaction_score: int = Field(ge=SCORE_MIN, le=SCORE_MAX)
+    stage_complete: bool
+    next_question: str
+
+
+class StructuredOutputError(Exception):
+    """Model çıktısı beklenen şemaya uymadığında fırlatılır"""
+
+
+_SCORE_NUMBER = TypeAdapter(Annotated[float, Field(allow_inf_nan=False)])
+
+
+def clamp_score(raw: Any) -> Optional[int]:
+    """Akıştan ham olarak okunan puanı doğrular ve EvaluationResult aralığına çeker; sayı değilse None"""
+    try:
+        value = _SCORE_NUMBER.validate_python(raw)
+    except ValidationError:
+        return None
+    return min(max(int(round(value)), SCORE_MIN), SCORE_MAX)
+
+
+def to_gemini_schema(schema: Dict[str, Any], defs: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Pydantic JSON şemasını Gemini responseSchema biçimine çevirir ($ref'ler açılır)"""
+    if defs is None:
+        defs = schema.get("$defs", {})
+    if "$ref" in schema:
+        return to_gemini_schema(defs[schema["$ref"].split("/")[-1]], defs)
+    result = {key: value for key, value in schema.items() if key in _SCHEMA_KEYS}
+    if "properties" in schema:
+        result["properties"] = {
+            name: to_gemini_schema(prop, defs) for name, prop in schema["properties"].items()
+        }
+        # Gemini aksi belirtilmezse alanları alfabetik sırayla üretir
+        result["propertyOrdering"] = list(schema["properties"])
+    if "items" in schema:
+        result["items"] = to_gemini_schema(schema["items"], defs)
+    return result
+
+
+def _strip_fences(text: str) -> str:
+    # JSON modu kapalı bir modelden veya eski istemlerden gelen ```json blokları
+    if "```json" in text:
+        return text.split("```json")[1].split("```")[0].strip()
+    if "```" in text:
+        return text.split("```")[1].split("```")[0].strip()
+    return text.strip()
+
+
+class StructuredOutput(Generic[T]):
+    """Bir çıktı türü için Gemini JSON modu ayarlarını, doğrulamayı ve sayaçları bir arada tutar"""
+
+    def __init__(self, kind: str, output_type: Type[T]):
+        self.kind = kind
+        self.adapter = TypeAdapter(output_type)
+        self.generation_config = {
+            "responseMimeType": "application/json",
+            "responseSchema": to_gemini_schema(self.adapter.json_schema()),
+        }
+        self.parse_failures = registry.counter(
+            f"{kind}_parse_failures_total", f"Şemaya uymayan ilk {kind} yanıtları"
+        )
+        self.repaired = registry.counter(
+            f"{kind}_repaired_total", f"Onarım isteğiyle kurtarılan {kind} yanıtları"
+        )
+        self.fallbacks = registry.counter(
+            f"{kind}_fallbacks_total", f"Onarılamayıp varsayılana düşen {kind} yanıtları"
+        )
+
+    def parse(self, text: str) -> T:
+        """Yanıtı doğrular; önce doğrudan (pydantic-core), olmazsa kod bloğu ayıklanarak"""
+        try:
+            return self.adapter.validate_json(text)
+        except ValidationError:
+            pass
+        try:
+            return self.adapter.validate_json(_strip_fences(text))
+        except ValidationError as e:
+            raise StructuredOutputError(str(e)) from e
+
+    def repair_prompt(self, text: str, error: Exception) -> str:
+        return (
+            "Aşağıdaki çıktı beklenen JSON şemasına uymuyor.\n\n"
+            f"## HATA:\n{error}\n\n"
+            f"## ÇIKTI:\n{text}\n\n"
+            "Aynı içeriği koruyarak yalnızca şemaya uygun, düzeltilmiş JSON'u ver."
+        )
+
+    def dump(self, value: T) -> Any:
+        return self.adapter.dump_python(value)
+
+
+EVALUATION_OUTPUT = StructuredOutput("evaluation", EvaluationResult)
+QUESTIONS_OUTPUT = StructuredOutput("stage_questions", Annotated[List[StageQuestion], Field(min_length=1)])
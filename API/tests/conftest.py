@@ -0,0 +1,14 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# API modülleri düz içe aktarılır (ör. "from metrics import registry")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def run():
+    """Coroutine'i yeni bir event loop'ta çalıştırır"""
+    return asyncio.run
@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from batch import SessionLoader
+from session_store import SessionNotFoundError
+
+
+def test_live_sessions_are_reloaded_and_archived_ones_cached(tmp_path, run):
+    async def scenario():
+        live = {"s1": {"version": 1}}
+        fetches = []
+
+        async def fetch(session_id):
+            fetches.append(session_id)
+            session = live.get(session_id)
+            return dict(session) if session is not None else None
+
+        day = tmp_path / "2026-01-01"
+        day.mkdir()
+        (day / "old.json").write_text(json.dumps({"version": "arşiv"}))
+        loader = SessionLoader(fetch, dict, archive_dir=str(tmp_path))
+
+        assert (await loader.load("s1"))["version"] == 1
+        live["s1"]["version"] = 2
+        # Canlı oturum sonraki toplu işlerde güncel haliyle okunur
+        assert (await loader.load("s1"))["version"] == 2
+
+        assert (await loader.load("old"))["version"] == "arşiv"
+        (day / "old.json").unlink()
+        assert (await loader.load("old"))["version"] == "arşiv"
+
+        with pytest.raises(SessionNotFoundError):
+            await loader.load("yok")
+
+    run(scenario())
@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+from feed import Feed, FeedNotifier, parse_cursor, sse_event
+from interview_state import ChatHistory
+
+
+def test_parse_cursor_prefers_last_event_id():
+    assert parse_cursor(None, None) == 0
+    assert parse_cursor(5, None) == 5
+    assert parse_cursor(-3, None) == 0
+    # SSE yeniden bağlanması: son alınan olaydan sonrası istenir
+    assert parse_cursor(2, "7") == 8
+    assert parse_cursor(2, "geçersiz") == 2
+
+
+def test_history_since_uses_stable_sequence_numbers():
+    history = ChatHistory()
+    for i in range(4):
+        history.append(f"m{i}", i % 2 == 0, 0, i)
+    messages = history.since(2)
+    assert [(m["seq"], m["content"]) for m in messages] == [(2, "m2"), (3, "m3")]
+    assert history.since(4) == []
+    history.append("m4", True, 0, 4)
+    assert [m["seq"] for m in history.since(4)] == [4]
+
+
+def test_feed_wait_wakes_on_notify_and_times_out(run):
+    async def scenario():
+        feed = Feed()
+        assert await feed.wait(feed.version, 0.01) is False
+
+        seen = feed.version
+        waiter = asyncio.create_task(feed.wait(seen, 1))
+        await asyncio.sleep(0)
+        feed.notify()
+        assert await waiter is True
+        # Okuma ile bekleme arasında gelen bildirim kaçırılmaz
+        assert await feed.wait(seen, 0.01) is True
+
+    run(scenario())
+
+
+def test_notifier_tracks_only_listened_sessions(run):
+    async def scenario():
+        notifier = FeedNotifier()
+        notifier.notify("yok")
+        async with notifier.listen("s1") as feed:
+            async with notifier.listen("s1") as same:
+                assert same is feed
+                seen = feed.version
+                notifier.notify("s1")
+                assert await feed.wait(seen, 0.01)
+        assert "s1" not in notifier._feeds
+
+    run(scenario())
+
+
+def test_sse_event_format():
+    event = sse_event({"content": "Merhaba"}, event="message", event_id=3)
+    lines = event.split("\n")
+    assert lines[:2] == ["id: 3", "event: message"]
+    assert json.loads(lines[2][len("data: "):]) == {"content": "Merhaba"}
+    assert event.endswith("\n\n")
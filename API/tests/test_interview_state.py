@@ -0,0 +1,22 @@
+from pydantic_core import from_json
+
+from interview_state import SessionState, StageState, StateCodec
+
+
+def test_public_projection_hides_internal_fields():
+    session = SessionState(
+        id="s1", position="Backend Geliştirici", candidate_name="Aday",
+        stages=[StageState(id="st1", stage_key="intro", name="Tanışma", description="")],
+    )
+    session.chat_history.append("Merhaba", True, 0, 1)
+    session.replies["m1"] = {"message": "Yanıt", "stage_index": 0, "completed": False}
+    session.delivered = 1
+    codec = StateCodec()
+
+    public = from_json(codec.dumps_public(session))
+    assert "replies" not in public and "delivered" not in public
+    assert public["chat_history"][0]["content"] == "Merhaba"
+
+    # Depolama kodlaması iç alanları korur
+    restored = codec.loads(codec.dumps(session))
+    assert restored.replies == session.replies and restored.delivered == 1
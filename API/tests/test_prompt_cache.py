@@ -0,0 +1,71 @@
+from gemini_client import GeminiError
+from prompt_cache import PromptCache, cache_min_tokens
+
+
+class FakeClient:
+    def __init__(self, error=None, model="gemini-2.0-flash"):
+        self.error = error
+        self.model = model
+        self.created = 0
+
+    async def create_cached_content(self, instructions, ttl, display_name=None):
+        self.created += 1
+        if self.error is not None:
+            raise self.error
+        return {"name": f"cachedContents/{self.created}"}
+
+
+LONG = "kriter " * 4000
+
+
+def test_short_instructions_are_never_cached(run):
+    async def scenario():
+        client = FakeClient()
+        cache = PromptCache(client, enabled=True, min_tokens=4096)
+        for _ in range(3):
+            assert "systemInstruction" in cache.resolve("kısa talimat")
+        assert client.created == 0
+
+    run(scenario())
+
+
+def test_min_tokens_follow_the_configured_model():
+    assert cache_min_tokens("gemini-2.5-flash-lite") == 1024
+    assert cache_min_tokens("gemini-2.0-flash-001") == 4096
+    assert cache_min_tokens("bilinmeyen-model") == 4096
+    assert PromptCache(FakeClient(model="gemini-2.5-flash"), min_tokens=None).min_tokens == 1024
+    assert PromptCache(FakeClient(model="gemini-2.5-flash"), min_tokens=2048).min_tokens == 2048
+
+
+def test_cache_is_used_once_created(run):
+    async def scenario():
+        client = FakeClient()
+        cache = PromptCache(client, enabled=True, min_tokens=100)
+        assert "systemInstruction" in cache.resolve(LONG)
+        for task in list(cache._tasks):
+            await task
+        assert cache.resolve(LONG) == {"cachedContent": "cachedContents/1"}
+
+    run(scenario())
+
+
+def test_rejected_instructions_are_not_retried(run):
+    async def scenario():
+        client = FakeClient(GeminiError("içerik çok küçük", status_code=400))
+        cache = PromptCache(client, enabled=True, min_tokens=100, retry_after=0)
+        for _ in range(3):
+            assert "systemInstruction" in cache.resolve(LONG)
+            for task in list(cache._tasks):
+                await task
+        assert client.created == 1
+
+        # Geçici hatalarda retry_after sonra tekrar denenir
+        client = FakeClient(GeminiError("aşırı yük", status_code=503))
+        cache = PromptCache(client, enabled=True, min_tokens=100, retry_after=0)
+        for _ in range(2):
+            cache.resolve(LONG)
+            for task in list(cache._tasks):
+                await task
+        assert client.created == 2
+
+    run(scenario())
@@ -0,0 +1,49 @@
+import asyncio
+
+from question_bank import QuestionBank
+
+
+def make_bank(tmp_path, **kwargs) -> QuestionBank:
+    return QuestionBank(str(tmp_path / "bank.sqlite3"), pool_size=2, **kwargs)
+
+
+def test_unknown_positions_refill_only_after_repeated_use(tmp_path, run):
+    async def scenario():
+        bank = make_bank(tmp_path, positions="Backend Geliştirici", min_seen=3, max_refills=4)
+        calls = []
+
+        async def generate():
+            calls.append(1)
+            return [{"question": "Q?"}]
+
+        bank.refill_in_background("backend  geliştirici!", "intro", generate)
+        for _ in range(2):
+            bank.refill_in_background("Bakend Gelistirci", "intro", generate)
+        await asyncio.gather(*bank._tasks)
+        assert len(calls) == 2
+        assert bank.count_sync("Bakend Gelistirci", "intro") == 0
+
+        bank.refill_in_background("Bakend Gelistirci", "intro", generate)
+        await asyncio.gather(*bank._tasks)
+        assert bank.count_sync("Bakend Gelistirci", "intro") == 2
+
+    run(scenario())
+
+
+def test_refills_in_flight_are_capped(tmp_path, run):
+    async def scenario():
+        bank = make_bank(tmp_path, positions="a,b,c", max_refills=2)
+        release = asyncio.Event()
+
+        async def generate():
+            await release.wait()
+            return [{"question": "Q?"}]
+
+        for position in ("a", "b", "c"):
+            bank.refill_in_background(position, "intro", generate)
+        assert len(bank._refilling) == 2
+        release.set()
+        await asyncio.gather(*bank._tasks)
+        assert bank.count_sync("c", "intro") == 0
+
+    run(scenario())
@@ -0,0 +1,163 @@
+import asyncio
+
+import pytest
+
+from interview_state import SessionState, StageState, StateCodec
+from session_store import (
+    ConcurrentUpdateError, InMemorySessionStore, RedisSessionStore, SessionJanitor, SessionLocks, SessionNotFoundError,
+    SQLiteSessionStore,
+)
+
+
+codec = StateCodec()
+
+
+def make_session(session_id: str = "s1") -> SessionState:
+    return SessionState(
+        id=session_id,
+        position="Backend Geliştirici",
+        candidate_name="Aday",
+        stages=[StageState(id="st1", stage_key="intro", name="Tanışma", description="Kısa tanışma")],
+    )
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield InMemorySessionStore(codec.copy)
+    elif request.param == "sqlite":
+        yield SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), codec)
+    else:
+        fakeredis = pytest.importorskip("fakeredis")
+        yield RedisSessionStore("", codec, prefix="test", client=fakeredis.FakeAsyncRedis())
+
+
+def test_versions_increase_on_update(store, run):
+    async def scenario():
+        assert await store.create("s1", make_session()) == 1
+        session, version = await store.get("s1")
+        assert version == 1
+        session.chat_history.append("Merhaba", True, 0, 1)
+        assert await store.update("s1", session, version) == 2
+        session, version = await store.get("s1")
+        assert version == 2
+        assert [turn.content for turn in session.chat_history] == ["Merhaba"]
+
+    run(scenario())
+
+
+def test_stale_update_is_rejected(store, run):
+    async def scenario():
+        await store.create("s1", make_session())
+        first, version = await store.get("s1")
+        second, _ = await store.get("s1")
+        first.chat_history.append("birinci", True, 0, 1)
+        await store.update("s1", first, version)
+        second.chat_history.append("ikinci", True, 0, 1)
+        with pytest.raises(ConcurrentUpdateError):
+            await store.update("s1", second, version)
+        session, version = await store.get("s1")
+        assert version == 2
+        assert [turn.content for turn in session.chat_history] == ["birinci"]
+
+    run(scenario())
+
+
+def test_duplicate_create_and_missing_update(store, run):
+    async def scenario():
+        await store.create("s1", make_session())
+        with pytest.raises(ConcurrentUpdateError):
+            await store.create("s1", make_session())
+        with pytest.raises(SessionNotFoundError):
+            await store.update("yok", make_session("yok"), 1)
+        await store.delete("s1")
+        assert await store.get("s1") is None
+        with pytest.raises(SessionNotFoundError):
+            await store.mutate("s1", lambda session: None)
+
+    run(scenario())
+
+
+def test_uncommitted_changes_are_not_visible(store, run):
+    # Yarıda kalan bir tur (ör. Gemini hatası) depodaki oturumu değiştirmemeli
+    async def scenario():
+        await store.create("s1", make_session())
+        session, _ = await store.get("s1")
+        session.chat_history.append("yanıtsız kalan mesaj", True, 0, 1)
+        session.stages[0].attempts += 1
+        session.replies["m1"] = {"message": "x"}
+        fresh, version = await store.get("s1")
+        assert len(fresh.chat_history) == 0
+        assert fresh.stages[0].attempts == 0
+        assert fresh.replies == {}
+        assert version == 1
+
+    run(scenario())
+
+
+def test_mutate_retries_after_conflict(store, run):
+    async def scenario():
+        await store.create("s1", make_session())
+        calls = []
+
+        async def interfere():
+            session, version = await store.get("s1")
+            session.chat_history.append("araya giren", False, 0, 0)
+            await store.update("s1", session, version)
+
+        original_get = store.get
+        pending = [interfere]
+
+        async def get(session_id):
+            loaded = await original_get(session_id)
+            # İlk okumadan sonra başka bir yazar oturumu günceller
+            if pending:
+                await pending.pop()()
+            return loaded
+
+        store.get = get
+
+        def apply(session):
+            calls.append(len(session.chat_history))
+            session.completed = True
+
+        await store.mutate("s1", apply)
+        store.get = original_get
+        session, version = await store.get("s1")
+        assert calls == [0, 1]
+        assert version == 3
+        assert session.completed
+        assert [turn.content for turn in session.chat_history] == ["araya giren"]
+
+    run(scenario())
+
+
+def test_entries_report_completion(store, run):
+    async def scenario():
+        await store.create("s1", make_session())
+        done = make_session("s2")
+        done.completed = True
+        await store.create("s2", done)
+        entries = {session_id: completed for session_id, _, completed in await store.entries()}
+        assert entries == {"s1": False, "s2": True}
+        assert await store.count() == 2
+        assert await store.approx_bytes() > 0
+
+    run(scenario())
+
+
+def test_janitor_skips_sessions_with_a_turn_in_progress(run):
+    async def scenario():
+        store = InMemorySessionStore(codec.copy)
+        locks = SessionLocks()
+        janitor = SessionJanitor(store, idle_ttl=0.01, max_sessions=0, interval=0, locks=locks)
+        await store.create("busy", make_session("busy"))
+        await store.create("idle", make_session("idle"))
+        await asyncio.sleep(0.02)
+        async with locks.hold("busy"):
+            assert await janitor.sweep() == 1
+            assert await store.get("busy") is not None
+        assert await store.get("idle") is None
+        assert await janitor.sweep() == 1
+
+    run(scenario())
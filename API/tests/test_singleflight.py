@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight, request_key
+
+
+def test_concurrent_calls_share_one_flight(run):
+    async def scenario():
+        flight = SingleFlight("test_sf_share")
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "yanıt"
+
+        results = await asyncio.gather(*(flight.do("k", fetch) for _ in range(5)))
+        assert results == ["yanıt"] * 5
+        assert len(calls) == 1
+        assert len(flight) == 0
+        # Görev bittikten sonra aynı anahtar yeniden çağrılır; sonuç saklanmaz
+        assert await flight.do("k", fetch) == "yanıt"
+        assert len(calls) == 2
+
+    run(scenario())
+
+
+def test_different_keys_do_not_share(run):
+    async def scenario():
+        flight = SingleFlight("test_sf_keys")
+
+        async def echo(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(flight.do("a", lambda: echo(1)), flight.do("b", lambda: echo(2)))
+        assert results == [1, 2]
+
+    run(scenario())
+
+
+def test_error_reaches_every_waiter_and_releases_key(run):
+    async def scenario():
+        flight = SingleFlight("test_sf_error")
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("hata")
+
+        results = await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        assert len(flight) == 0
+
+    run(scenario())
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call(run):
+    async def scenario():
+        flight = SingleFlight("test_sf_cancel")
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "tamam"
+
+        first = asyncio.create_task(flight.do("k", slow))
+        second = asyncio.create_task(flight.do("k", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "tamam"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    run(scenario())
+
+
+def test_request_key_is_order_independent():
+    assert request_key({"a": 1, "b": [1, 2]}) == request_key({"b": [1, 2], "a": 1})
+    assert request_key({"a": 1}) != request_key({"a": 2})
@@ -0,0 +1,16 @@
+from structured import EVALUATION_OUTPUT, SCORE_MAX, SCORE_MIN, clamp_score
+
+
+def test_clamp_score_bounds_streamed_scores():
+    assert clamp_score("70") == 70
+    assert clamp_score("70.6") == 71
+    assert clamp_score("-5") == SCORE_MIN
+    assert clamp_score("250") == SCORE_MAX
+    assert clamp_score("abc") is None
+    assert clamp_score(None) is None
+    assert clamp_score("nan") is None
+
+
+def test_evaluation_schema_limits_match_clamp():
+    schema = EVALUATION_OUTPUT.generation_config["responseSchema"]["properties"]["satisfaction_score"]
+    assert (schema["minimum"], schema["maximum"]) == (SCORE_MIN, SCORE_MAX)
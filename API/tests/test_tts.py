@@ -0,0 +1,23 @@
+import threading
+
+import pytest
+
+from tts import TTSError, TTSService
+
+
+def test_queue_depth_recovers_when_queued_jobs_time_out(run):
+    async def scenario():
+        service = TTSService(api_key="test", max_workers=1, deadline=5)
+        release = threading.Event()
+        service.synthesize_sync = lambda *args: release.wait(5) and b"ses"
+
+        running = service._submit(service.synthesize_sync, "bir")
+        # Tek işçi meşgulken kuyruktaki istek süre aşımıyla iptal edilir
+        with pytest.raises(TTSError):
+            await service.synthesize("iki", deadline=0.05)
+        release.set()
+        assert await running == b"ses"
+        assert service.queue_depth == 0
+        service.close()
+
+    run(scenario())
@@ -0,0 +1,52 @@
+import os
+
+from tts_cache import MemoryLRU, TTSCache, cache_key
+
+
+def files_in(directory):
+    return [name for _, _, names in os.walk(directory) for name in names]
+
+
+def test_only_static_phrases_reach_disk(tmp_path, run):
+    async def scenario():
+        cache = TTSCache(str(tmp_path), memory_bytes=1024, disk_bytes=1024 * 1024)
+        calls = []
+
+        async def synthesize():
+            calls.append(1)
+            return b"ses"
+
+        await cache.get_or_synthesize("Adaya özel soru?", "v", "m", "mp3", synthesize)
+        assert files_in(tmp_path) == []
+        # Dinamik metin bellekten tekrar kullanılabilir
+        await cache.get_or_synthesize("Adaya özel soru?", "v", "m", "mp3", synthesize)
+        assert len(calls) == 1
+
+        await cache.get_or_synthesize("Harika.", "v", "m", "mp3", synthesize, pin=True)
+        assert files_in(tmp_path) == [cache_key("Harika.", "v", "m", "mp3")]
+
+        # Yeni süreç: sabit ifade diskten gelir
+        fresh = TTSCache(str(tmp_path), memory_bytes=1024, disk_bytes=1024 * 1024)
+        assert await fresh.get_or_synthesize("Harika.", "v", "m", "mp3", synthesize, pin=True) == b"ses"
+        assert len(calls) == 2
+
+    run(scenario())
+
+
+def test_memory_lru_evicts_oldest_and_keeps_pinned():
+    lru = MemoryLRU(max_bytes=10)
+    lru.put("sabit", b"1234", pin=True)
+    lru.put("a", b"123")
+    lru.put("b", b"123")
+    assert lru.get("a") == b"123"
+    # "b" en eski erişilen kayıt; sabit kayıt sınır aşılsa da kalır
+    lru.put("c", b"123")
+    assert lru.get("b") is None
+    assert lru.get("sabit") == b"1234" and lru.get("a") == b"123" and lru.get("c") == b"123"
+    assert lru.size == 10 and len(lru) == 3
+
+    # Sabit kayıt sabitlemeden yeniden yazılsa da sabit kalır
+    lru.put("sabit", b"12")
+    lru.put("d", b"12345")
+    assert lru.get("sabit") == b"12"
+    assert lru.size <= 10
@@ -0,0 +1,161 @@
+import asyncio
+import time
+from typing import Optional
+
+import pytest
+
+from upstream import Priority, UpstreamScheduler, parse_retry_after
+
+
+class FakeError(Exception):
+    def __init__(self, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(f"hata {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def scheduler(name: str, **kwargs) -> UpstreamScheduler:
+    options = dict(rate=100, backoff_base=0.001, backoff_max=0.01, breaker_threshold=3, breaker_recovery=0.1)
+    options.update(kwargs)
+    return UpstreamScheduler(f"test_{name}", FakeError, **options)
+
+
+def test_bucket_allows_burst_then_paces(run):
+    async def scenario():
+        upstream = scheduler("burst", rate=20, burst=2)
+        started = time.monotonic()
+        for _ in range(4):
+            await upstream.acquire()
+        elapsed = time.monotonic() - started
+        # İki jeton hemen, kalan ikisi 20/sn hızla (~0.1 sn)
+        assert 0.08 <= elapsed < 0.5
+        await upstream.close()
+
+    run(scenario())
+
+
+def test_throttle_halves_rate_and_honours_retry_after(run):
+    async def scenario():
+        upstream = scheduler("throttle", rate=10, burst=5)
+        assert upstream.record_failure(FakeError(429, retry_after=0.2))
+        assert upstream.rate == 5
+        started = time.monotonic()
+        await upstream.acquire()
+        assert time.monotonic() - started >= 0.19
+        for _ in range(100):
+            upstream.record_success()
+        assert upstream.rate == 10
+        await upstream.close()
+
+    run(scenario())
+
+
+def test_live_requests_are_served_before_background(run):
+    async def scenario():
+        upstream = scheduler("priority", rate=50, burst=1)
+        await upstream.acquire()
+        order = []
+
+        async def take(priority, label):
+            await upstream.acquire(priority)
+            order.append(label)
+
+        tasks = [asyncio.create_task(take(Priority.BACKGROUND, "arka plan"))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(take(Priority.LIVE, "canlı")))
+        await asyncio.gather(*tasks)
+        assert order == ["canlı", "arka plan"]
+        await upstream.close()
+
+    run(scenario())
+
+
+def test_retries_transient_errors(run):
+    async def scenario():
+        upstream = scheduler("retry", max_retries=3)
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise FakeError(503)
+            return "ok"
+
+        assert await upstream.call(flaky) == "ok"
+        assert len(attempts) == 3
+        assert not upstream.circuit_open
+
+        async def bad_request():
+            attempts.append(1)
+            raise FakeError(400)
+
+        attempts.clear()
+        with pytest.raises(FakeError):
+            await upstream.call(bad_request)
+        assert len(attempts) == 1
+        await upstream.close()
+
+    run(scenario())
+
+
+def test_circuit_opens_rejects_and_recovers_after_probe(run):
+    async def scenario():
+        upstream = scheduler("breaker", max_retries=0, breaker_threshold=3, breaker_recovery=0.1)
+        calls = []
+
+        async def down():
+            calls.append(1)
+            raise FakeError(500)
+
+        for _ in range(3):
+            with pytest.raises(FakeError):
+                await upstream.call(down)
+        assert upstream.circuit_open
+
+        # Devre açıkken istek sağlayıcıya gitmeden reddedilir
+        calls.clear()
+        with pytest.raises(FakeError):
+            await upstream.call(down)
+        assert calls == []
+
+        await asyncio.sleep(0.12)
+
+        async def up():
+            calls.append(1)
+            return "ok"
+
+        # Süre dolunca tek deneme isteği geçer; başarılı olursa devre kapanır
+        assert await upstream.call(up) == "ok"
+        assert not upstream.circuit_open
+        await upstream.close()
+
+    run(scenario())
+
+
+def test_failed_probe_reopens_circuit(run):
+    async def scenario():
+        upstream = scheduler("probe", max_retries=0, breaker_threshold=1, breaker_recovery=0.05)
+
+        async def down():
+            raise FakeError(503)
+
+        with pytest.raises(FakeError):
+            await upstream.call(down)
+        assert upstream.circuit_open
+        await asyncio.sleep(0.06)
+        with pytest.raises(FakeError):
+            await upstream.call(down)
+        assert upstream.circuit_open
+        # Yeni açılma zamanından itibaren tekrar beklenir
+        with pytest.raises(FakeError, match="devre açık"):
+            await upstream.call(down)
+        await upstream.close()
+
+    run(scenario())
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("30") == 30
+    assert parse_retry_after("1.5s") == 1.5
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") is None
@@ -0,0 +1,180 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterator, Optional
+
+import httpx
+from elevenlabs.client import ElevenLabs
+
+from metrics import registry
+from upstream import parse_retry_after
+
+
+DEFAULT_VOICE_ID = "EXAVITQu4vr4xnSDxMaL"  # Bella sesi
+DEFAULT_MODEL_ID = "eleven_multilingual_v2"
+DEFAULT_OUTPUT_FORMAT = "mp3_44100_128"
+
+# Havuz ve süre ayarları
+TTS_MAX_WORKERS = int(os.getenv("TTS_MAX_WORKERS", "16"))
+TTS_MAX_CONNECTIONS = int(os.getenv("TTS_MAX_CONNECTIONS", "32"))
+TTS_CONNECT_TIMEOUT = float(os.getenv("TTS_CONNECT_TIMEOUT", "5"))
+TTS_DEADLINE = float(os.getenv("TTS_DEADLINE", "30"))
+# Boş bırakılırsa SDK'nın varsayılan adresi kullanılır; yük testinde sahte sunucuya yönlendirilir
+ELEVENLABS_BASE_URL = os.getenv("ELEVENLABS_BASE_URL") or None
+
+
+class TTSError(Exception):
+    """Ses sentezi başarısız olduğunda veya süre aşıldığında fırlatılır"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @classmethod
+    def from_error(cls, error: Exception) -> "TTSError":
+        # SDK'nın ApiError'ı durum kodunu (ve yeni sürümlerde yanıt başlıklarını) taşır
+        headers = getattr(error, "headers", None) or {}
+        return cls(
+            str(error),
+            status_code=getattr(error, "status_code", None),
+            retry_after=parse_retry_after(headers.get("retry-after") or headers.get("Retry-After")),
+        )
+
+
+class TTSService:
+    """Süreç genelinde tek ElevenLabs istemcisi ve sınırlı iş parçacığı havuzu.
+
+    ElevenLabs SDK'sı senkron çalıştığı için çağrılar event loop'u bloklamamak
+    adına havuzda yürütülür. Paylaşılan httpx istemcisi sayesinde TLS bağlantıları
+    her seslendirmede yeniden kurulmaz.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_workers: int = TTS_MAX_WORKERS,
+        max_connections: int = TTS_MAX_CONNECTIONS,
+        deadline: float = TTS_DEADLINE,
+        base_url: Optional[str] = ELEVENLABS_BASE_URL,
+    ):
+        self._api_key = api_key
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.max_connections = max_connections
+        self.deadline = deadline
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts")
+        self._client: Optional[ElevenLabs] = None
+        self._http_client: Optional[httpx.Client] = None
+        self._client_lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._counter_lock = threading.Lock()
+
+        self.queue_depth_gauge = registry.gauge(
+            "tts_queue_depth", "Havuzda çalışmayı bekleyen TTS istekleri", lambda: self._pending
+        )
+        self.in_flight_gauge = registry.gauge(
+            "tts_in_flight", "Şu anda ElevenLabs'te çalışan TTS istekleri", lambda: self._running
+        )
+        self.timeouts = registry.counter("tts_timeouts_total", "Süresi aşılan TTS istekleri")
+        self.failures = registry.counter("tts_failures_total", "Başarısız TTS istekleri")
+
+    @property
+    def client(self) -> ElevenLabs:
+        with self._client_lock:
+            if self._client is None:
+                api_key = self._api_key or os.getenv("ELEVENLABS_API_KEY")
+                if not api_key:
+                    raise TTSError("ELEVENLABS_API_KEY bulunamadı")
+                self._http_client = httpx.Client(
+                    timeout=httpx.Timeout(self.deadline, connect=TTS_CONNECT_TIMEOUT),
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections,
+                    ),
+                )
+                self._client = ElevenLabs(
+                    api_key=api_key, base_url=self.base_url, httpx_client=self._http_client, timeout=self.deadline
+                )
+            return self._client
+
+    @property
+    def queue_depth(self) -> int:
+        return self._pending
+
+    def _convert(self, text: str, voice_id: str, model_id: str, output_format: str) -> Iterator[bytes]:
+        return self.client.text_to_speech.convert(
+            text=text,
+            voice_id=voice_id,
+            model_id=model_id,
+            output_format=output_format,
+            request_options={"timeout_in_seconds": int(self.deadline)},
+        )
+
+    def _track(self, fn, *args):
+        # Havuzda bekleyen / çalışan istek sayısını tutan sarmalayıcı
+        with self._counter_lock:
+            self._pending -= 1
+            self._running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._counter_lock:
+                self._running -= 1
+
+    def _submit(self, fn, *args) -> "asyncio.Future":
+        with self._counter_lock:
+            self._pending += 1
+        future = self._executor.submit(self._track, fn, *args)
+        future.add_done_callback(self._release_cancelled)
+        return asyncio.wrap_future(future)
+
+    def _release_cancelled(self, future: Future):
+        # Süre aşımıyla kuyruktayken iptal edilen iş _track'e hiç girmez; bekleyen sayısı burada düşülür
+        if future.cancelled():
+            with self._counter_lock:
+                self._pending -= 1
+
+    def synthesize_sync(
+        self,
+        text: str,
+        voice_id: str = DEFAULT_VOICE_ID,
+        model_id: str = DEFAULT_MODEL_ID,
+        output_format: str = DEFAULT_OUTPUT_FORMAT,
+    ) -> bytes:
+        """Metni senkron olarak sentezler ve tüm ses verisini döndürür"""
+        audio_bytes = b''.join(self._convert(text, voice_id, model_id, output_format))
+        if not audio_bytes:
+            raise TTSError("Ses verisi oluşturulamadı")
+        return audio_bytes
+
+    async def synthesize(
+        self,
+        text: str,
+        voice_id: str = DEFAULT_VOICE_ID,
+        model_id: str = DEFAULT_MODEL_ID,
+        output_format: str = DEFAULT_OUTPUT_FORMAT,
+        deadline: Optional[float] = None,
+    ) -> bytes:
+        """Metni havuzda sentezler; süre aşılırsa TTSError fırlatır"""
+        future = self._submit(self.synthesize_sync, text, voice_id, model_id, output_format)
+        try:
+            return await asyncio.wait_for(future, timeout=deadline or self.deadline)
+        except asyncio.TimeoutError:
+            self.timeouts.inc()
+            raise TTSError(f"TTS süresi aşıldı ({deadline or self.deadline} sn)")
+        except TTSError:
+            self.failures.inc()
+            raise
+        except Exception as e:
+            self.failures.inc()
+            raise TTSError.from_error(e) from e
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        if self._http_client is not None:
+            self._http_client.close()
+        self._client = None
+        self._http_client = None
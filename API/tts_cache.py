@@ -0,0 +1,249 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+from logs import get_logger
+from metrics import registry
+from singleflight import SingleFlight
+
+
+logger = get_logger(__name__)
+
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "static/tts_cache")
+TTS_CACHE_MEMORY_BYTES = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+TTS_CACHE_DISK_BYTES = int(os.getenv("TTS_CACHE_DISK_BYTES", str(1024 * 1024 * 1024)))
+
+
+def cache_key(text: str, voice_id: str, model_id: str, output_format: str) -> str:
+    """(metin, ses, model, format) dörtlüsünden içerik adresli anahtar üretir"""
+    raw = json.dumps([text, voice_id, model_id, output_format], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class MemoryLRU:
+    """Toplam bayt sınırıyla çalışan LRU önbellek; sabitlenen (pinned) kayıtlar silinmez.
+
+    Sabitlenen kayıtlar LRU sırasının dışında ayrı tutulur; böylece eviction yalnızca
+    baştaki en eski kayıtları çıkarır ve sabit kayıtların üzerinden geçmez.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._pinned: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items) + len(self._pinned)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._pinned.get(key)
+            if value is not None:
+                return value
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: bytes, pin: bool = False):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            if pin or key in self._pinned:
+                old = self._pinned.get(key)
+                if old is not None:
+                    self.size -= len(old)
+                self._pinned[key] = value
+            else:
+                self._items[key] = value
+            self.size += len(value)
+            self._evict()
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._items:
+            self.size -= len(self._items.popitem(last=False)[1])
+
+
+class DiskCache:
+    """static/ altında, toplam boyut sınırı aşıldığında en eski erişilen dosyaları silen önbellek"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total: Optional[int] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            # Erişim zamanı LRU sıralaması için güncellenir
+            os.utime(path, None)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key: str, value: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            previous = os.path.getsize(path)
+        except OSError:
+            previous = 0
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._total is None:
+                self._total = self._scan()[1]
+            else:
+                self._total += len(value) - previous
+            over_limit = self._total > self.max_bytes
+        if over_limit:
+            self._evict()
+
+    def _scan(self):
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        return entries, total
+
+    def size(self) -> int:
+        with self._lock:
+            if self._total is None:
+                self._total = self._scan()[1]
+            return self._total
+
+    def _evict(self):
+        # Dizin yalnızca sınır aşıldığında taranır; hedef, sınırın %90'ına inmek
+        with self._lock:
+            entries, total = self._scan()
+            target = int(self.max_bytes * 0.9)
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    continue
+            self._total = total
+
+
+class TTSCache:
+    """Bellek (LRU) ve disk katmanlı, içerik adresli TTS ses önbelleği.
+
+    Diske yalnızca sabitlenen kayıtlar, yani sabit mülakatçı ifadeleri yazılır. Adaya
+    özel sorular gibi dinamik metinler tekrar kullanılmadığından yalnızca bellekte,
+    LRU sınırı içinde tutulur.
+    """
+
+    def __init__(
+        self,
+        directory: str = TTS_CACHE_DIR,
+        memory_bytes: int = TTS_CACHE_MEMORY_BYTES,
+        disk_bytes: int = TTS_CACHE_DISK_BYTES,
+    ):
+        self.memory = MemoryLRU(memory_bytes)
+        self.disk = DiskCache(directory, disk_bytes)
+        self.hits = registry.counter("tts_cache_hits_total", "Bellek veya diskten karşılanan TTS istekleri")
+        self.misses = registry.counter("tts_cache_misses_total", "Sentez gerektiren TTS istekleri")
+        # Aynı anahtar için eşzamanlı ıskalar tek bir sentezi paylaşır
+        self.flight = SingleFlight("tts")
+        registry.gauge("tts_cache_memory_bytes", "Bellek katmanındaki ses verisi (bayt)", lambda: self.memory.size)
+
+    async def get(self, key: str, disk: bool = True) -> Optional[bytes]:
+        audio = self.memory.get(key)
+        if audio is not None or not disk:
+            return audio
+        audio = await asyncio.to_thread(self.disk.get, key)
+        if audio is not None:
+            self.memory.put(key, audio)
+        return audio
+
+    async def put(self, key: str, audio: bytes, pin: bool = False):
+        """Sesi belleğe yazar; sabitlenen kayıtlar diske de yazılır"""
+        self.memory.put(key, audio, pin=pin)
+        if pin:
+            await asyncio.to_thread(self.disk.put, key, audio)
+
+    async def get_or_synthesize(
+        self,
+        text: str,
+        voice_id: str,
+        model_id: str,
+        output_format: str,
+        synthesize: Callable[[], Awaitable[bytes]],
+        pin: bool = False,
+    ) -> bytes:
+        """Önbellekte varsa sesi döndürür, yoksa sentezleyip önbelleğe yazar.
+
+        pin=True sabit ifadeler içindir: ses belleğe sabitlenir ve diske yazılır. Diğer
+        metinler için disk okunmaz ve yazılmaz. Aynı anahtar zaten sentezleniyorsa yeni
+        istek gönderilmez, o sentezin sonucu beklenir.
+        """
+        key = cache_key(text, voice_id, model_id, output_format)
+        audio = await self.get(key, disk=pin)
+        if audio is not None:
+            self.hits.inc()
+            if pin:
+                self.memory.put(key, audio, pin=True)
+            return audio
+        self.misses.inc()
+        audio = await self.flight.do(key, lambda: self._synthesize(key, synthesize))
+        if pin:
+            await self.put(key, audio, pin=True)
+        return audio
+
+    async def _synthesize(self, key: str, synthesize: Callable[[], Awaitable[bytes]]) -> bytes:
+        audio = await synthesize()
+        self.memory.put(key, audio)
+        return audio
+
+    async def prewarm(
+        self,
+        phrases: Iterable[str],
+        voice_id: str,
+        model_id: str,
+        output_format: str,
+        synthesize: Callable[[str], Awaitable[bytes]],
+    ) -> int:
+        """Sabit ifadeleri önceden seslendirip belleğe sabitler; hazırlanan ifade sayısını döndürür"""
+        warmed = 0
+        for text in phrases:
+            try:
+                await self.get_or_synthesize(
+                    text, voice_id, model_id, output_format,
+                    lambda text=text: synthesize(text),
+                    pin=True,
+                )
+                warmed += 1
+            except Exception as e:
+                logger.warning("TTS ön ısıtma hatası (%d karakter): %s", len(text), e)
+        return warmed
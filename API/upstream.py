@@ -0,0 +1,296 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import time
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type, TypeVar
+
+from logs import get_logger
+from metrics import registry
+
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# Sağlayıcı başına saniyedeki istek sınırı; 429 alındıkça düşürülür, başarılı isteklerle geri artar
+GEMINI_RATE_LIMIT = float(os.getenv("GEMINI_RATE_LIMIT", "20"))
+TTS_RATE_LIMIT = float(os.getenv("TTS_RATE_LIMIT", "10"))
+# Sınırın inebileceği en düşük değer ve her başarılı istekte geri kazanılan miktar
+UPSTREAM_MIN_RATE = float(os.getenv("UPSTREAM_MIN_RATE", "0.5"))
+UPSTREAM_RATE_RECOVERY = float(os.getenv("UPSTREAM_RATE_RECOVERY", "0.1"))
+# Yeniden deneme ayarları (adet / saniye)
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "3"))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "10"))
+# Art arda bu kadar kesinti hatasında devre açılır, süre dolunca tek bir deneme isteğine izin verilir
+UPSTREAM_BREAKER_THRESHOLD = int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", "5"))
+UPSTREAM_BREAKER_RECOVERY = float(os.getenv("UPSTREAM_BREAKER_RECOVERY", "30"))
+
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+
+
+class Priority(IntEnum):
+    """Küçük değer önce çalışır"""
+    LIVE = 0
+    BACKGROUND = 1
+
+
+# Çağrının önceliği, çağrı zinciri boyunca parametre taşımamak için bağlamda tutulur;
+# create_task bağlamı kopyaladığından arka plan görevlerinin alt işleri de önceliği devralır
+_priority: contextvars.ContextVar = contextvars.ContextVar("upstream_priority", default=Priority.LIVE)
+
+
+async def in_background(awaitable: Awaitable[T]) -> T:
+    """Verilen işi, içinde yapılan tüm sağlayıcı çağrıları arka plan önceliğiyle çalışacak şekilde bekler"""
+    token = _priority.set(Priority.BACKGROUND)
+    try:
+        return await awaitable
+    finally:
+        _priority.reset(token)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After başlığını ("30") veya Google RetryInfo süresini ("30s", "1.5s") saniyeye çevirir"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value.strip().rstrip("s")))
+    except ValueError:
+        # HTTP tarih biçimi desteklenmez; üstel bekleme yeterli
+        return None
+
+
+def error_details(error: BaseException) -> Tuple[Optional[int], Optional[float]]:
+    """Hatadan HTTP durum kodunu ve (varsa) Retry-After süresini okur"""
+    return getattr(error, "status_code", None), getattr(error, "retry_after", None)
+
+
+class UpstreamScheduler:
+    """Bir dış sağlayıcı (Gemini, ElevenLabs) için uyarlanır hız sınırı, öncelik kuyruğu,
+    yeniden deneme ve devre kesici.
+
+    Jeton kovası sağlayıcının 429 yanıtlarından öğrenir: her 429'da hız yarıya iner ve
+    Retry-After süresince yeni istek gönderilmez; başarılı istekler hızı yavaşça geri
+    artırır. Jeton beklerken canlı mülakat turları arka plan işlerinden önce sıraya alınır.
+    Bağlantı hataları, zaman aşımları ve 5xx yanıtları art arda eşiği aşarsa devre açılır
+    ve istekler sağlayıcıya gitmeden ``error_type`` ile hemen reddedilir.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        error_type: Type[Exception],
+        rate: float,
+        burst: Optional[float] = None,
+        min_rate: float = UPSTREAM_MIN_RATE,
+        recovery: float = UPSTREAM_RATE_RECOVERY,
+        max_retries: int = UPSTREAM_MAX_RETRIES,
+        backoff_base: float = UPSTREAM_BACKOFF_BASE,
+        backoff_max: float = UPSTREAM_BACKOFF_MAX,
+        breaker_threshold: int = UPSTREAM_BREAKER_THRESHOLD,
+        breaker_recovery: float = UPSTREAM_BREAKER_RECOVERY,
+    ):
+        self.name = name
+        self.error_type = error_type
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.min_rate = min(min_rate, rate)
+        self.recovery = recovery
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_recovery = breaker_recovery
+
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_at: Optional[float] = None
+
+        registry.gauge(f"{name}_scheduler_queue_depth", f"{name} jetonu bekleyen istekler", lambda: len(self._waiters))
+        registry.gauge(
+            f"{name}_scheduler_background_queue_depth", f"{name} jetonu bekleyen arka plan istekleri",
+            lambda: sum(1 for priority, _, _ in self._waiters if priority == Priority.BACKGROUND)
+        )
+        registry.gauge(f"{name}_scheduler_rate", f"{name} için geçerli istek/sn sınırı", lambda: self.rate)
+        registry.gauge(f"{name}_circuit_open", f"{name} devre kesicisi açık mı (1/0)", lambda: int(self.circuit_open))
+        self.wait_seconds = registry.histogram(
+            f"{name}_scheduler_wait_seconds", f"{name} isteklerinin jeton için beklediği süre", WAIT_BUCKETS
+        )
+        self.throttled = registry.counter(f"{name}_throttled_total", f"{name} tarafından dönen 429 yanıtları")
+        self.retries = registry.counter(f"{name}_retries_total", f"Yeniden denenen {name} istekleri")
+        self.circuit_opens = registry.counter(f"{name}_circuit_opens_total", f"{name} devre kesicisinin açılma sayısı")
+        self.rejected = registry.counter(f"{name}_circuit_rejected_total", f"Devre açıkken reddedilen {name} istekleri")
+
+    @property
+    def circuit_open(self) -> bool:
+        return self._opened_at is not None
+
+    # --- Devre kesici ---
+
+    def _check_circuit(self):
+        if self._opened_at is None:
+            return
+        now = time.monotonic()
+        # Deneme isteği sonuçlanmadan (ör. iptal edildiği için) takılı kalırsa yenisine izin verilir
+        probing = self._probe_at is not None and now - self._probe_at < self.breaker_recovery
+        if probing or now - self._opened_at < self.breaker_recovery:
+            self.rejected.inc()
+            raise self.error_type(f"{self.name} geçici olarak kullanılamıyor (devre açık)")
+        # Yarı açık: sonucu gelene kadar yalnızca bu istek geçer
+        self._probe_at = now
+
+    def _close_circuit(self):
+        if self._opened_at is not None:
+            logger.info("%s devre kesicisi kapandı", self.name)
+        self._failures = 0
+        self._opened_at = None
+        self._probe_at = None
+
+    def record_success(self):
+        self._close_circuit()
+        self.rate = min(self.max_rate, self.rate + self.recovery)
+
+    def record_failure(self, error: BaseException) -> bool:
+        """Hatayı işler ve yeniden denemeye uygun olup olmadığını döndürür"""
+        status, retry_after = error_details(error)
+        if status == 429:
+            self.throttled.inc()
+            self._throttle(retry_after)
+            self._probe_at = None
+            return True
+        if status is not None and status < 500:
+            # İstemci hatası: sağlayıcı ayakta, ancak tekrar denemek sonucu değiştirmez
+            self._close_circuit()
+            return False
+
+        self._failures += 1
+        if self._probe_at is not None or (self._opened_at is None and self._failures >= self.breaker_threshold):
+            if self._opened_at is None:
+                self.circuit_opens.inc()
+                logger.warning("%s devre kesicisi açıldı: %s", self.name, error)
+            self._opened_at = time.monotonic()
+        self._probe_at = None
+        return True
+
+    # --- Jeton kovası ---
+
+    def _throttle(self, retry_after: Optional[float]):
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = min(self._tokens, 0.0)
+        if retry_after:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _try_take(self) -> bool:
+        now = time.monotonic()
+        if now < self._paused_until:
+            return False
+        self._refill(now)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    async def acquire(self, priority: Optional[Priority] = None):
+        """Devre kapalıysa bir jeton alır; gerekirse önceliğine göre sırada bekler"""
+        self._check_circuit()
+        if not self._waiters and self._try_take():
+            self.wait_seconds.observe(0)
+            return
+        if priority is None:
+            priority = _priority.get()
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._sequence), future))
+        self._ensure_dispatcher()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Jeton verildikten hemen sonra iptal edildi; jeton geri konur
+                self._tokens += 1
+            raise
+        self.wait_seconds.observe(time.monotonic() - started)
+
+    def _ensure_dispatcher(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def _dispatch(self):
+        while True:
+            while self._waiters and self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+            if not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            if self._try_take():
+                heapq.heappop(self._waiters)[2].set_result(None)
+                continue
+            now = time.monotonic()
+            if now < self._paused_until:
+                delay = self._paused_until - now
+            else:
+                delay = (1 - self._tokens) / self.rate
+            await asyncio.sleep(max(delay, 0.001))
+
+    # --- Çağrı ---
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Tam rastgele (full jitter) üstel bekleme; Retry-After daha uzunsa o esas alınır"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after or 0)
+
+    async def call(self, fn: Callable[[], Awaitable[T]], priority: Optional[Priority] = None) -> T:
+        """fn'i hız sınırı altında çalıştırır; geçici hatalarda bekleyerek yeniden dener"""
+        attempt = 0
+        while True:
+            await self.acquire(priority)
+            try:
+                result = await fn()
+            except self.error_type as e:
+                retryable = self.record_failure(e)
+                if not retryable or attempt >= self.max_retries or self.circuit_open:
+                    raise
+                self.retries.inc()
+                await asyncio.sleep(self.backoff(attempt, error_details(e)[1]))
+                attempt += 1
+                continue
+            self.record_success()
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate": round(self.rate, 3),
+            "queued": len(self._waiters),
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 3),
+            "circuit_open": self.circuit_open,
+        }
+
+    async def close(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for _, _, future in self._waiters:
+            if not future.done():
+                future.cancel()
+        self._waiters.clear()
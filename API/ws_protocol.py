@@ -0,0 +1,196 @@
+import base64
+import struct
+from enum import IntEnum
+from typing import Any, Dict, NamedTuple, Optional, Tuple, Union
+
+from fastapi import WebSocket
+
+from metrics import registry
+
+
+# Bağlantı sırasında seçilen ses taşıma modu
+PROTOCOL_JSON = "json"
+PROTOCOL_BINARY = "binary"
+
+PROTOCOL_VERSION = 2
+# İkili modu Sec-WebSocket-Protocol başlığıyla istemek için kullanılan alt protokol adı
+BINARY_SUBPROTOCOL = f"hirex.audio.v{PROTOCOL_VERSION}"
+
+FRAME_MAGIC = b"HX"
+# magic(2) | sürüm(1) | codec(1) | bayraklar(1) | boş(1) | kanal seq(4) | mesaj no(4) | sıra no(4), ağ sıralı
+FRAME_HEADER = struct.Struct("!2sBBBxIII")
+# Kanal seq alanı çerçeve kanala yazılırken doldurulur
+FRAME_SEQ = struct.Struct("!I")
+FRAME_SEQ_OFFSET = 6
+FLAG_FINAL = 0x01
+
+SEND_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+encode_seconds = registry.histogram(
+    "ws_audio_encode_seconds", "Ses mesajının kodlanma süresi (base64/JSON veya çerçeve)", SEND_BUCKETS
+)
+send_seconds = registry.histogram("ws_send_seconds", "WebSocket'e yazma süresi", SEND_BUCKETS)
+
+
+class AudioCodec(IntEnum):
+    MP3 = 1
+    OPUS = 2
+    PCM_S16LE = 3
+
+
+class FrameHeader(NamedTuple):
+    version: int
+    codec: AudioCodec
+    final: bool
+    seq: int
+    message_id: int
+    sequence: int
+
+
+def negotiate_protocol(websocket: WebSocket) -> Tuple[str, Optional[str]]:
+    """İstemcinin istediği modu ve kabul edilecek alt protokolü döndürür.
+
+    İkili mod "?audio=binary" sorgu parametresi veya BINARY_SUBPROTOCOL alt protokolü ile
+    istenir; ikisi de yoksa mevcut Unity sürümlerinin beklediği JSON modu kullanılır.
+    """
+    requested = websocket.scope.get("subprotocols") or []
+    if BINARY_SUBPROTOCOL in requested:
+        return PROTOCOL_BINARY, BINARY_SUBPROTOCOL
+    if websocket.query_params.get("audio", "").lower() == PROTOCOL_BINARY:
+        return PROTOCOL_BINARY, None
+    return PROTOCOL_JSON, None
+
+
+def encode_frame(
+    message_id: int,
+    sequence: int,
+    payload: Union[bytes, memoryview],
+    codec: AudioCodec = AudioCodec.MP3,
+    final: bool = False,
+    seq: int = 0,
+) -> bytearray:
+    """Başlık ve ham ses baytlarını tek bir WebSocket ikili mesajı olarak paketler.
+
+    Çerçeve bytearray olarak döner; kanal sıra numarasını stamp_frame ile kopyalamadan yazar.
+    """
+    frame = bytearray(FRAME_HEADER.size + len(payload))
+    FRAME_HEADER.pack_into(
+        frame, 0, FRAME_MAGIC, PROTOCOL_VERSION, int(codec), FLAG_FINAL if final else 0, seq, message_id, sequence
+    )
+    frame[FRAME_HEADER.size:] = payload
+    return frame
+
+
+def stamp_frame(frame: bytearray, seq: int) -> bytearray:
+    """Hazır çerçevenin başlığına kanal sıra numarasını (seq) yerinde yazar"""
+    FRAME_SEQ.pack_into(frame, FRAME_SEQ_OFFSET, seq)
+    return frame
+
+
+def decode_frame(data: Union[bytes, bytearray, memoryview]) -> Tuple[FrameHeader, memoryview]:
+    """Çerçeve başlığını çözer; ses verisi kopyalanmadan memoryview olarak döner"""
+    view = memoryview(data)
+    if len(view) < FRAME_HEADER.size:
+        raise ValueError("Çerçeve başlığı eksik")
+    magic, version, codec, flags, seq, message_id, sequence = FRAME_HEADER.unpack_from(view)
+    if magic != FRAME_MAGIC:
+        raise ValueError("Geçersiz çerçeve imzası")
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"Desteklenmeyen protokol sürümü: {version}")
+    header = FrameHeader(version, AudioCodec(codec), bool(flags & FLAG_FINAL), seq, message_id, sequence)
+    return header, view[FRAME_HEADER.size:]
+
+
+class AudioSender:
+    """Bir WebSocket bağlantısına (veya aynı send_json / send_bytes arayüzünü sunan bir
+    kanala) anlaşılan moda göre ses gönderir.
+
+    JSON modunda mevcut mesaj biçimleri (base64 "audio", "audio_chunk", "audio_data")
+    korunur. İkili modda ses, başlıklı çerçeveler halinde send_bytes ile gönderilir;
+    aynı yanıta ait parçalar ortak mesaj numarasını ve artan sıra numarasını taşır,
+    son parça FLAG_FINAL ile işaretlenir. Metinler JSON kontrol mesajlarında kalır.
+    """
+
+    def __init__(self, websocket: WebSocket, protocol: str = PROTOCOL_JSON, codec: AudioCodec = AudioCodec.MP3):
+        self.websocket = websocket
+        self.protocol = protocol
+        self.codec = codec
+        self._next_message_id = 0
+
+    @property
+    def binary(self) -> bool:
+        return self.protocol == PROTOCOL_BINARY
+
+    def new_message_id(self) -> int:
+        self._next_message_id = (self._next_message_id + 1) & 0xFFFFFFFF
+        return self._next_message_id
+
+    async def _send_bytes(self, data: bytearray):
+        await self.websocket.send_bytes(data)
+
+    async def _send_message(self, message: Dict[str, Any]):
+        # Kanal mesaja sıra numarası ekleyip serileştirir; yazma süresi yazıcı görevde ölçülür
+        await self.websocket.send_json(message)
+
+    async def send_frame(self, message_id: int, sequence: int, payload: bytes, final: bool = False):
+        with encode_seconds.time():
+            frame = encode_frame(message_id, sequence, payload, self.codec, final)
+        await self._send_bytes(frame)
+
+    @staticmethod
+    def _b64(audio: bytes) -> str:
+        with encode_seconds.time():
+            return base64.b64encode(audio).decode('utf-8')
+
+    async def send_audio(self, audio: bytes):
+        """Tek parça, birleştirilmiş yanıt sesini gönderir ("audio" mesajı)"""
+        if self.binary:
+            await self.send_frame(self.new_message_id(), 0, audio, final=True)
+            return
+        await self._send_message({
+            'type': 'audio',
+            'data': self._b64(audio)
+        })
+
+    async def send_audio_data(self, audio: bytes, text: str):
+        """Metniyle birlikte tek seferlik ses gönderir ("audio_data" mesajı)"""
+        if self.binary:
+            await self.send_frame(self.new_message_id(), 0, audio, final=True)
+            return
+        await self._send_message({
+            'type': 'audio_data',
+            'data': {
+                'text': text,
+                'audio': self._b64(audio)
+            }
+        })
+
+    async def send_chunk(self, message_id: int, index: int, audio: bytes, text: str):
+        """Akış halindeki yanıtın bir parçasını gönderir ("audio_chunk" mesajı)"""
+        if self.binary:
+            await self.send_frame(message_id, index, audio)
+            return
+        await self._send_message({
+            'type': 'audio_chunk',
+            'data': {
+                'index': index,
+                'text': text,
+                'audio': self._b64(audio)
+            }
+        })
+
+    async def send_error(self, text: str):
+        """Yarıda kalan yanıt için istemciye hata bildirir ("error" mesajı)"""
+        await self._send_message({
+            'type': 'error',
+            'data': {'message': text}
+        })
+
+    async def end_stream(self, message_id: int, sequence: int, text: str, completed: bool = False):
+        """Akışı kapatır: ikili modda boş son çerçeve, ardından "stream_complete" gönderilir"""
+        if self.binary:
+            await self.send_frame(message_id, sequence, b"", final=True)
+        await self._send_message({
+            'type': 'stream_complete',
+            'data': {'text': text, 'is_completed': completed}
+        })